@@ -0,0 +1,102 @@
+from .availability import SeatAvailability
+
+# Preferred depth as a fraction of the hall, front row = 0. Without a zone we
+# aim a little behind the middle, where the sight lines are usually best.
+ZONES = {"front": 0.2, "middle": 0.5, "back": 0.85}
+DEFAULT_DEPTH = 0.6
+WHEELCHAIR_PENALTY = 1.0
+
+
+def block_starts(free: int, adjacent: int, size: int) -> int:
+    """Bits where `size` free seats sit side by side, starting at that bit."""
+    starts = free
+    for i in range(1, size):
+        if not starts:
+            break
+        starts &= (free >> i) & (adjacent >> (i - 1))
+    return starts
+
+
+class _Scorer:
+    def __init__(self, layout, zone: str = None):
+        self.layout = layout
+        rows = sorted(layout.row_centers)
+        self.rank = {row: i for i, row in enumerate(rows)}
+        self.target = ZONES.get(zone, DEFAULT_DEPTH) * max(1, len(rows) - 1)
+        self.depth = max(1, len(rows) - 1)
+        self.width = max(1, max(layout.numbers, default=1))
+
+    def __call__(self, first: int, last: int) -> float:
+        layout = self.layout
+        row = layout.rows[first]
+        dr = (self.rank[row] - self.target) / self.depth
+        dc = ((layout.numbers[first] + layout.numbers[last]) / 2 - layout.row_centers[row]) / self.width
+        return dr * dr + dc * dc
+
+
+def _wheelchair_fit(layout, block: int, wheelchair: int):
+    seats = (block & layout.wheelchair).bit_count()
+    if seats < wheelchair:
+        return None
+    # Don't spend wheelchair places on parties that did not ask for them.
+    return (seats - wheelchair) * WHEELCHAIR_PENALTY
+
+
+def find_best_block(
+    availability: SeatAvailability,
+    size: int,
+    client_id: str = "",
+    adjacent: bool = True,
+    wheelchair: int = 0,
+    zone: str = None,
+    exclude: int = 0,
+) -> list:
+    """Best-scoring seat ids for a party of `size`, or [] when nothing fits."""
+    layout = availability.layout
+    free = ((1 << len(layout)) - 1) & ~availability.blocked(client_id) & ~exclude
+    if free.bit_count() < size:
+        return []
+
+    score = _Scorer(layout, zone)
+    if not adjacent:
+        return _best_singles(layout, free, size, wheelchair, score)
+
+    best, best_score = None, None
+    starts = block_starts(free, layout.adjacent, size)
+    block = (1 << size) - 1
+    while starts:
+        low = starts & -starts
+        starts ^= low
+        first = low.bit_length() - 1
+
+        penalty = _wheelchair_fit(layout, block << first, wheelchair)
+        if penalty is None:
+            continue
+        s = score(first, first + size - 1) + penalty
+        if best_score is None or s < best_score:
+            best, best_score = first, s
+
+    if best is None:
+        return []
+    return [layout.seat_ids[bit] for bit in range(best, best + size)]
+
+
+def _best_singles(layout, free: int, size: int, wheelchair: int, score) -> list:
+    ranked = []
+    while free:
+        low = free & -free
+        free ^= low
+        bit = low.bit_length() - 1
+        ranked.append((score(bit, bit), bit))
+    ranked.sort()
+
+    accessible = [bit for _, bit in ranked if layout.wheelchair >> bit & 1][:wheelchair]
+    if len(accessible) < wheelchair:
+        return []
+    taken = set(accessible)
+    rest = [bit for _, bit in ranked if bit not in taken and not layout.wheelchair >> bit & 1]
+    rest += [bit for _, bit in ranked if bit not in taken and layout.wheelchair >> bit & 1]
+    chosen = accessible + rest[: size - len(accessible)]
+    if len(chosen) < size:
+        return []
+    return sorted(layout.seat_ids[bit] for bit in chosen)
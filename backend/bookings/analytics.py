@@ -0,0 +1,151 @@
+from datetime import datetime
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Reservation, ReservedSeat, Screening
+from .schedule import day_bounds
+from .seatmap import get_hall_layout
+
+PERCENTILES = (50, 90)
+
+
+def _cache_seconds() -> int:
+    return int(getattr(settings, "ANALYTICS_CACHE_SECONDS", 900))
+
+
+def _heatmap_key(hall_id: int, first_day, last_day) -> str:
+    return f"bookings:heatmap:{hall_id}:{first_day or ''}:{last_day or ''}"
+
+
+def load_bookings(hall_id: int, first_day=None, last_day=None) -> dict:
+    """Booked seats of a hall's screenings as parallel arrays, one element per seat sold."""
+    screenings = Screening.objects.filter(hall_id=hall_id)
+    if first_day is not None:
+        screenings = screenings.filter(start_time__gte=day_bounds(first_day)[0])
+    if last_day is not None:
+        screenings = screenings.filter(start_time__lt=day_bounds(last_day)[1])
+
+    shown = list(screenings.order_by("id").values_list("id", "start_time"))
+    screening_ids = np.fromiter((pk for pk, _ in shown), np.int64)
+    starts = np.fromiter((start.timestamp() for _, start in shown), np.float64, len(screening_ids))
+
+    rows = list(
+        ReservedSeat.objects.filter(screening__in=screenings.values("id"))
+        .exclude(reservation__status=Reservation.Status.CANCELLED)
+        .values_list("seat_id", "screening_id", "reservation_id", "reservation__created_at")
+    )
+    seat, screening, reservation, created = zip(*rows) if rows else ((), (), (), ())
+    n = len(rows)
+    screening = np.searchsorted(screening_ids, np.fromiter(screening, np.int64, n))
+    return {
+        "screenings": len(screening_ids),
+        "seat": np.fromiter(seat, np.int64, n),
+        "screening": screening,
+        "reservation": np.fromiter(reservation, np.int64, n),
+        "booked_at": np.fromiter(map(datetime.timestamp, created), np.float64, n),
+        "starts_at": starts[screening] if n else np.empty(0),
+    }
+
+
+def fill_ranks(screening, reservation, booked_at) -> np.ndarray:
+    """How early each seat sold within its screening: 0 for the first booking, 1 for the last.
+
+    Seats booked together share their reservation's rank.
+    """
+    n = len(screening)
+    if not n:
+        return np.empty(0)
+    order = np.lexsort((reservation, booked_at, screening))
+    s, r = screening[order], reservation[order]
+    positions = np.arange(n)
+    group_start = np.r_[True, s[1:] != s[:-1]]
+    starts = np.flatnonzero(group_start)
+    sizes = np.diff(np.r_[starts, n])
+    group = np.cumsum(group_start) - 1
+    first_of_reservation = np.maximum.accumulate(np.where(group_start | np.r_[True, r[1:] != r[:-1]], positions, 0))
+    ranks = np.empty(n)
+    ranks[order] = (first_of_reservation - starts[group]) / np.maximum(sizes[group] - 1, 1)
+    return ranks
+
+
+def grouped_percentiles(cells, values, size: int, percentiles=PERCENTILES) -> dict:
+    """Linear-interpolated percentiles of values per cell index; NaN where a cell has none."""
+    order = np.lexsort((values, cells))
+    values = values[order]
+    counts = np.bincount(cells, minlength=size)
+    offsets = np.r_[0, np.cumsum(counts)[:-1]]
+    filled = counts > 0
+    result = {}
+    for p in percentiles:
+        out = np.full(size, np.nan)
+        at = offsets[filled] + (counts[filled] - 1) * (p / 100)
+        lo = np.floor(at).astype(np.int64)
+        hi = np.ceil(at).astype(np.int64)
+        out[filled] = values[lo] + (values[hi] - values[lo]) * (at - lo)
+        result[p] = out
+    return result
+
+
+def _grid(values, shape) -> list:
+    return [[None if np.isnan(v) else round(v, 4) for v in row] for row in values.reshape(shape).tolist()]
+
+
+def compute_heatmap(hall_id: int, first_day=None, last_day=None) -> dict:
+    layout = get_hall_layout(hall_id)
+    seat_ids = np.asarray(layout.seat_ids, dtype=np.int64)
+    rows = np.asarray(layout.rows, dtype=np.int64)
+    numbers = np.asarray(layout.numbers, dtype=np.int64)
+    shape = (int(rows.max()), int(numbers.max())) if len(seat_ids) else (0, 0)
+    size = shape[0] * shape[1]
+    seat_cell = (rows - 1) * shape[1] + (numbers - 1)
+
+    data = load_bookings(hall_id, first_day, last_day)
+    # Map every booked seat to its (row, number) cell through the sorted seat ids.
+    by_id = np.argsort(seat_ids)
+    found = np.searchsorted(seat_ids, data["seat"], sorter=by_id)
+    known = found < len(seat_ids)
+    known[known] = seat_ids[by_id[found[known]]] == data["seat"][known]
+    cells = seat_cell[by_id[found[known]]]
+    ranks = fill_ranks(data["screening"], data["reservation"], data["booked_at"])[known]
+    lead_hours = (data["starts_at"] - data["booked_at"])[known] / 3600
+
+    is_seat = np.zeros(size, dtype=bool)
+    is_seat[seat_cell] = True
+    sold = np.bincount(cells, minlength=size).astype(np.float64)
+    screenings = data["screenings"]
+    occupancy = np.where(is_seat, sold / screenings if screenings else 0.0, np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_rank = np.where(sold > 0, np.bincount(cells, weights=ranks, minlength=size) / sold, np.nan)
+    # 1 for the seat that tends to sell first; seats never sold get no place.
+    fill_order = np.full(size, np.nan)
+    ranked = np.flatnonzero(sold > 0)
+    fill_order[ranked[np.argsort(mean_rank[ranked], kind="stable")]] = np.arange(1, len(ranked) + 1)
+    lead = grouped_percentiles(cells, lead_hours, size)
+
+    return {
+        "hall_id": hall_id,
+        "from": first_day.isoformat() if first_day else None,
+        "to": last_day.isoformat() if last_day else None,
+        "rows": shape[0],
+        "seats_per_row": shape[1],
+        "screenings": screenings,
+        "seats_sold": int(known.sum()),
+        "occupancy": _grid(occupancy, shape),
+        "fill_rank": _grid(mean_rank, shape),
+        "fill_order": _grid(fill_order, shape),
+        "hours_before_show": {f"p{p}": _grid(values, shape) for p, values in lead.items()},
+        "generated_at": timezone.now().isoformat(),
+    }
+
+
+def get_heatmap(hall_id: int, first_day=None, last_day=None) -> dict:
+    """Seat popularity grids for a hall, cached for ANALYTICS_CACHE_SECONDS."""
+    key = _heatmap_key(hall_id, first_day, last_day)
+    heatmap = cache.get(key)
+    if heatmap is None:
+        heatmap = compute_heatmap(hall_id, first_day, last_day)
+        cache.set(key, heatmap, _cache_seconds())
+    return heatmap
@@ -0,0 +1,116 @@
+from array import array
+
+from .holds import get_hold_store
+
+
+class HallLayout:
+    def __init__(self, hall_id: int, seats):
+        self.hall_id = hall_id
+        self.seat_ids = array("q")
+        self.rows = array("I")
+        self.numbers = array("I")
+        self.wheelchair = 0
+        self.bit_of = {}
+        self.position = {}
+        # Bit b is set when seat b+1 sits directly beside it in the same row;
+        # seats arrive ordered by (row, number), so a row is a run of bits.
+        self.adjacent = 0
+        self.row_centers = {}
+
+        for bit, (seat_id, row, number, is_wheelchair) in enumerate(seats):
+            self.seat_ids.append(seat_id)
+            self.rows.append(row)
+            self.numbers.append(number)
+            self.bit_of[seat_id] = bit
+            self.position[(row, number)] = bit
+            if is_wheelchair:
+                self.wheelchair |= 1 << bit
+            if bit and self.rows[bit - 1] == row and self.numbers[bit - 1] == number - 1:
+                self.adjacent |= 1 << (bit - 1)
+            low, high = self.row_centers.get(row, (number, number))
+            self.row_centers[row] = (min(low, number), max(high, number))
+
+        self.row_centers = {row: (low + high) / 2 for row, (low, high) in self.row_centers.items()}
+
+    def __len__(self) -> int:
+        return len(self.seat_ids)
+
+    def __contains__(self, seat_id) -> bool:
+        return seat_id in self.bit_of
+
+    def mask(self, seat_ids) -> int:
+        bit_of = self.bit_of
+        m = 0
+        for seat_id in seat_ids:
+            m |= 1 << bit_of[seat_id]
+        return m
+
+    def unknown(self, seat_ids) -> list:
+        return [seat_id for seat_id in seat_ids if seat_id not in self.bit_of]
+
+    def seat_ids_in(self, mask: int) -> list:
+        ids = []
+        while mask:
+            low = mask & -mask
+            ids.append(self.seat_ids[low.bit_length() - 1])
+            mask ^= low
+        return ids
+
+    def iter_seats(self):
+        for bit in range(len(self.seat_ids)):
+            yield self.seat_ids[bit], self.rows[bit], self.numbers[bit], bool(self.wheelchair >> bit & 1)
+
+
+class SeatAvailability:
+    def __init__(self, layout: HallLayout, reserved: int = 0, holders: dict = None, next_expiry=None):
+        self.layout = layout
+        self.reserved = reserved
+        self.holders = holders or {}
+        self.held = 0
+        for m in self.holders.values():
+            self.held |= m
+        self.next_expiry = next_expiry
+
+    @classmethod
+    def from_db(cls, screening, layout: HallLayout) -> "SeatAvailability":
+        bit_of = layout.bit_of
+
+        reserved = 0
+        for seat_id in screening.reserved_seats.values_list("seat_id", flat=True):
+            if seat_id in bit_of:
+                reserved |= 1 << bit_of[seat_id]
+
+        holders = {}
+        next_expiry = None
+        for seat_id, (held_by, expires_at) in get_hold_store().active(screening.id).items():
+            if seat_id not in bit_of:
+                continue
+            holders[held_by] = holders.get(held_by, 0) | 1 << bit_of[seat_id]
+            if next_expiry is None or expires_at < next_expiry:
+                next_expiry = expires_at
+
+        return cls(layout, reserved, holders, next_expiry)
+
+    def is_reserved(self, seat_id) -> bool:
+        return bool(self.reserved >> self.layout.bit_of[seat_id] & 1)
+
+    def is_held(self, seat_id) -> bool:
+        return bool(self.held >> self.layout.bit_of[seat_id] & 1)
+
+    def held_by(self, client_id: str) -> int:
+        return self.holders.get(client_id, 0) if client_id else 0
+
+    def blocked(self, client_id: str = "") -> int:
+        return self.reserved | (self.held & ~self.held_by(client_id))
+
+    def free(self) -> int:
+        return ((1 << len(self.layout)) - 1) & ~(self.reserved | self.held)
+
+    def all_free(self, seat_ids, client_id: str = "") -> bool:
+        return not self.layout.mask(seat_ids) & self.blocked(client_id)
+
+    def conflicts(self, seat_ids, client_id: str = "") -> tuple:
+        wanted = self.layout.mask(seat_ids)
+        reserved = wanted & self.reserved
+        held = wanted & self.held & ~self.held_by(client_id) & ~reserved
+        return self.layout.seat_ids_in(reserved), self.layout.seat_ids_in(held)
@@ -0,0 +1,290 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .availability import SeatAvailability
+from .layouts import provision_halls
+from .loadtools import percentile
+from .models import Hall, Movie, Reservation, ReservedSeat, Screening, Seat
+from .schedule import cinema_day
+from .seatmap import get_hall_layout
+from .stats import rebuild_stats
+
+PREFIX = "bench-suite "
+SCENARIOS = {}
+
+
+def scenario(name: str):
+    def register(fn):
+        SCENARIOS[name] = fn
+        return fn
+
+    return register
+
+
+def _hall_shape(seats: int) -> tuple:
+    rows = max(1, round((seats / 1.6) ** 0.5))
+    return rows, max(1, round(seats / rows))
+
+
+def seed(scale: float = 1.0, rng: random.Random = None, log=lambda msg: None) -> None:
+    """Seed 20 halls of 300-2,000 seats, thousands of screenings and ~200k booked seats (at scale 1)."""
+    rng = rng or random.Random(0)
+    hall_count = max(2, round(20 * min(scale, 1)))
+    screening_count = max(hall_count, int(2000 * scale))
+    seat_target = int(200_000 * scale)
+
+    for i in range(hall_count):
+        seats = 300 + (1700 * i) // max(1, hall_count - 1)
+        if scale < 0.25:
+            # Tiny scales are for smoke runs; shrink the halls too.
+            seats = max(30, int(seats * scale * 4))
+        rows, per_row = _hall_shape(seats)
+        provision_halls(f"{PREFIX}{i:02d}-", 1, rows, per_row, {"aisles": [per_row // 4 + 1, per_row - per_row // 4]})
+    halls = list(Hall.objects.filter(name__startswith=PREFIX).order_by("name"))
+    log(f"{len(halls)} halls, {sum(h.seat_count for h in halls)} seats")
+
+    movies = Movie.objects.bulk_create([
+        Movie(title=f"{PREFIX}{i}", description="x" * 400, duration_minutes=90 + i % 60) for i in range(40)
+    ])
+
+    now = timezone.now().replace(minute=0, second=0, microsecond=0)
+    first_day = now - timedelta(days=int(300 * min(1, scale * 10)))
+    days = max(1, (now + timedelta(days=30) - first_day).days)
+    per_day = max(1, screening_count // days)
+    screenings = []
+    for day in range(days):
+        for slot in range(per_day):
+            start = first_day + timedelta(days=day, hours=10 + (slot * 14) // per_day)
+            screenings.append(Screening(
+                movie=rng.choice(movies),
+                hall=halls[slot % len(halls)],
+                start_time=start,
+                end_time=start + timedelta(hours=2),
+                language=rng.choice(["SR", "EN"]),
+                is_3d=rng.random() < 0.2,
+                base_price="450.00",
+            ))
+    screenings = Screening.objects.bulk_create(screenings, batch_size=1000)
+    log(f"{len(screenings)} screenings")
+
+    seats_by_hall = {hall.id: list(hall.seats.values_list("id", flat=True)) for hall in halls}
+    booked = 0
+    pending = []
+    for screening in rng.sample(screenings, len(screenings)):
+        if booked >= seat_target:
+            break
+        hall_seats = seats_by_hall[screening.hall_id]
+        taken = rng.sample(hall_seats, int(len(hall_seats) * rng.uniform(0.05, 0.9)))
+        while taken:
+            party, taken = taken[:rng.randint(1, 6)], taken[6:]
+            pending.append(
+                (Reservation(screening=screening, customer_name="Bench", customer_email="bench@example.com"), party)
+            )
+            booked += len(party)
+        if len(pending) > 5000:
+            _flush_bookings(pending)
+    _flush_bookings(pending)
+
+    Screening.objects.filter(hall__name__startswith=PREFIX).update(
+        reserved_count=Coalesce(
+            Subquery(
+                ReservedSeat.objects.filter(screening=OuterRef("pk"))
+                .values("screening")
+                .annotate(n=Count("id"))
+                .values("n")
+            ),
+            Value(0),
+        )
+    )
+    rebuild_stats(cinema_day(first_day), cinema_day(first_day + timedelta(days=days)))
+    log(f"{booked} booked seats")
+
+
+def _flush_bookings(pending: list):
+    reservations = Reservation.objects.bulk_create([r for r, _ in pending], batch_size=1000)
+    ReservedSeat.objects.bulk_create(
+        [
+            ReservedSeat(reservation=reservation, screening_id=reservation.screening_id, seat_id=seat_id)
+            for reservation, (_, party) in zip(reservations, pending)
+            for seat_id in party
+        ],
+        batch_size=5000,
+    )
+    pending.clear()
+
+
+def is_seeded() -> bool:
+    return Screening.objects.filter(hall__name__startswith=PREFIX).exists()
+
+
+def teardown():
+    # Skip the per-row delete signals for bookings and seats: they would
+    # publish a change, adjust a counter or refresh a hall for every row.
+    with transaction.atomic():
+        for model in (ReservedSeat, Reservation):
+            qs = model.objects.filter(screening__hall__name__startswith=PREFIX)
+            qs._raw_delete(qs.db)
+        Screening.objects.filter(hall__name__startswith=PREFIX).delete()
+        seats = Seat.objects.filter(hall__name__startswith=PREFIX)
+        seats._raw_delete(seats.db)
+        Hall.objects.filter(name__startswith=PREFIX).delete()
+    Movie.objects.filter(title__startswith=PREFIX).delete()
+
+
+class Context:
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.client = APIClient()
+        admin, _ = get_user_model().objects.get_or_create(
+            username="bench-suite", defaults={"is_staff": True, "is_superuser": True}
+        )
+        self.admin = APIClient()
+        self.admin.force_authenticate(admin)
+
+        upcoming = Screening.objects.filter(
+            hall__name__startswith=PREFIX, start_time__gte=timezone.now()
+        ).order_by("-hall__seat_count", "start_time")
+        # The largest halls are the slowest seat maps; benchmark against those.
+        self.screenings = list(upcoming.select_related("hall")[:20])
+        if not self.screenings:
+            raise RuntimeError("No upcoming benchmark screenings; seed first.")
+
+    def screening(self):
+        return self.rng.choice(self.screenings)
+
+    def free_seats(self, screening, n: int) -> list:
+        # Read live rather than through the snapshot: self.screenings carries a
+        # seat_version from setup time.
+        availability = SeatAvailability.from_db(screening, get_hall_layout(screening.hall_id))
+        free = availability.layout.seat_ids_in(availability.free())
+        return self.rng.sample(free, n)
+
+
+@scenario("seat_map_cold")
+def _seat_map_cold(ctx):
+    screening = ctx.screening()
+    cache.clear()
+    return lambda: ctx.client.get(f"/api/screenings/{screening.id}/seat-map/")
+
+
+@scenario("seat_map_warm")
+def _seat_map_warm(ctx):
+    screening = ctx.screening()
+    ctx.client.get(f"/api/screenings/{screening.id}/seat-map/")
+    return lambda: ctx.client.get(f"/api/screenings/{screening.id}/seat-map/")
+
+
+@scenario("hold")
+def _hold(ctx):
+    screening = ctx.screening()
+    body = {"client_id": "bench", "seat_ids": ctx.free_seats(screening, 2)}
+    return lambda: ctx.client.post(f"/api/screenings/{screening.id}/hold/", body, format="json")
+
+
+@scenario("release")
+def _release(ctx):
+    screening = ctx.screening()
+    body = {"client_id": "bench", "seat_ids": ctx.free_seats(screening, 2)}
+    ctx.client.post(f"/api/screenings/{screening.id}/hold/", body, format="json")
+    return lambda: ctx.client.post(f"/api/screenings/{screening.id}/release/", body, format="json")
+
+
+@scenario("reservation_create")
+def _reservation_create(ctx):
+    screening = ctx.screening()
+    body = {
+        "screening": screening.id,
+        "customer_name": "Bench",
+        "customer_email": "bench@example.com",
+        "seat_ids": ctx.free_seats(screening, 2),
+    }
+    return lambda: ctx.client.post("/api/reservations/", body, format="json")
+
+
+@scenario("screening_list")
+def _screening_list(ctx):
+    return lambda: ctx.client.get("/api/screenings/", {"page_size": 50})
+
+
+@scenario("screening_list_filtered")
+def _screening_list_filtered(ctx):
+    screening = ctx.screening()
+    params = {"date": timezone.localtime(screening.start_time).date().isoformat(), "hall": screening.hall_id}
+    return lambda: ctx.client.get("/api/screenings/", params)
+
+
+@scenario("reservations_list")
+def _reservations_list(ctx):
+    return lambda: ctx.admin.get("/api/reservations/", {"page_size": 50})
+
+
+@scenario("reservations_list_filtered")
+def _reservations_list_filtered(ctx):
+    return lambda: ctx.admin.get("/api/reservations/", {"screening": ctx.screening().id, "status": "confirmed"})
+
+
+@scenario("sales_stats")
+def _sales_stats(ctx):
+    day = cinema_day(ctx.screening().start_time)
+    params = {"from": (day - timedelta(days=89)).isoformat(), "to": day.isoformat(), "group_by": "movie,language"}
+    return lambda: ctx.admin.get("/api/stats/sales/", params)
+
+
+@scenario("schedule")
+def _schedule(ctx):
+    day = timezone.localtime(ctx.screening().start_time).date().isoformat()
+    return lambda: ctx.client.get("/api/schedule/", {"from": day})
+
+
+def run_suite(iterations: int = 20, names=None, rng: random.Random = None) -> dict:
+    ctx = Context(rng or random.Random(0))
+    results = {}
+    for name in names or SCENARIOS:
+        setup = SCENARIOS[name]
+        timings, queries = [], []
+        for _ in range(iterations):
+            request = setup(ctx)
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                resp = request()
+                timings.append(time.perf_counter() - started)
+            if resp.status_code >= 400:
+                raise RuntimeError(f"{name} returned {resp.status_code}: {getattr(resp, 'data', '')}")
+            queries.append(len(captured))
+        timings.sort()
+        results[name] = {
+            "queries": max(queries),
+            "p50_ms": round(statistics.median(timings) * 1000, 2),
+            "p95_ms": round(percentile(timings, 95) * 1000, 2),
+        }
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float = 0.25, noise_ms: float = 2.0) -> list:
+    """Regressions against a baseline: any extra query, or a p50 slower by more than threshold and noise_ms.
+
+    A scenario missing from the baseline counts too, so new ones cannot slip past the gate unrecorded.
+    """
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            regressions.append(f"{name}: not in the baseline")
+            continue
+        if current["queries"] > before["queries"]:
+            regressions.append(f"{name}: {before['queries']} -> {current['queries']} queries")
+        limit = before["p50_ms"] * (1 + threshold)
+        if current["p50_ms"] > limit and current["p50_ms"] - before["p50_ms"] > noise_ms:
+            regressions.append(f"{name}: p50 {before['p50_ms']} -> {current['p50_ms']} ms")
+    return regressions
@@ -1,13 +1,108 @@
 import json
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+from .models import Screening
+from .publisher import apublish_screening_update
+from .seatmap import aget_seat_map_snapshot, render_seat_map
+from .services import SeatActionError, allocate_seats, extend_holds, hold_seats, release_seats
+
+
+def _hold(screening, client_id, command):
+    return hold_seats(screening, client_id, command.get("seat_ids"), command.get("hold_seconds"), notify=False)
+
+
+def _release(screening, client_id, command):
+    return release_seats(screening, client_id, command.get("seat_ids"), notify=False)
+
+
+def _allocate(screening, client_id, command):
+    return allocate_seats(
+        screening,
+        client_id,
+        command.get("party_size"),
+        command.get("adjacent", True),
+        command.get("wheelchair", 0),
+        command.get("zone"),
+        command.get("hold_seconds"),
+        notify=False,
+    )
+
+
+def _extend(screening, client_id, command):
+    return extend_holds(screening, client_id, command.get("seat_ids"), command.get("hold_seconds")), None
+
+
+ACTIONS = {
+    "hold": _hold,
+    "release": _release,
+    "extend": _extend,
+    "allocate": _allocate,
+}
+
+
 class ScreeningConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.screening_id = self.scope["url_route"]["kwargs"]["screening_id"]
         self.group_name = f"screening_{self.screening_id}"
+        query = parse_qs(self.scope.get("query_string", b"").decode())
+        self.client_id = query.get("client_id", [""])[0]
+
+        # Join before reading the snapshot so no delta newer than it is missed;
+        # clients drop deltas whose seq is not past the snapshot's.
         await self.channel_layer.group_add(self.group_name, self.channel_name)
         await self.accept()
 
+        try:
+            screening = await Screening.objects.select_related("hall").aget(pk=self.screening_id)
+        except Screening.DoesNotExist:
+            await self.close(code=4404)
+            return
+
+        snapshot = await aget_seat_map_snapshot(screening)
+        data, _ = render_seat_map(screening, snapshot, self.client_id)
+        await self.send(text_data=json.dumps({"event": "snapshot", **data}))
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            command = json.loads(text_data or "")
+        except ValueError:
+            command = None
+        if not isinstance(command, dict):
+            await self._ack({}, {"ok": False, "status": 400, "detail": "Commands must be JSON objects."})
+            return
+
+        handler = ACTIONS.get(command.get("action"))
+        if handler is None:
+            await self._ack(command, {"ok": False, "status": 400, "detail": "Unknown action."})
+            return
+
+        try:
+            screening = await Screening.objects.select_related("hall").aget(pk=self.screening_id)
+            data, delta = await database_sync_to_async(handler)(
+                screening, command.get("client_id") or self.client_id, command
+            )
+        except Screening.DoesNotExist:
+            await self._ack(command, {"ok": False, "status": 404, "detail": "Screening not found."})
+            return
+        except SeatActionError as e:
+            await self._ack(command, {"ok": False, "status": e.status_code, **e.as_data()})
+            return
+
+        if delta is not None:
+            await apublish_screening_update(screening.id, delta)
+        await self._ack(command, data)
+
+    async def _ack(self, command, data):
+        await self.send(text_data=json.dumps({
+            "event": "ack",
+            "action": command.get("action"),
+            "request_id": command.get("request_id"),
+            **data,
+        }))
+
     async def disconnect(self, close_code):
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
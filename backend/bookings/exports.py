@@ -0,0 +1,142 @@
+import csv
+import io
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+
+from .models import ReservedSeat
+
+FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+RESERVATION_COLUMNS = [
+    ("id", "id"),
+    ("created_at", "created_at"),
+    ("status", "status"),
+    ("customer_name", "customer_name"),
+    ("customer_email", "customer_email"),
+    ("screening_id", "screening_id"),
+    ("movie", "screening__movie__title"),
+    ("hall", "screening__hall__name"),
+    ("start_time", "screening__start_time"),
+    ("base_price", "screening__base_price"),
+    ("seats", "seats"),
+]
+
+MANIFEST_COLUMNS = [
+    ("row", "seat__row"),
+    ("number", "seat__number"),
+    ("seat_id", "seat_id"),
+    ("is_wheelchair", "seat__is_wheelchair"),
+    ("reservation_id", "reservation_id"),
+    ("status", "reservation__status"),
+    ("customer_name", "reservation__customer_name"),
+    ("customer_email", "reservation__customer_email"),
+]
+
+# Rows are buffered up to this many characters before a chunk is yielded.
+FLUSH_AT = 64 * 1024
+
+
+def _chunk_size() -> int:
+    return int(getattr(settings, "EXPORT_CHUNK_SIZE", 2000))
+
+
+def reservation_rows(queryset):
+    # A correlated count keeps the rows streaming in index order; a GROUP BY
+    # would have to aggregate the whole range before the first row.
+    seats = (
+        ReservedSeat.objects.filter(reservation=OuterRef("pk"))
+        .order_by()
+        .values("reservation")
+        .annotate(n=Count("id"))
+        .values("n")
+    )
+    queryset = queryset.annotate(
+        seats=Coalesce(Subquery(seats, output_field=IntegerField()), Value(0))
+    ).order_by("created_at", "id")
+    return queryset.values_list(*[field for _, field in RESERVATION_COLUMNS]).iterator(chunk_size=_chunk_size())
+
+
+def manifest_rows(screening):
+    queryset = ReservedSeat.objects.filter(screening=screening).order_by("seat__row", "seat__number")
+    return queryset.values_list(*[field for _, field in MANIFEST_COLUMNS]).iterator(chunk_size=_chunk_size())
+
+
+def _cell(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def iter_csv(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return value
+
+    writer.writerow([name for name, _ in columns])
+    yield flush()
+    for row in rows:
+        writer.writerow([_cell(v) for v in row])
+        if buffer.tell() >= FLUSH_AT:
+            yield flush()
+    if buffer.tell():
+        yield flush()
+
+
+def iter_ndjson(columns, rows):
+    names = [name for name, _ in columns]
+    encoder = DjangoJSONEncoder(separators=(",", ":"))
+    lines = []
+    size = 0
+    for row in rows:
+        line = encoder.encode({name: v.isoformat() if isinstance(v, datetime) else v for name, v in zip(names, row)})
+        lines.append(line)
+        size += len(line) + 1
+        if size >= FLUSH_AT:
+            yield "\n".join(lines) + "\n"
+            lines, size = [], 0
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def iter_export(fmt: str, columns, rows):
+    if fmt == "ndjson":
+        return iter_ndjson(columns, rows)
+    return iter_csv(columns, rows)
+
+
+async def _aiter(chunks):
+    # Under ASGI Django would buffer a sync iterator into a list before
+    # sending it; pull one chunk at a time instead. Each pull runs on the
+    # request's thread, so the server-side cursor stays on one connection.
+    chunks = iter(chunks)
+    while True:
+        chunk = await sync_to_async(next)(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def stream_export(request, fmt: str, columns, rows, filename: str) -> StreamingHttpResponse:
+    chunks = iter_export(fmt, columns, rows)
+    if isinstance(getattr(request, "_request", request), ASGIRequest):
+        chunks = _aiter(chunks)
+    resp = StreamingHttpResponse(chunks, content_type=FORMATS[fmt])
+    resp["Content-Disposition"] = f'attachment; filename="{filename}.{fmt}"'
+    return resp
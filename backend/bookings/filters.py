@@ -0,0 +1,92 @@
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from .models import Reservation, Screening
+from .schedule import day_bounds
+
+TRUE_VALUES = {"1", "true", "yes"}
+FALSE_VALUES = {"0", "false", "no"}
+
+
+def _parse_moment(name: str, value: str, end_of_day: bool = False):
+    try:
+        day = parse_date(value)
+        moment = datetime.combine(day, time.max if end_of_day else time.min) if day else parse_datetime(value)
+    except ValueError:
+        moment = None
+    if moment is None:
+        raise ValidationError({name: "Expected an ISO date or datetime."})
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _parse_day(name: str, value: str):
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise ValidationError({name: "Expected an ISO date."})
+    return day
+
+
+def _parse_ids(name: str, value: str) -> list:
+    try:
+        return [int(v) for v in value.split(",") if v.strip()]
+    except ValueError:
+        raise ValidationError({name: "Expected a comma separated list of ids."})
+
+
+def filter_screenings(queryset, params):
+    if params.get("date"):
+        queryset = queryset.filter(
+            start_time__gte=_parse_moment("date", params["date"]),
+            start_time__lte=_parse_moment("date", params["date"], end_of_day=True),
+        )
+    if params.get("starts_after"):
+        queryset = queryset.filter(start_time__gte=_parse_moment("starts_after", params["starts_after"]))
+    if params.get("starts_before"):
+        queryset = queryset.filter(
+            start_time__lte=_parse_moment("starts_before", params["starts_before"], end_of_day=True)
+        )
+    if params.get("movie"):
+        queryset = queryset.filter(movie_id__in=_parse_ids("movie", params["movie"]))
+    if params.get("hall"):
+        queryset = queryset.filter(hall_id__in=_parse_ids("hall", params["hall"]))
+    if params.get("language"):
+        languages = params["language"].upper().split(",")
+        if not set(languages) <= set(Screening.Language.values):
+            raise ValidationError({"language": f"Expected one of {', '.join(Screening.Language.values)}."})
+        queryset = queryset.filter(language__in=languages)
+    if params.get("is_3d"):
+        value = params["is_3d"].lower()
+        if value not in TRUE_VALUES | FALSE_VALUES:
+            raise ValidationError({"is_3d": "Expected true or false."})
+        queryset = queryset.filter(is_3d=value in TRUE_VALUES)
+    return queryset
+
+
+def filter_reservations(queryset, params):
+    if params.get("screening"):
+        queryset = queryset.filter(screening_id__in=_parse_ids("screening", params["screening"]))
+    if params.get("status"):
+        statuses = params["status"].upper().split(",")
+        if not set(statuses) <= set(Reservation.Status.values):
+            raise ValidationError({"status": f"Expected one of {', '.join(Reservation.Status.values)}."})
+        queryset = queryset.filter(status__in=statuses)
+    if params.get("date"):
+        start, end = day_bounds(_parse_day("date", params["date"]))
+        queryset = queryset.filter(created_at__gte=start, created_at__lt=end)
+    if params.get("email"):
+        queryset = queryset.filter(customer_email__iexact=params["email"].strip())
+    if params.get("created_after"):
+        queryset = queryset.filter(created_at__gte=_parse_moment("created_after", params["created_after"]))
+    if params.get("created_before"):
+        queryset = queryset.filter(
+            created_at__lte=_parse_moment("created_before", params["created_before"], end_of_day=True)
+        )
+    return queryset
@@ -0,0 +1,388 @@
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction, IntegrityError
+from django.db.models import Count, Q
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import SeatHold
+from .occupancy import adjust_occupancy
+
+
+class HoldStore(ABC):
+    @abstractmethod
+    def acquire(self, screening_id: int, seat_ids, client_id: str, expires_at) -> list:
+        """Hold every seat or none; returns the seat ids held by someone else."""
+
+    @abstractmethod
+    def release(self, screening_id: int, seat_ids, client_id: str) -> list:
+        ...
+
+    @abstractmethod
+    def extend(self, screening_id: int, seat_ids, client_id: str, expires_at) -> list:
+        """Push back the expiry of the caller's live holds; returns the extended seat ids."""
+
+    @abstractmethod
+    def active(self, screening_id: int) -> dict:
+        """Map of seat id to (held_by, expires_at) for live holds."""
+
+    def active_many(self, screening_ids) -> dict:
+        """active() for several screenings; stores override it to fetch them together."""
+        return {screening_id: self.active(screening_id) for screening_id in screening_ids}
+
+    @abstractmethod
+    def conflicts(self, screening_id: int, seat_ids, client_id: str) -> set:
+        ...
+
+    def held_queryset(self, screening_id: int, seat_ids, client_id: str):
+        return None
+
+    @abstractmethod
+    def claim(self, screening_id: int, seat_ids, client_id: str) -> set:
+        ...
+
+    @abstractmethod
+    def consume(self, screening_id: int, seat_ids, client_id: str):
+        ...
+
+    @abstractmethod
+    def purge_expired(self, batch_size: int) -> dict:
+        """Drop lapsed holds; returns the freed seat ids per screening."""
+
+    @abstractmethod
+    def hold_counts(self, screening_ids) -> dict:
+        """Hold records per screening, lapsed but not yet purged ones included."""
+
+
+class DatabaseHoldStore(HoldStore):
+    def acquire(self, screening_id, seat_ids, client_id, expires_at):
+        now = timezone.now()
+        with transaction.atomic():
+            conflicts = set(self.held_queryset(screening_id, seat_ids, client_id).values_list("seat_id", flat=True))
+            if conflicts:
+                return sorted(conflicts)
+
+            replaced, _ = SeatHold.objects.filter(screening_id=screening_id, seat_id__in=seat_ids).filter(
+                Q(held_by=client_id) | Q(expires_at__lte=now)
+            ).delete()
+
+            try:
+                with transaction.atomic():
+                    created = SeatHold.objects.bulk_create([
+                        SeatHold(screening_id=screening_id, seat_id=sid, held_by=client_id, expires_at=expires_at)
+                        for sid in set(seat_ids)
+                    ])
+            except IntegrityError:
+                adjust_occupancy(screening_id, held=-replaced)
+                return sorted(self.conflicts(screening_id, seat_ids, client_id) or seat_ids)
+            adjust_occupancy(screening_id, held=len(created) - replaced)
+        return []
+
+    def release(self, screening_id, seat_ids, client_id):
+        holds = SeatHold.objects.filter(screening_id=screening_id, seat_id__in=seat_ids, held_by=client_id)
+        with transaction.atomic():
+            released = list(holds.select_for_update().values_list("seat_id", flat=True))
+            SeatHold.objects.filter(screening_id=screening_id, seat_id__in=released, held_by=client_id).delete()
+            adjust_occupancy(screening_id, held=-len(released))
+        return released
+
+    def extend(self, screening_id, seat_ids, client_id, expires_at):
+        holds = SeatHold.objects.filter(
+            screening_id=screening_id,
+            seat_id__in=seat_ids,
+            held_by=client_id,
+            expires_at__gt=timezone.now(),
+        )
+        with transaction.atomic():
+            extended = list(holds.select_for_update().values_list("seat_id", flat=True))
+            SeatHold.objects.filter(screening_id=screening_id, seat_id__in=extended, held_by=client_id).update(
+                expires_at=expires_at
+            )
+        return sorted(extended)
+
+    def active(self, screening_id):
+        return self.active_many([screening_id])[screening_id]
+
+    def active_many(self, screening_ids):
+        holds = {screening_id: {} for screening_id in screening_ids}
+        for screening_id, seat_id, held_by, expires_at in SeatHold.objects.filter(
+            screening_id__in=holds, expires_at__gt=timezone.now()
+        ).values_list("screening_id", "seat_id", "held_by", "expires_at"):
+            holds[screening_id][seat_id] = (held_by, expires_at)
+        return holds
+
+    def held_queryset(self, screening_id, seat_ids, client_id):
+        return SeatHold.objects.filter(
+            screening_id=screening_id,
+            seat_id__in=seat_ids,
+            expires_at__gt=timezone.now(),
+        ).exclude(held_by=client_id)
+
+    def conflicts(self, screening_id, seat_ids, client_id):
+        return set(self.held_queryset(screening_id, seat_ids, client_id).values_list("seat_id", flat=True))
+
+    def claim(self, screening_id, seat_ids, client_id):
+        # Locks the caller's live holds so a sweep or release cannot drop them
+        # mid-booking; rows another request already locked are skipped.
+        return set(
+            SeatHold.objects.select_for_update(skip_locked=True)
+            .filter(screening_id=screening_id, seat_id__in=seat_ids, held_by=client_id, expires_at__gt=timezone.now())
+            .values_list("seat_id", flat=True)
+        )
+
+    def consume(self, screening_id, seat_ids, client_id):
+        consumed, _ = SeatHold.objects.filter(
+            screening_id=screening_id, seat_id__in=seat_ids, held_by=client_id
+        ).delete()
+        adjust_occupancy(screening_id, held=-consumed)
+
+    def purge_expired(self, batch_size):
+        now = timezone.now()
+        purged = {}
+
+        while True:
+            # Lock the batch so a concurrent acquire replacing one of these rows
+            # waits and sees it gone, keeping held_count exact.
+            with transaction.atomic():
+                batch = list(
+                    SeatHold.objects.select_for_update(skip_locked=True)
+                    .filter(expires_at__lte=now)
+                    .order_by("expires_at")
+                    .values_list("id", "screening_id", "seat_id")[:batch_size]
+                )
+                if not batch:
+                    break
+
+                SeatHold.objects.filter(id__in=[hold_id for hold_id, _, _ in batch]).delete()
+                freed = {}
+                for _, screening_id, seat_id in batch:
+                    freed.setdefault(screening_id, []).append(seat_id)
+                for screening_id, seat_ids in freed.items():
+                    adjust_occupancy(screening_id, held=-len(seat_ids))
+                    purged.setdefault(screening_id, []).extend(seat_ids)
+
+            if len(batch) < batch_size:
+                break
+        return purged
+
+    def hold_counts(self, screening_ids):
+        return dict(
+            SeatHold.objects.filter(screening_id__in=screening_ids)
+            .values("screening_id")
+            .annotate(n=Count("id"))
+            .values_list("screening_id", "n")
+        )
+
+
+ACQUIRE_SCRIPT = """
+local n = #ARGV - 3
+local result = {0}
+for i = 1, n do
+    local owner = redis.call('GET', KEYS[i])
+    if owner and owner ~= ARGV[1] then
+        table.insert(result, ARGV[3 + i])
+    end
+end
+if #result > 1 then
+    return result
+end
+for i = 1, n do
+    redis.call('SET', KEYS[i], ARGV[1], 'PX', ARGV[2])
+    result[1] = result[1] + redis.call('SADD', KEYS[n + 1], ARGV[3 + i])
+end
+redis.call('SADD', KEYS[n + 2], ARGV[3])
+return result
+"""
+
+RELEASE_SCRIPT = """
+local released = {}
+for i = 1, #ARGV - 1 do
+    if redis.call('GET', KEYS[i]) == ARGV[1] then
+        redis.call('DEL', KEYS[i])
+        redis.call('SREM', KEYS[#KEYS], ARGV[1 + i])
+        table.insert(released, ARGV[1 + i])
+    end
+end
+return released
+"""
+
+EXTEND_SCRIPT = """
+local extended = {}
+for i = 1, #ARGV - 2 do
+    if redis.call('GET', KEYS[i]) == ARGV[1] then
+        redis.call('PEXPIRE', KEYS[i], ARGV[2])
+        table.insert(extended, ARGV[2 + i])
+    end
+end
+return extended
+"""
+
+PURGE_SCRIPT = """
+local n = #KEYS - 2
+local gone = {}
+for i = 1, n do
+    if redis.call('EXISTS', KEYS[i]) == 0 and redis.call('SREM', KEYS[n + 1], ARGV[1 + i]) == 1 then
+        table.insert(gone, ARGV[1 + i])
+    end
+end
+if redis.call('SCARD', KEYS[n + 1]) == 0 then
+    redis.call('SREM', KEYS[n + 2], ARGV[1])
+end
+return gone
+"""
+
+
+class RedisHoldStore(HoldStore):
+    def __init__(self, client=None, prefix: str = None):
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(getattr(settings, "SEAT_HOLD_REDIS_URL", settings.REDIS_URL))
+        self.redis = client
+        self.prefix = prefix if prefix is not None else getattr(settings, "SEAT_HOLD_REDIS_PREFIX", "cinema:")
+        self._acquire = self.redis.register_script(ACQUIRE_SCRIPT)
+        self._release = self.redis.register_script(RELEASE_SCRIPT)
+        self._extend = self.redis.register_script(EXTEND_SCRIPT)
+        self._purge = self.redis.register_script(PURGE_SCRIPT)
+
+    def _seat_key(self, screening_id, seat_id) -> str:
+        return f"{self.prefix}hold:{screening_id}:{seat_id}"
+
+    def _index_key(self, screening_id) -> str:
+        return f"{self.prefix}holds:{screening_id}"
+
+    def _screenings_key(self) -> str:
+        return f"{self.prefix}holds:screenings"
+
+    def _owners(self, screening_id, seat_ids) -> dict:
+        seat_ids = list(seat_ids)
+        if not seat_ids:
+            return {}
+        values = self.redis.mget([self._seat_key(screening_id, sid) for sid in seat_ids])
+        return {sid: v.decode() for sid, v in zip(seat_ids, values) if v is not None}
+
+    def acquire(self, screening_id, seat_ids, client_id, expires_at):
+        seat_ids = sorted(set(seat_ids))
+        ttl_ms = max(1, int((expires_at - timezone.now()).total_seconds() * 1000))
+        keys = [self._seat_key(screening_id, sid) for sid in seat_ids]
+        keys += [self._index_key(screening_id), self._screenings_key()]
+        # The first element counts seats newly added to the index; the rest
+        # are conflicting seat ids.
+        added, *conflicts = self._acquire(keys=keys, args=[client_id, ttl_ms, screening_id, *seat_ids])
+        adjust_occupancy(screening_id, held=added)
+        return sorted(int(sid) for sid in conflicts)
+
+    def release(self, screening_id, seat_ids, client_id):
+        seat_ids = sorted(set(seat_ids))
+        if not seat_ids:
+            return []
+        keys = [self._seat_key(screening_id, sid) for sid in seat_ids] + [self._index_key(screening_id)]
+        released = [int(sid) for sid in self._release(keys=keys, args=[client_id, *seat_ids])]
+        adjust_occupancy(screening_id, held=-len(released))
+        return released
+
+    def extend(self, screening_id, seat_ids, client_id, expires_at):
+        seat_ids = sorted(set(seat_ids))
+        if not seat_ids:
+            return []
+        ttl_ms = max(1, int((expires_at - timezone.now()).total_seconds() * 1000))
+        keys = [self._seat_key(screening_id, sid) for sid in seat_ids]
+        return sorted(int(sid) for sid in self._extend(keys=keys, args=[client_id, ttl_ms, *seat_ids]))
+
+    def active(self, screening_id):
+        return self.active_many([screening_id])[screening_id]
+
+    def active_many(self, screening_ids):
+        screening_ids = list(screening_ids)
+        pipe = self.redis.pipeline(transaction=False)
+        for screening_id in screening_ids:
+            pipe.smembers(self._index_key(screening_id))
+        indexed = [
+            (screening_id, int(sid))
+            for screening_id, members in zip(screening_ids, pipe.execute())
+            for sid in members
+        ]
+
+        holds = {screening_id: {} for screening_id in screening_ids}
+        if not indexed:
+            return holds
+        pipe = self.redis.pipeline(transaction=False)
+        for screening_id, sid in indexed:
+            key = self._seat_key(screening_id, sid)
+            pipe.get(key)
+            pipe.pttl(key)
+        results = pipe.execute()
+
+        now_ms = timezone.now().timestamp() * 1000
+        for i, (screening_id, sid) in enumerate(indexed):
+            owner, ttl = results[2 * i], results[2 * i + 1]
+            if owner is not None and ttl > 0:
+                expires_at = datetime.fromtimestamp((now_ms + ttl) / 1000, tz=dt_timezone.utc)
+                holds[screening_id][sid] = (owner.decode(), expires_at)
+        return holds
+
+    def conflicts(self, screening_id, seat_ids, client_id):
+        return {sid for sid, owner in self._owners(screening_id, seat_ids).items() if owner != client_id}
+
+    def claim(self, screening_id, seat_ids, client_id):
+        return {sid for sid, owner in self._owners(screening_id, seat_ids).items() if owner == client_id}
+
+    def consume(self, screening_id, seat_ids, client_id):
+        # Redis is outside the DB transaction: only drop the holds once the
+        # booking is durable.
+        seat_ids = list(seat_ids)
+        transaction.on_commit(lambda: self.release(screening_id, seat_ids, client_id))
+
+    def purge_expired(self, batch_size):
+        purged = {}
+        for raw in self.redis.smembers(self._screenings_key()):
+            screening_id = int(raw)
+            index = self._index_key(screening_id)
+            seat_ids = [int(sid) for sid in self.redis.smembers(index)][:batch_size]
+            # Checking and dropping in one script keeps a seat re-held between
+            # the two steps in the index, and the screening in the set.
+            keys = [self._seat_key(screening_id, sid) for sid in seat_ids] + [index, self._screenings_key()]
+            gone = sorted(int(sid) for sid in self._purge(keys=keys, args=[screening_id, *seat_ids]))
+            if gone:
+                adjust_occupancy(screening_id, held=-len(gone))
+                purged[screening_id] = gone
+        return purged
+
+    def hold_counts(self, screening_ids):
+        screening_ids = list(screening_ids)
+        pipe = self.redis.pipeline(transaction=False)
+        for sid in screening_ids:
+            pipe.scard(self._index_key(sid))
+        return {sid: n for sid, n in zip(screening_ids, pipe.execute()) if n}
+
+
+_stores = {}
+
+
+def get_hold_store() -> HoldStore:
+    path = getattr(settings, "SEAT_HOLD_BACKEND", "bookings.holds.DatabaseHoldStore")
+    if path not in _stores:
+        _stores[path] = import_string(path)()
+    return _stores[path]
+
+
+@receiver(setting_changed)
+def _reset_hold_stores(setting, **kwargs):
+    if setting.startswith("SEAT_HOLD_"):
+        _stores.clear()
+
+
+def sweep_expired_holds(batch_size: int = None) -> dict:
+    from .seatmap import publish_seat_change
+
+    batch_size = batch_size or int(getattr(settings, "SEAT_HOLD_SWEEP_BATCH_SIZE", 500))
+    swept = get_hold_store().purge_expired(batch_size)
+
+    for screening_id, seat_ids in swept.items():
+        with transaction.atomic():
+            publish_seat_change(screening_id, seat_ids, "free")
+    return swept
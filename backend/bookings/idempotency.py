@@ -0,0 +1,162 @@
+import functools
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.throttling import BaseThrottle
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+PENDING = "pending"
+
+
+def _cache():
+    return caches[getattr(settings, "IDEMPOTENCY_CACHE", "default")]
+
+
+def _ttl() -> int:
+    return int(getattr(settings, "IDEMPOTENCY_KEY_TTL", 86400))
+
+
+def _lock_seconds() -> int:
+    return int(getattr(settings, "IDEMPOTENCY_LOCK_SECONDS", 30))
+
+
+def _fingerprint(method: str, path: str, data) -> str:
+    body = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(f"{method}:{path}:{body}".encode()).hexdigest()
+
+
+def _caller(request, user, data) -> str:
+    """Who a key belongs to: the user, else the anonymous client's hold id, booking email or address."""
+    if user is not None and user.is_authenticated:
+        return f"user:{user.pk}"
+    if isinstance(data, dict):
+        for field in ("client_id", "customer_email"):
+            if data.get(field):
+                return f"{field}:{data[field]}"
+    return f"ip:{BaseThrottle().get_ident(request)}"
+
+
+def _cache_key(scope: str, path: str, caller: str, key: str) -> str:
+    # Keys are chosen by clients, so scope them to the endpoint and caller and
+    # hash them to keep arbitrary input out of the cache key.
+    digest = hashlib.sha256(f"{scope}:{path}:{caller}:{key}".encode()).hexdigest()
+    return f"bookings:idempotency:{digest}"
+
+
+def _bad_key(key: str):
+    if len(key) > MAX_KEY_LENGTH:
+        return {"detail": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters."}, status.HTTP_400_BAD_REQUEST, {}
+    return None
+
+
+def _early(entry, fingerprint: str):
+    """The (data, status, headers) to answer with when the key is already taken; None runs the request."""
+    if entry is None:
+        # The entry expired between add and get.
+        return None
+    if entry["fingerprint"] != fingerprint:
+        return (
+            {"detail": f"{HEADER} was already used with a different request."},
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+            {},
+        )
+    if entry["state"] == PENDING:
+        return {"detail": "A request with this key is still being processed."}, status.HTTP_409_CONFLICT, {"Retry-After": "1"}
+    return entry["data"], entry["status"], {"Idempotent-Replayed": "true"}
+
+
+def _done(fingerprint: str, status_code: int, data) -> dict:
+    return {"state": "done", "fingerprint": fingerprint, "status": status_code, "data": data}
+
+
+def _respond(response_class, data, status_code: int, headers: dict):
+    resp = response_class(data, status=status_code)
+    for name, value in headers.items():
+        resp[name] = value
+    return resp
+
+
+def idempotent(scope: str):
+    """Replay the stored response when a request is retried with the same Idempotency-Key."""
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(self, request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return view(self, request, *args, **kwargs)
+            if _bad_key(key):
+                return _respond(Response, *_bad_key(key))
+
+            cache = _cache()
+            cache_key = _cache_key(scope, request.path, _caller(request, request.user, request.data), key)
+            fingerprint = _fingerprint(request.method, request.path, request.data)
+
+            if not cache.add(cache_key, {"state": PENDING, "fingerprint": fingerprint}, _lock_seconds()):
+                early = _early(cache.get(cache_key), fingerprint)
+                if early is not None:
+                    return _respond(Response, *early)
+
+            try:
+                resp = view(self, request, *args, **kwargs)
+            except Exception:
+                cache.delete(cache_key)
+                raise
+
+            if resp.status_code >= 500:
+                cache.delete(cache_key)
+            else:
+                cache.set(cache_key, _done(fingerprint, resp.status_code, resp.data), _ttl())
+            return resp
+
+        return wrapper
+
+    return decorator
+
+
+def aidempotent(scope: str):
+    """idempotent() for plain async views that take a JSON body and return a JsonResponse."""
+
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return await view(request, *args, **kwargs)
+            if _bad_key(key):
+                return _respond(JsonResponse, *_bad_key(key))
+
+            try:
+                data = json.loads(request.body or b"{}")
+            except ValueError:
+                data = request.body.decode(errors="replace")
+            cache = _cache()
+            cache_key = _cache_key(scope, request.path, _caller(request, await request.auser(), data), key)
+            fingerprint = _fingerprint(request.method, request.path, data)
+
+            if not await cache.aadd(cache_key, {"state": PENDING, "fingerprint": fingerprint}, _lock_seconds()):
+                early = _early(await cache.aget(cache_key), fingerprint)
+                if early is not None:
+                    return _respond(JsonResponse, *early)
+
+            try:
+                resp = await view(request, *args, **kwargs)
+            except Exception:
+                await cache.adelete(cache_key)
+                raise
+
+            if resp.status_code >= 500:
+                await cache.adelete(cache_key)
+            else:
+                await cache.aset(cache_key, _done(fingerprint, resp.status_code, json.loads(resp.content)), _ttl())
+            return resp
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,287 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, ProtectedError
+
+from .models import Hall, Seat
+from .occupancy import refresh_seat_counts
+from .seatmap import invalidate_hall_layout
+
+CSV_HEADER = ["hall", "row", "number", "is_wheelchair"]
+
+
+class LayoutError(ValueError):
+    pass
+
+
+def _batch_size() -> int:
+    return int(getattr(settings, "SEAT_BULK_BATCH_SIZE", 1000))
+
+
+def _positions(value, name: str) -> set:
+    try:
+        return {(int(row), int(number)) for row, number in value or []}
+    except (TypeError, ValueError):
+        raise LayoutError(f"{name} must be a list of [row, number] pairs.")
+
+
+def normalize_layout(layout, total_rows: int, seats_per_row: int) -> dict:
+    """Validate a layout spec and return it in canonical, sorted form."""
+    if not isinstance(layout, dict):
+        raise LayoutError("layout must be an object.")
+
+    try:
+        aisles = {int(n) for n in layout.get("aisles") or []}
+    except (TypeError, ValueError):
+        raise LayoutError("aisles must be a list of seat positions.")
+    gaps = _positions(layout.get("gaps"), "gaps")
+    wheelchair = _positions(layout.get("wheelchair"), "wheelchair")
+
+    if any(not 1 <= n <= seats_per_row for n in aisles):
+        raise LayoutError("aisles must lie within the row.")
+    for name, positions in (("gaps", gaps), ("wheelchair", wheelchair)):
+        if any(not (1 <= row <= total_rows and 1 <= n <= seats_per_row) for row, n in positions):
+            raise LayoutError(f"{name} must lie within the hall.")
+    if any(n in aisles or (row, n) in gaps for row, n in wheelchair):
+        raise LayoutError("wheelchair positions cannot be in a gap or aisle.")
+
+    return {
+        "aisles": sorted(aisles),
+        "gaps": sorted([row, n] for row, n in gaps),
+        "wheelchair": sorted([row, n] for row, n in wheelchair),
+    }
+
+
+def hall_shape(hall: Hall) -> tuple:
+    """The dimensions and normalized layout that decide a hall's seats."""
+    try:
+        layout = normalize_layout(hall.layout, hall.total_rows, hall.seats_per_row)
+    except LayoutError:
+        layout = None
+    return hall.total_rows, hall.seats_per_row, layout
+
+
+def iter_layout_seats(hall: Hall, layout: dict = None):
+    layout = normalize_layout(layout if layout is not None else hall.layout, hall.total_rows, hall.seats_per_row)
+    aisles = set(layout["aisles"])
+    gaps = {tuple(p) for p in layout["gaps"]}
+    wheelchair = {tuple(p) for p in layout["wheelchair"]}
+
+    for row in range(1, hall.total_rows + 1):
+        for number in range(1, hall.seats_per_row + 1):
+            if number in aisles or (row, number) in gaps:
+                continue
+            yield Seat(hall=hall, row=row, number=number, is_wheelchair=(row, number) in wheelchair)
+
+
+def seat_counts(hall_ids) -> dict:
+    return dict(
+        Seat.objects.filter(hall_id__in=hall_ids).values("hall_id").annotate(n=Count("id")).values_list("hall_id", "n")
+    )
+
+
+def bulk_create_seats(seats, batch_size: int = None):
+    # Feed bulk_create a bounded slice at a time so a multiplex-sized stream
+    # never sits in memory as model instances all at once. ignore_conflicts
+    # does not report which rows went in: callers count before and after.
+    batch_size = batch_size or _batch_size()
+    seats = iter(seats)
+    while True:
+        batch = list(islice(seats, batch_size))
+        if not batch:
+            return
+        Seat.objects.bulk_create(batch, batch_size=batch_size, ignore_conflicts=True)
+
+
+def generate_seats(hall: Hall, layout: dict = None, replace: bool = False) -> int:
+    """Create the seats described by the hall's layout; replace also drops or updates seats that no longer match."""
+    seats = iter_layout_seats(hall, layout)
+    with transaction.atomic():
+        if replace:
+            seats = _sync_existing(hall, list(seats))
+        before = hall.seats.count()
+        bulk_create_seats(seats)
+        created = hall.seats.count() - before
+    invalidate_hall_layout(hall.id)
+    return created
+
+
+def _sync_existing(hall: Hall, seats: list) -> list:
+    # Seats that survive a re-import keep their ids, so bookings pointing at
+    # them stay valid; only the difference is written.
+    existing = {
+        (row, number): (pk, is_wheelchair)
+        for pk, row, number, is_wheelchair in hall.seats.values_list("id", "row", "number", "is_wheelchair")
+    }
+    wanted = {(seat.row, seat.number): seat for seat in seats}
+
+    stale = [pk for position, (pk, _) in existing.items() if position not in wanted]
+    if stale:
+        try:
+            Seat.objects.filter(pk__in=stale).delete()
+        except ProtectedError:
+            raise LayoutError(f"{hall.name}: seats removed by the new layout have bookings or holds.")
+
+    for flag in (True, False):
+        changed = [
+            existing[position][0]
+            for position, seat in wanted.items()
+            if position in existing and seat.is_wheelchair is flag and existing[position][1] is not flag
+        ]
+        if changed:
+            Seat.objects.filter(pk__in=changed).update(is_wheelchair=flag)
+
+    return [seat for position, seat in wanted.items() if position not in existing]
+
+
+def export_layout(hall: Hall) -> dict:
+    """Compact layout spec rebuilt from the hall's actual seats."""
+    present = {}
+    for row, number, is_wheelchair in hall.seats.values_list("row", "number", "is_wheelchair").iterator():
+        present[(row, number)] = is_wheelchair
+
+    rows = range(1, hall.total_rows + 1)
+    aisles = [
+        n for n in range(1, hall.seats_per_row + 1)
+        if all((row, n) not in present for row in rows)
+    ]
+    aisle_set = set(aisles)
+    gaps = [
+        [row, n] for row in rows for n in range(1, hall.seats_per_row + 1)
+        if n not in aisle_set and (row, n) not in present
+    ]
+    return {
+        "name": hall.name,
+        "total_rows": hall.total_rows,
+        "seats_per_row": hall.seats_per_row,
+        "aisles": aisles,
+        "gaps": gaps,
+        "wheelchair": sorted([row, n] for (row, n), flag in present.items() if flag),
+    }
+
+
+def iter_layout_csv(halls):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return value
+
+    writer.writerow(CSV_HEADER)
+    yield flush()
+    seats = (
+        Seat.objects.filter(hall__in=halls)
+        .order_by("hall__name", "row", "number")
+        .values_list("hall__name", "row", "number", "is_wheelchair")
+    )
+    for name, row, number, is_wheelchair in seats.iterator(chunk_size=_batch_size()):
+        writer.writerow([name, row, number, int(is_wheelchair)])
+        yield flush()
+
+
+def iter_layout_jsonl(halls):
+    for hall in halls.iterator():
+        yield json.dumps(export_layout(hall), separators=(",", ":")) + "\n"
+
+
+def import_layouts_jsonl(lines, replace: bool = False) -> dict:
+    """Create or update halls from one compact spec per line; returns seats created per hall name."""
+    created = {}
+    for lineno, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            spec = json.loads(line)
+            name, total_rows, seats_per_row = spec["name"], int(spec["total_rows"]), int(spec["seats_per_row"])
+        except (ValueError, KeyError, TypeError):
+            raise LayoutError(f"line {lineno}: expected an object with name, total_rows and seats_per_row.")
+
+        layout = normalize_layout(spec, total_rows, seats_per_row)
+        hall, _ = Hall.objects.update_or_create(
+            name=name,
+            defaults={"total_rows": total_rows, "seats_per_row": seats_per_row, "layout": layout},
+        )
+        created[name] = generate_seats(hall, replace=replace)
+    return created
+
+
+def import_layouts_csv(lines, replace: bool = False) -> dict:
+    """Create seats from hall,row,number,is_wheelchair rows; returns seats created per hall name.
+
+    Missing halls are created to fit. With replace the file is the whole
+    layout of every hall it names: their other seats are dropped and the
+    halls shrink to fit.
+    """
+    reader = csv.DictReader(lines)
+    if reader.fieldnames != CSV_HEADER:
+        raise LayoutError(f"expected CSV header {','.join(CSV_HEADER)}.")
+
+    halls = {hall.name: hall for hall in Hall.objects.all()}
+    touched = {}
+
+    def seats():
+        for lineno, record in enumerate(reader, 2):
+            try:
+                row, number = int(record["row"]), int(record["number"])
+                is_wheelchair = record["is_wheelchair"].strip().lower() in ("1", "true", "yes")
+            except (TypeError, ValueError, AttributeError):
+                raise LayoutError(f"line {lineno}: row and number must be integers.")
+
+            hall = halls.get(record["hall"])
+            if hall is None:
+                hall = halls[record["hall"]] = Hall.objects.create(name=record["hall"], total_rows=row, seats_per_row=number)
+            if row > hall.total_rows or number > hall.seats_per_row:
+                hall.total_rows = max(hall.total_rows, row)
+                hall.seats_per_row = max(hall.seats_per_row, number)
+                hall.save(update_fields=["total_rows", "seats_per_row", "updated_at"])
+
+            touched[hall.name] = hall
+            yield Seat(hall=hall, row=row, number=number, is_wheelchair=is_wheelchair)
+
+    with transaction.atomic():
+        if not replace:
+            # Halls the file creates start empty, so only existing ones need counting.
+            before = seat_counts([hall.id for hall in halls.values()])
+            bulk_create_seats(seats())
+        else:
+            before, by_hall = {}, {}
+            for seat in seats():
+                by_hall.setdefault(seat.hall.name, []).append(seat)
+            for name, hall_seats in by_hall.items():
+                hall = halls[name]
+                hall.total_rows = max(seat.row for seat in hall_seats)
+                hall.seats_per_row = max(seat.number for seat in hall_seats)
+                hall.save(update_fields=["total_rows", "seats_per_row", "updated_at"])
+                new_seats = _sync_existing(hall, hall_seats)
+                # The sync dropped every seat the file does not name; what is
+                # left is the file's seats minus the ones still to insert.
+                before[hall.id] = len({(seat.row, seat.number) for seat in hall_seats}) - len(new_seats)
+                bulk_create_seats(new_seats)
+        after = seat_counts([hall.id for hall in touched.values()])
+    for hall in touched.values():
+        invalidate_hall_layout(hall.id)
+    return {name: after.get(hall.id, 0) - before.get(hall.id, 0) for name, hall in touched.items()}
+
+
+def provision_halls(prefix: str, count: int, total_rows: int, seats_per_row: int, layout: dict = None) -> int:
+    """Create count identical halls and all of their seats in a handful of statements."""
+    layout = normalize_layout(layout or {}, total_rows, seats_per_row)
+    with transaction.atomic():
+        halls = Hall.objects.bulk_create([
+            Hall(name=f"{prefix}{i}", total_rows=total_rows, seats_per_row=seats_per_row, layout=layout)
+            for i in range(1, count + 1)
+        ])
+        if any(hall.pk is None for hall in halls):
+            halls = list(Hall.objects.filter(name__in=[hall.name for hall in halls]))
+        bulk_create_seats(seat for hall in halls for seat in iter_layout_seats(hall, layout))
+        created = Seat.objects.filter(hall__in=halls).count()
+        refresh_seat_counts([hall.pk for hall in halls])
+    return created
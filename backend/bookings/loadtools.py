@@ -0,0 +1,131 @@
+import asyncio
+import json
+import statistics
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+def summarize(latencies: list, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(statistics.median(latencies) * 1000, 2) if latencies else 0.0,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def asgi_request(app, method: str, path: str, body=None, headers=None) -> tuple:
+    payload = json.dumps(body).encode() if body is not None else b""
+    raw_headers = [
+        (b"host", b"testserver"),
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(payload)).encode()),
+    ]
+    raw_headers += [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": raw_headers,
+        "client": ("127.0.0.1", 0),
+        "server": ("testserver", 80),
+    }
+
+    request_sent = False
+    disconnect = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    status, chunks = None, []
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await app(scope, receive, send)
+    finally:
+        disconnect.set()
+    return status, b"".join(chunks)
+
+
+class AsgiWebsocket:
+    def __init__(self, app, path: str):
+        path, _, query = path.partition("?")
+        self.app = app
+        self.scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [(b"host", b"testserver")],
+            "subprotocols": [],
+            "client": ("127.0.0.1", 0),
+            "server": ("testserver", 80),
+        }
+        self._input = asyncio.Queue()
+        self._output = asyncio.Queue()
+        self._task = None
+
+    async def connect(self, timeout: float = 5) -> bool:
+        self._task = asyncio.ensure_future(self.app(self.scope, self._input.get, self._output.put))
+        await self._input.put({"type": "websocket.connect"})
+        return (await self.receive_output(timeout))["type"] == "websocket.accept"
+
+    async def receive_output(self, timeout: float = 5) -> dict:
+        getter = asyncio.ensure_future(self._output.get())
+        try:
+            done, _ = await asyncio.wait({getter, self._task}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            getter.cancel()
+            raise
+        if getter in done:
+            return getter.result()
+        getter.cancel()
+        if self._task in done:
+            self._task.result()
+            raise ConnectionError("websocket application exited")
+        raise asyncio.TimeoutError
+
+    async def send_json(self, data):
+        await self._input.put({"type": "websocket.receive", "text": json.dumps(data)})
+
+    async def receive_json(self, timeout: float = 5):
+        message = await self.receive_output(timeout)
+        if message["type"] != "websocket.send":
+            raise ConnectionError(f"expected websocket.send, got {message['type']}")
+        return json.loads(message["text"])
+
+    async def disconnect(self, code: int = 1000):
+        if self._task is None or self._task.done():
+            return
+        await self._input.put({"type": "websocket.disconnect", "code": code})
+        try:
+            await asyncio.wait_for(self._task, timeout=5)
+        except asyncio.TimeoutError:
+            self._task.cancel()
@@ -0,0 +1,87 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookings.allocator import DEFAULT_DEPTH, find_best_block
+from bookings.availability import HallLayout, SeatAvailability
+from bookings.loadtools import summarize
+
+
+def _naive_best_block(availability, size):
+    # The seat-by-seat equivalent: one pass over the hall tracking the current
+    # free run, scoring every block it could end.
+    layout = availability.layout
+    rank = {row: i for i, row in enumerate(sorted(layout.row_centers))}
+    depth = max(1, len(rank) - 1)
+    width = max(1, max(layout.numbers))
+    target = DEFAULT_DEPTH * depth
+    best, best_score = None, None
+    run = []
+    for bit in range(len(layout)):
+        seat_id, row = layout.seat_ids[bit], layout.rows[bit]
+        if run and (layout.rows[run[-1]] != row or layout.numbers[bit] != layout.numbers[run[-1]] + 1):
+            run = []
+        if availability.is_reserved(seat_id) or availability.is_held(seat_id):
+            run = []
+            continue
+        run.append(bit)
+        if len(run) >= size:
+            first = run[-size]
+            centre = (layout.numbers[first] + layout.numbers[bit]) / 2
+            s = ((rank[row] - target) / depth) ** 2 + ((centre - layout.row_centers[row]) / width) ** 2
+            if best_score is None or s < best_score:
+                best, best_score = first, s
+    return [layout.seat_ids[bit] for bit in range(best, best + size)] if best is not None else []
+
+
+class Command(BaseCommand):
+    help = "Benchmark best-available seat allocation on a synthetic hall."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=40)
+        parser.add_argument("--seats-per-row", type=int, default=50)
+        parser.add_argument("--aisles", default="13,38", help="Seat positions left empty in every row.")
+        parser.add_argument("--party", type=int, default=4)
+        parser.add_argument("--fill", type=float, default=0.7, help="Fraction of seats already taken.")
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--naive", action="store_true", help="Also time a seat-by-seat scan for comparison.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        aisles = {int(n) for n in options["aisles"].split(",") if n.strip()}
+        positions = [
+            (row, number)
+            for row in range(1, options["rows"] + 1)
+            for number in range(1, options["seats_per_row"] + 1)
+            if number not in aisles
+        ]
+        layout = HallLayout(
+            1,
+            [
+                (seat_id, row, number, row == options["rows"] and number <= 4)
+                for seat_id, (row, number) in enumerate(positions, 1)
+            ],
+        )
+
+        taken = rng.sample(list(layout.seat_ids), int(len(layout) * options["fill"]))
+        availability = SeatAvailability(layout, reserved=layout.mask(taken))
+        self.stdout.write(f"{len(layout)} seats, {len(taken)} taken, party of {options['party']}")
+
+        strategies = [("bitmap", lambda: find_best_block(availability, options["party"]))]
+        if options["naive"]:
+            strategies.append(("naive", lambda: _naive_best_block(availability, options["party"])))
+
+        for name, allocate in strategies:
+            latencies = []
+            started = time.perf_counter()
+            for _ in range(options["iterations"]):
+                t = time.perf_counter()
+                block = allocate()
+                latencies.append(time.perf_counter() - t)
+            stats = summarize(latencies, time.perf_counter() - started)
+            self.stdout.write(
+                f"{name:>7}: {stats['rps']:9.1f} allocations/s  p50 {stats['p50_ms']:7.3f} ms  "
+                f"p99 {stats['p99_ms']:7.3f} ms  block {block}"
+            )
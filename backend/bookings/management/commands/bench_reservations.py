@@ -0,0 +1,111 @@
+import random
+import statistics
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction, IntegrityError
+from django.utils import timezone
+
+from bookings.loadtools import percentile
+from bookings.models import Movie, Hall, Seat, Screening, Reservation, ReservedSeat
+from bookings.reservations import SeatConflict, reserve_seats
+
+
+def _legacy_reserve(screening, seat_ids, client_id="", **fields):
+    # The pre-engine flow: create the reservation first and let the unique
+    # constraint reject double bookings.
+    with transaction.atomic():
+        reservation = Reservation.objects.create(screening=screening, **fields)
+        try:
+            ReservedSeat.objects.bulk_create([
+                ReservedSeat(reservation=reservation, screening=screening, seat_id=seat_id)
+                for seat_id in seat_ids
+            ])
+        except IntegrityError:
+            raise SeatConflict("One or more selected seats are already reserved.", seat_ids)
+    return reservation
+
+
+STRATEGIES = {
+    "legacy": _legacy_reserve,
+    "engine": reserve_seats,
+}
+
+
+class Command(BaseCommand):
+    help = "Benchmark concurrent buyers competing for the same seats."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--buyers", type=int, default=50, help="Concurrent buyers per round.")
+        parser.add_argument("--seats", type=int, default=20, help="Seats in the contested block.")
+        parser.add_argument("--party", type=int, default=2, help="Seats requested by each buyer.")
+        parser.add_argument("--rounds", type=int, default=5)
+        parser.add_argument("--strategy", choices=[*STRATEGIES, "both"], default="both")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        strategies = list(STRATEGIES) if options["strategy"] == "both" else [options["strategy"]]
+        for name in strategies:
+            self._run(name, STRATEGIES[name], options)
+
+    def _run(self, name, reserve, options):
+        rng = random.Random(options["seed"])
+        movie = Movie.objects.create(title="bench-reservations", duration_minutes=90)
+        hall = Hall.objects.create(name=f"bench-{name}-{time.time_ns()}", total_rows=1, seats_per_row=options["seats"])
+        Seat.objects.bulk_create([Seat(hall=hall, row=1, number=n) for n in range(1, options["seats"] + 1)])
+        seat_ids = list(hall.seats.values_list("id", flat=True))
+
+        latencies, outcomes = [], {"booked": 0, "conflict": 0, "error": 0}
+        lock = threading.Lock()
+        elapsed = 0.0
+
+        try:
+            for _ in range(options["rounds"]):
+                now = timezone.now()
+                screening = Screening.objects.create(
+                    movie=movie,
+                    hall=hall,
+                    start_time=now + timedelta(days=1),
+                    end_time=now + timedelta(days=1, hours=2),
+                    base_price="0.00",
+                )
+                wanted = [rng.sample(seat_ids, options["party"]) for _ in range(options["buyers"])]
+                barrier = threading.Barrier(options["buyers"])
+
+                def buyer(i):
+                    barrier.wait()
+                    started = time.perf_counter()
+                    try:
+                        reserve(screening, wanted[i], "", customer_name=f"buyer {i}", customer_email="bench@example.com")
+                        outcome = "booked"
+                    except SeatConflict:
+                        outcome = "conflict"
+                    except Exception:
+                        outcome = "error"
+                    finally:
+                        connection.close()
+                    with lock:
+                        latencies.append(time.perf_counter() - started)
+                        outcomes[outcome] += 1
+
+                threads = [threading.Thread(target=buyer, args=(i,)) for i in range(options["buyers"])]
+                started = time.perf_counter()
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+                elapsed += time.perf_counter() - started
+        finally:
+            Screening.objects.filter(hall=hall).delete()
+            hall.delete()
+            movie.delete()
+
+        latencies.sort()
+        p99 = percentile(latencies, 99)
+        self.stdout.write(
+            f"{name:>7}: {len(latencies) / elapsed:8.1f} req/s  "
+            f"p50 {statistics.median(latencies) * 1000:7.2f} ms  p99 {p99 * 1000:7.2f} ms  "
+            f"booked {outcomes['booked']}  conflicts {outcomes['conflict']}  errors {outcomes['error']}"
+        )
@@ -0,0 +1,67 @@
+import json
+import random
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from bookings import benchmarks
+
+
+class Command(BaseCommand):
+    help = "Measure query counts and latency of the hot endpoints against a JSON baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--baseline",
+            default=str(Path(settings.BASE_DIR) / "benchmarks" / "baseline.json"),
+            help="Baseline file to compare against or write.",
+        )
+        parser.add_argument("--update-baseline", action="store_true", help="Write the results as the new baseline.")
+        parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative p50 slowdown.")
+        parser.add_argument("--noise-ms", type=float, default=2.0, help="Ignore p50 slowdowns smaller than this.")
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--scenario", action="append", choices=sorted(benchmarks.SCENARIOS))
+        parser.add_argument("--scale", type=float, default=1.0, help="Size of the seeded data set; 1 is ~200k booked seats.")
+        parser.add_argument("--reseed", action="store_true", help="Drop and recreate the benchmark data.")
+        parser.add_argument("--teardown", action="store_true", help="Drop the benchmark data afterwards.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        path = Path(options["baseline"])
+        if not options["update_baseline"] and not path.exists():
+            # A gate with nothing to compare against would always pass.
+            raise CommandError(f"No baseline at {path}; run with --update-baseline to record one.")
+
+        rng = random.Random(options["seed"])
+        if options["reseed"]:
+            benchmarks.teardown()
+        if not benchmarks.is_seeded():
+            self.stderr.write(f"Seeding benchmark data at scale {options['scale']}...")
+            benchmarks.seed(options["scale"], rng, log=self.stderr.write)
+
+        try:
+            with override_settings(ALLOWED_HOSTS=["testserver"]):
+                results = benchmarks.run_suite(options["iterations"], options["scenario"], rng)
+        finally:
+            if options["teardown"]:
+                benchmarks.teardown()
+
+        for name, r in results.items():
+            self.stdout.write(f"{name:>26}: {r['queries']:3d} queries  p50 {r['p50_ms']:8.2f} ms  p95 {r['p95_ms']:8.2f} ms")
+
+        if options["update_baseline"]:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            baseline = json.loads(path.read_text()) if path.exists() else {}
+            baseline.update(results)
+            path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+            self.stderr.write(f"Baseline written to {path}.")
+            return
+
+        regressions = benchmarks.compare(
+            results, json.loads(path.read_text()), options["threshold"], options["noise_ms"]
+        )
+        if regressions:
+            raise CommandError("Performance regressions:\n  " + "\n  ".join(regressions))
+        self.stdout.write("No regressions against the baseline.")
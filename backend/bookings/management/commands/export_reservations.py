@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from bookings.exports import (
+    FORMATS,
+    MANIFEST_COLUMNS,
+    RESERVATION_COLUMNS,
+    iter_export,
+    manifest_rows,
+    reservation_rows,
+)
+from bookings.filters import filter_reservations
+from bookings.models import Reservation, Screening
+
+
+class Command(BaseCommand):
+    help = "Stream reservations, or one screening's seat manifest, to CSV or NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", help="Only reservations made on this day (YYYY-MM-DD).")
+        parser.add_argument("--screening", help="Only reservations for these screening ids (comma separated).")
+        parser.add_argument("--status", help="Only reservations with these statuses (comma separated).")
+        parser.add_argument("--manifest", type=int, metavar="SCREENING_ID", help="Export the seat manifest of a screening.")
+        parser.add_argument("--format", choices=sorted(FORMATS), help="Defaults to the output extension, else csv.")
+        parser.add_argument("-o", "--output", default="-", help="File to write ('-' for stdout).")
+
+    def handle(self, *args, **options):
+        path = options["output"]
+        fmt = options["format"] or ("ndjson" if path.endswith((".ndjson", ".jsonl")) else "csv")
+
+        if options["manifest"]:
+            try:
+                screening = Screening.objects.get(pk=options["manifest"])
+            except Screening.DoesNotExist:
+                raise CommandError(f"Screening {options['manifest']} does not exist.")
+            chunks = iter_export(fmt, MANIFEST_COLUMNS, manifest_rows(screening))
+        else:
+            params = {k: options[k] for k in ("date", "screening", "status") if options[k]}
+            try:
+                queryset = filter_reservations(Reservation.objects.all(), params)
+            except ValidationError as e:
+                raise CommandError(e.detail)
+            chunks = iter_export(fmt, RESERVATION_COLUMNS, reservation_rows(queryset))
+
+        if path == "-":
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+        with open(path, "w", newline="", encoding="utf-8") as handle:
+            handle.writelines(chunks)
@@ -0,0 +1,92 @@
+import asyncio
+import json
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from bookings.loadtools import asgi_request, summarize
+from bookings.models import Movie, Hall, Seat, Screening
+
+PATHS = {
+    "sync": "/api/screenings/{id}/",
+    "async": "/api/live/screenings/{id}/",
+}
+
+
+class Command(BaseCommand):
+    help = "Compare the sync DRF and async seat endpoints under many concurrent in-process ASGI clients."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=2000)
+        parser.add_argument("--requests", type=int, default=5, help="Requests per client.")
+        parser.add_argument("--hold-ratio", type=float, default=0.1, help="Share of requests that hold then release.")
+        parser.add_argument("--rows", type=int, default=20)
+        parser.add_argument("--seats-per-row", type=int, default=25)
+        parser.add_argument("--mode", choices=[*PATHS, "both"], default="both")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        from cinema_api.asgi import application
+
+        movie = Movie.objects.create(title="loadtest", duration_minutes=100)
+        hall = Hall.objects.create(
+            name=f"loadtest-{time.time_ns()}",
+            total_rows=options["rows"],
+            seats_per_row=options["seats_per_row"],
+        )
+        Seat.objects.bulk_create([
+            Seat(hall=hall, row=r, number=n)
+            for r in range(1, options["rows"] + 1)
+            for n in range(1, options["seats_per_row"] + 1)
+        ])
+        now = timezone.now()
+        screening = Screening.objects.create(
+            movie=movie,
+            hall=hall,
+            start_time=now + timedelta(days=1),
+            end_time=now + timedelta(days=1, hours=2),
+            base_price="0.00",
+        )
+        seat_ids = list(hall.seats.values_list("id", flat=True))
+
+        try:
+            modes = list(PATHS) if options["mode"] == "both" else [options["mode"]]
+            with override_settings(ALLOWED_HOSTS=["testserver"]):
+                for mode in modes:
+                    result = asyncio.run(self._run(application, mode, screening.id, seat_ids, options))
+                    self.stdout.write(f"{mode:>5}: {json.dumps(result)}")
+        finally:
+            screening.delete()
+            hall.delete()
+            movie.delete()
+
+    async def _run(self, app, mode, screening_id, seat_ids, options):
+        base = PATHS[mode].format(id=screening_id)
+        rng = random.Random(options["seed"])
+        latencies, statuses = [], {}
+
+        async def timed(method, path, body=None, headers=None):
+            started = time.perf_counter()
+            status, _ = await asgi_request(app, method, path, body, headers)
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+        async def client(i):
+            client_id = f"{mode}-{i}"
+            for _ in range(options["requests"]):
+                if rng.random() < options["hold_ratio"]:
+                    body = {"client_id": client_id, "seat_ids": [rng.choice(seat_ids)]}
+                    await timed("POST", base + "hold/", body)
+                    await timed("POST", base + "release/", body)
+                else:
+                    await timed("GET", base + "seat-map/", headers={"X-Client-Id": client_id})
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client(i) for i in range(options["clients"])))
+        result = summarize(latencies, time.perf_counter() - started)
+        result["statuses"] = statuses
+        return result
@@ -0,0 +1,71 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.layouts import (
+    LayoutError,
+    import_layouts_csv,
+    import_layouts_jsonl,
+    iter_layout_csv,
+    iter_layout_jsonl,
+    provision_halls,
+)
+from bookings.models import Hall
+
+
+class Command(BaseCommand):
+    help = "Provision halls and their seats in bulk, or import/export hall layouts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=0, help="Number of identical halls to create.")
+        parser.add_argument("--prefix", default="Hall ", help="Name prefix for generated halls.")
+        parser.add_argument("--rows", type=int, default=20)
+        parser.add_argument("--seats-per-row", type=int, default=30)
+        parser.add_argument("--aisles", default="", help="Comma separated seat positions left empty in every row.")
+        parser.add_argument("--import", dest="import_path", help="Read layouts from a .jsonl or .csv file ('-' for stdin).")
+        parser.add_argument("--export", dest="export_path", help="Write all hall layouts to a .jsonl or .csv file ('-' for stdout).")
+        parser.add_argument("--replace", action="store_true", help="Drop existing seats of imported halls first.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            if options["import_path"]:
+                self._import(options["import_path"], options["replace"])
+            if options["count"]:
+                aisles = [int(n) for n in options["aisles"].split(",") if n.strip()]
+                created = provision_halls(
+                    options["prefix"],
+                    options["count"],
+                    options["rows"],
+                    options["seats_per_row"],
+                    {"aisles": aisles},
+                )
+                self.stderr.write(f"Created {options['count']} hall(s) with {created} seat(s).")
+            if options["export_path"]:
+                self._export(options["export_path"])
+        except LayoutError as e:
+            raise CommandError(str(e))
+        self.stderr.write(f"Done in {time.perf_counter() - started:.2f}s.")
+
+    def _import(self, path, replace):
+        handle = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        try:
+            if path.endswith(".csv"):
+                created = import_layouts_csv(handle, replace=replace)
+            else:
+                created = import_layouts_jsonl(handle, replace=replace)
+        finally:
+            if handle is not sys.stdin:
+                handle.close()
+        self.stderr.write(f"Imported {sum(created.values())} seat(s) across {len(created)} hall(s).")
+
+    def _export(self, path):
+        halls = Hall.objects.order_by("name")
+        chunks = iter_layout_csv(halls) if path.endswith(".csv") else iter_layout_jsonl(halls)
+        if path == "-":
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+        with open(path, "w", newline="", encoding="utf-8") as handle:
+            handle.writelines(chunks)
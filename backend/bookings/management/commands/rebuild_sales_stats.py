@@ -0,0 +1,29 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.stats import rebuild_stats
+
+
+def _day(value: str):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Expected an ISO date, got {value!r}.")
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily sales aggregates from reservations, for all cinema days or a range of them."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="first", help="First cinema day (YYYY-MM-DD).")
+        parser.add_argument("--to", dest="last", help="Last cinema day (YYYY-MM-DD), inclusive.")
+        parser.add_argument("--batch-size", type=int, default=500, help="Screenings counted per query.")
+
+    def handle(self, *args, **options):
+        first = _day(options["first"]) if options["first"] else None
+        last = _day(options["last"]) if options["last"] else None
+        if first and last and last < first:
+            raise CommandError("--to must be on or after --from.")
+        rows = rebuild_stats(first, last, batch_size=options["batch_size"])
+        self.stdout.write(f"Wrote {rows} daily sales row(s).")
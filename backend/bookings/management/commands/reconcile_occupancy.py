@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from bookings.models import Hall
+from bookings.occupancy import reconcile_occupancy, refresh_seat_counts
+
+
+class Command(BaseCommand):
+    help = "Recount reserved and held seats per screening and repair drifted counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument("screening_ids", nargs="*", type=int, help="Limit to these screenings.")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--halls", action="store_true", help="Also recount seats per hall.")
+
+    def handle(self, *args, **options):
+        if options["halls"]:
+            refresh_seat_counts(Hall.objects.values_list("id", flat=True))
+        repaired = reconcile_occupancy(options["screening_ids"] or None, batch_size=options["batch_size"])
+        self.stdout.write(f"Repaired {repaired} screening(s).")
@@ -0,0 +1,219 @@
+import asyncio
+import json
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from bookings.layouts import generate_seats
+from bookings.loadtools import AsgiWebsocket, asgi_request, summarize
+from bookings.models import Hall, Movie, ReservedSeat, Screening
+
+IN_MEMORY_CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+class OnSale:
+    def __init__(self, app, screening_ids, options):
+        self.app = app
+        self.screening_ids = screening_ids
+        self.options = options
+        self.rng = random.Random(options["seed"])
+        self.latencies = {}
+        self.hold_to_booking = []
+        self.fanout = []
+        self.outcomes = {"booked": 0, "abandoned": 0, "sold_out": 0, "gave_up": 0, "lost_hold": 0, "error": 0}
+        self.holds = {"attempts": 0, "conflicts": 0}
+        self.messages = 0
+        self.statuses = {}
+        self.in_flight = asyncio.Semaphore(options["concurrency"])
+        # (screening_id, seat_id) -> when the hold was requested, for fan-out.
+        self.hold_requested = {}
+
+    async def request(self, name, method, path, body=None, headers=None):
+        started = time.perf_counter()
+        async with self.in_flight:
+            status, raw = await asgi_request(self.app, method, path, body, headers)
+        self.latencies.setdefault(name, []).append(time.perf_counter() - started)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        return status, raw
+
+    async def listen(self, ws, screening_id):
+        while True:
+            try:
+                message = await ws.receive_json(timeout=None)
+            except ConnectionError:
+                return
+            self.messages += 1
+            if message.get("event") != "seat_delta":
+                continue
+            now = time.perf_counter()
+            for change in message["changes"]:
+                if change["state"] != "held":
+                    continue
+                requested = self.hold_requested.get((screening_id, change["seat_ids"][0]))
+                if requested is not None:
+                    self.fanout.append(now - requested)
+
+    async def think(self):
+        if self.options["think_ms"]:
+            await asyncio.sleep(self.rng.uniform(0, self.options["think_ms"]) / 1000)
+
+    async def customer(self, i):
+        await asyncio.sleep(self.rng.uniform(0, self.options["ramp_seconds"]))
+        screening_id = self.rng.choice(self.screening_ids)
+        client_id = f"onsale-{i}"
+        base = f"/api/screenings/{screening_id}/"
+
+        ws = AsgiWebsocket(self.app, f"/ws/screenings/{screening_id}/?client_id={client_id}")
+        if not await ws.connect():
+            self.outcomes["error"] += 1
+            return
+        listener = asyncio.ensure_future(self.listen(ws, screening_id))
+        try:
+            self.outcomes[await self.shop(screening_id, client_id, base)] += 1
+        finally:
+            listener.cancel()
+            await ws.disconnect()
+
+    async def shop(self, screening_id, client_id, base) -> str:
+        party = self.rng.randint(1, self.options["party"])
+        for _ in range(self.options["retries"] + 1):
+            status, raw = await self.request("seat_map", "GET", base + "seat-map/", headers={"X-Client-Id": client_id})
+            if status != 200:
+                return "error"
+            seats = json.loads(raw)["seats"]
+            free = [s["id"] for s in seats if not s["is_reserved"] and not s["is_held"]]
+            if len(free) < party:
+                return "sold_out"
+            seat_ids = self.rng.sample(free, party)
+            await self.think()
+
+            body = {"client_id": client_id, "seat_ids": seat_ids}
+            for seat_id in seat_ids:
+                self.hold_requested[(screening_id, seat_id)] = time.perf_counter()
+            self.holds["attempts"] += 1
+            status, _ = await self.request("hold", "POST", base + "hold/", body)
+            if status == 409:
+                self.holds["conflicts"] += 1
+                continue
+            if status != 200:
+                return "error"
+            held_at = time.perf_counter()
+            await self.think()
+
+            if self.rng.random() < self.options["abandon_ratio"]:
+                status, _ = await self.request("release", "POST", base + "release/", body)
+                return "abandoned" if status == 200 else "error"
+
+            status, _ = await self.request("reserve", "POST", "/api/reservations/", {
+                "screening": screening_id,
+                "customer_name": f"Customer {client_id}",
+                "customer_email": "onsale@example.com",
+                "seat_ids": seat_ids,
+                "client_id": client_id,
+            })
+            if status == 201:
+                self.hold_to_booking.append(time.perf_counter() - held_at)
+                return "booked"
+            # A 400 here means the hold lapsed before the booking got through.
+            return "lost_hold" if status == 400 else "error"
+        return "gave_up"
+
+    async def run(self) -> dict:
+        started = time.perf_counter()
+        await asyncio.gather(*(self.customer(i) for i in range(self.options["customers"])))
+        elapsed = time.perf_counter() - started
+
+        requests = sum(len(v) for v in self.latencies.values())
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "customers": self.options["customers"],
+            "outcomes": self.outcomes,
+            "requests_per_s": round(requests / elapsed, 1) if elapsed else 0.0,
+            "bookings_per_s": round(self.outcomes["booked"] / elapsed, 1) if elapsed else 0.0,
+            "hold_conflict_rate": round(self.holds["conflicts"] / self.holds["attempts"], 3) if self.holds["attempts"] else 0.0,
+            "statuses": self.statuses,
+            "ws_messages": self.messages,
+            "endpoints": {name: summarize(values, elapsed) for name, values in self.latencies.items()},
+            "hold_to_booking": summarize(self.hold_to_booking, elapsed),
+            "fanout": summarize(self.fanout, elapsed),
+        }
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate an on-sale spike: customers watch the seat socket, load the seat map, hold seats and then "
+        "book or abandon, all through the in-process ASGI app with an in-memory channel layer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--customers", type=int, default=1000)
+        parser.add_argument("--screenings", type=int, default=1, help="Screenings the customers are spread over.")
+        parser.add_argument("--rows", type=int, default=20)
+        parser.add_argument("--seats-per-row", type=int, default=25)
+        parser.add_argument("--party", type=int, default=4, help="Largest party; each customer wants 1 to this many seats.")
+        parser.add_argument("--abandon-ratio", type=float, default=0.3, help="Share of customers who release their hold.")
+        parser.add_argument("--retries", type=int, default=2, help="New seat picks after a hold conflict.")
+        parser.add_argument("--think-ms", type=float, default=0, help="Longest pause before holding and before confirming.")
+        parser.add_argument("--ramp-seconds", type=float, default=0, help="Spread customer arrivals over this long.")
+        parser.add_argument(
+            "--concurrency", type=int, default=50, help="Most HTTP requests in flight at once, like a worker pool."
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--json", action="store_true", help="Print the report as one JSON object.")
+
+    def handle(self, *args, **options):
+        from cinema_api.asgi import application
+
+        # The publisher thread runs its own event loop, which an in-memory
+        # layer cannot deliver across; broadcast from the request instead.
+        with override_settings(
+            ALLOWED_HOSTS=["testserver"],
+            CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS,
+            SEAT_BROADCAST_COALESCE_MS=0,
+        ):
+            movie = Movie.objects.create(title="onsale", duration_minutes=100)
+            hall = Hall.objects.create(
+                name=f"onsale-{time.time_ns()}",
+                total_rows=options["rows"],
+                seats_per_row=options["seats_per_row"],
+            )
+            generate_seats(hall)
+            now = timezone.now()
+            screenings = Screening.objects.bulk_create([
+                Screening(
+                    movie=movie,
+                    hall=hall,
+                    start_time=now + timedelta(days=1, hours=3 * i),
+                    end_time=now + timedelta(days=1, hours=3 * i + 2),
+                    base_price="0.00",
+                )
+                for i in range(options["screenings"])
+            ])
+
+            try:
+                report = asyncio.run(OnSale(application, [s.id for s in screenings], options).run())
+                report["reserved_seats"] = ReservedSeat.objects.filter(screening__hall=hall).count()
+                report["reserved_count"] = sum(
+                    Screening.objects.filter(hall=hall).values_list("reserved_count", flat=True)
+                )
+            finally:
+                Screening.objects.filter(hall=hall).delete()
+                hall.delete()
+                movie.delete()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report))
+            return
+        endpoints = report.pop("endpoints")
+        hold_to_booking, fanout = report.pop("hold_to_booking"), report.pop("fanout")
+        for key, value in report.items():
+            self.stdout.write(f"{key:>20}: {value}")
+        for name, stats in [*endpoints.items(), ("hold_to_booking", hold_to_booking), ("ws_fanout", fanout)]:
+            self.stdout.write(
+                f"{name:>20}: n={stats['requests']:<6} p50 {stats['p50_ms']:8.2f} ms  "
+                f"p95 {stats['p95_ms']:8.2f} ms  p99 {stats['p99_ms']:8.2f} ms"
+            )
@@ -0,0 +1,36 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from bookings.holds import sweep_expired_holds
+
+
+class Command(BaseCommand):
+    help = "Delete expired seat holds in batches and notify the affected screenings."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=float(getattr(settings, "SEAT_HOLD_SWEEP_INTERVAL", 5)),
+            help="Seconds to wait between sweeps.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=int(getattr(settings, "SEAT_HOLD_SWEEP_BATCH_SIZE", 500)),
+            help="Maximum number of holds deleted per statement.",
+        )
+        parser.add_argument("--once", action="store_true", help="Run a single sweep and exit.")
+
+    def handle(self, *args, **options):
+        while True:
+            swept = sweep_expired_holds(batch_size=options["batch_size"])
+            if swept:
+                self.stdout.write(
+                    f"Swept {sum(map(len, swept.values()))} expired hold(s) across {len(swept)} screening(s)."
+                )
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
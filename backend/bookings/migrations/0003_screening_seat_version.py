@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0002_seathold'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='screening',
+            name='seat_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
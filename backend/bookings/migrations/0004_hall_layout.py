@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0003_screening_seat_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hall',
+            name='layout',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_hall_layout'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='screening',
+            index=models.Index(fields=['start_time', 'id'], name='screening_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='screening',
+            index=models.Index(fields=['movie', 'start_time'], name='screening_movie_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='screening',
+            index=models.Index(fields=['hall', 'start_time'], name='screening_hall_start_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:20
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _count(model, field, **filters):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef("pk")}, **filters)
+            .values(field)
+            .annotate(n=Count("pk"))
+            .values("n")
+        ),
+        Value(0),
+    )
+
+
+def backfill(apps, schema_editor):
+    Hall = apps.get_model("bookings", "Hall")
+    Seat = apps.get_model("bookings", "Seat")
+    Screening = apps.get_model("bookings", "Screening")
+    ReservedSeat = apps.get_model("bookings", "ReservedSeat")
+    SeatHold = apps.get_model("bookings", "SeatHold")
+
+    Hall.objects.update(seat_count=_count(Seat, "hall"))
+    Screening.objects.update(
+        reserved_count=_count(ReservedSeat, "screening"),
+        held_count=_count(SeatHold, "screening"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_screening_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hall',
+            name='seat_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='screening',
+            name='reserved_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='screening',
+            name='held_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:10
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0006_occupancy_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['-created_at', 'id'], name='reservation_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['screening', '-created_at'], name='reservation_screening_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['status', '-created_at'], name='reservation_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(django.db.models.functions.text.Upper('customer_email'), models.OrderBy(models.F('created_at'), descending=True), name='reservation_email_idx'),
+        ),
+    ]
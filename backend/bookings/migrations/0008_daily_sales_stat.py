@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-18 16:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_reservation_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('language', models.CharField(choices=[('SR', 'Serbian'), ('EN', 'English'), ('DE', 'German'), ('OTHER', 'Other')], max_length=10)),
+                ('screenings', models.PositiveIntegerField(default=0)),
+                ('capacity', models.PositiveIntegerField(default=0)),
+                ('reservations', models.PositiveIntegerField(default=0)),
+                ('seats_sold', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('hall', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_stats', to='bookings.hall')),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_stats', to='bookings.movie')),
+            ],
+            options={
+                'ordering': ['day', 'movie', 'hall', 'language'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'movie', 'hall', 'language'), name='unique_daily_sales_stat')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0008_daily_sales_stat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hall',
+            name='layout_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Upper
 from django.utils import timezone
 
 class TimeStampedModel(models.Model):
@@ -39,6 +41,9 @@ class Hall(TimeStampedModel):
     name = models.CharField(max_length=100, unique=True)
     total_rows = models.PositiveIntegerField()
     seats_per_row = models.PositiveIntegerField()
+    layout = models.JSONField(default=dict, blank=True)
+    seat_count = models.PositiveIntegerField(default=0, editable=False)
+    layout_version = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self) -> str:
         return self.name
@@ -80,13 +85,25 @@ class Screening(TimeStampedModel):
     )
     is_3d = models.BooleanField(default=False)
     base_price = models.DecimalField(max_digits=7, decimal_places=2)
+    seat_version = models.PositiveBigIntegerField(default=0, editable=False)
+    reserved_count = models.PositiveIntegerField(default=0, editable=False)
+    held_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ["start_time"]
+        indexes = [
+            models.Index(fields=["start_time", "id"], name="screening_start_idx"),
+            models.Index(fields=["movie", "start_time"], name="screening_movie_start_idx"),
+            models.Index(fields=["hall", "start_time"], name="screening_hall_start_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.movie.title} @ {self.start_time:%Y-%m-%d %H:%M}"
 
+    @property
+    def seats_left(self) -> int:
+        return max(0, self.hall.seat_count - self.reserved_count - self.held_count)
+
 
 class Reservation(TimeStampedModel):
     class Status(models.TextChoices):
@@ -107,6 +124,15 @@ class Reservation(TimeStampedModel):
         default=Status.CONFIRMED,
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "id"], name="reservation_created_idx"),
+            models.Index(fields=["screening", "-created_at"], name="reservation_screening_idx"),
+            models.Index(fields=["status", "-created_at"], name="reservation_status_idx"),
+            # Email lookups are case-insensitive (iexact compares UPPER()).
+            models.Index(Upper("customer_email"), F("created_at").desc(), name="reservation_email_idx"),
+        ]
+
     def __str__(self) -> str:
         return f"Reservation #{self.id} for {self.screening}"
 
@@ -153,3 +179,26 @@ class SeatHold(TimeStampedModel):
 
     def is_active(self) -> bool:
         return self.expires_at > timezone.now()
+
+
+class DailySalesStat(models.Model):
+    """Bookings per cinema day, movie, hall and language, kept up to date by bookings.stats."""
+
+    day = models.DateField()
+    movie = models.ForeignKey(Movie, related_name="sales_stats", on_delete=models.CASCADE)
+    hall = models.ForeignKey(Hall, related_name="sales_stats", on_delete=models.CASCADE)
+    language = models.CharField(max_length=10, choices=Screening.Language.choices)
+    screenings = models.PositiveIntegerField(default=0)
+    capacity = models.PositiveIntegerField(default=0)
+    reservations = models.PositiveIntegerField(default=0)
+    seats_sold = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ["day", "movie", "hall", "language"]
+        constraints = [
+            models.UniqueConstraint(fields=["day", "movie", "hall", "language"], name="unique_daily_sales_stat"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.day} {self.movie_id}/{self.hall_id}/{self.language}"
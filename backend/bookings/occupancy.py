@@ -0,0 +1,76 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Hall, ReservedSeat, Screening, Seat
+
+
+def adjust_occupancy(screening_id: int, reserved: int = 0, held: int = 0):
+    changes = {}
+    if reserved:
+        changes["reserved_count"] = Greatest(F("reserved_count") + reserved, Value(0))
+    if held:
+        changes["held_count"] = Greatest(F("held_count") + held, Value(0))
+    if changes:
+        Screening.objects.filter(pk=screening_id).update(**changes)
+
+
+def refresh_seat_counts(hall_ids):
+    seat_count = (
+        Seat.objects.filter(hall_id=OuterRef("pk"))
+        .values("hall_id")
+        .annotate(n=Count("id"))
+        .values("n")
+    )
+    Hall.objects.filter(pk__in=hall_ids).update(seat_count=Coalesce(Subquery(seat_count), Value(0)))
+
+
+def reconcile_occupancy(screening_ids=None, batch_size: int = 500) -> int:
+    """Recount reserved and held seats from the source rows; returns the number of screenings repaired."""
+    from .holds import get_hold_store
+
+    store = get_hold_store()
+    screenings = Screening.objects.order_by("id")
+    if screening_ids is not None:
+        screenings = screenings.filter(id__in=screening_ids)
+
+    repaired = 0
+    last_id = 0
+    while True:
+        batch = list(screenings.filter(id__gt=last_id).values_list("id", "reserved_count", "held_count")[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        ids = [sid for sid, _, _ in batch]
+
+        reserved = dict(
+            ReservedSeat.objects.filter(screening_id__in=ids)
+            .values("screening_id")
+            .annotate(n=Count("id"))
+            .values_list("screening_id", "n")
+        )
+        held = store.hold_counts(ids)
+
+        for sid, reserved_count, held_count in batch:
+            if (reserved.get(sid, 0), held.get(sid, 0)) != (reserved_count, held_count):
+                repaired += _repair(store, sid)
+    return repaired
+
+
+def _repair(store, screening_id: int) -> int:
+    # Writers bump the counters on this row inside their transaction, so once
+    # the lock is ours every in-flight booking has committed its seat rows.
+    with transaction.atomic():
+        row = Screening.objects.select_for_update().filter(pk=screening_id).values_list(
+            "reserved_count", "held_count"
+        ).first()
+        if row is None:
+            return 0
+        actual = (
+            ReservedSeat.objects.filter(screening_id=screening_id).count(),
+            store.hold_counts([screening_id]).get(screening_id, 0),
+        )
+        if actual == row:
+            return 0
+        Screening.objects.filter(pk=screening_id).update(reserved_count=actual[0], held_count=actual[1])
+    return 1
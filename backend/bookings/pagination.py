@@ -0,0 +1,19 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class ScreeningCursorPagination(CursorPagination):
+    # (start_time, id) is unique and indexed, so every page is an index range
+    # scan no matter how deep the history goes.
+    ordering = ("start_time", "id")
+    page_size = int(getattr(settings, "SCREENING_PAGE_SIZE", 50))
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+
+class ReservationCursorPagination(CursorPagination):
+    # Newest first; the (-created_at, id) index keeps deep pages cheap.
+    ordering = ("-created_at", "id")
+    page_size = int(getattr(settings, "RESERVATION_PAGE_SIZE", 50))
+    page_size_query_param = "page_size"
+    max_page_size = 200
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .utils import broadcast_screening_update
+
+logger = logging.getLogger(__name__)
+
+
+def _merge_deltas(run: list) -> dict:
+    seats = {}
+    for delta in run:
+        for change in delta["changes"]:
+            for seat_id in change["seat_ids"]:
+                seats[seat_id] = (change["state"], change["owner"])
+
+    grouped = {}
+    for seat_id, key in seats.items():
+        grouped.setdefault(key, []).append(seat_id)
+
+    return {
+        "event": "seat_delta",
+        "screening_id": run[0]["screening_id"],
+        "first_seq": run[0]["first_seq"],
+        "seq": run[-1]["seq"],
+        "changes": [
+            {"seat_ids": sorted(seat_ids), "state": state, "owner": owner}
+            for (state, owner), seat_ids in grouped.items()
+        ],
+    }
+
+
+def coalesce(items) -> list:
+    by_screening = {}
+    for screening_id, payload in items:
+        by_screening.setdefault(screening_id, []).append(payload)
+
+    out = []
+    for screening_id, payloads in by_screening.items():
+        seen = set()
+        for payload in payloads:
+            if payload.get("event") == "seat_delta":
+                continue
+            key = repr(sorted(payload.items()))
+            if key not in seen:
+                seen.add(key)
+                out.append((screening_id, payload))
+
+        # Only merge contiguous sequence runs, so a client still sees any gap
+        # left by an update published elsewhere and resyncs.
+        deltas = sorted((p for p in payloads if p.get("event") == "seat_delta"), key=lambda p: p["first_seq"])
+        run = []
+        for delta in deltas:
+            if run and delta["first_seq"] != run[-1]["seq"] + 1:
+                out.append((screening_id, _merge_deltas(run)))
+                run = []
+            run.append(delta)
+        if run:
+            out.append((screening_id, _merge_deltas(run)))
+    return out
+
+
+class CoalescingPublisher:
+    def __init__(self, window: float, maxsize: int = 10000):
+        self.window = window
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.enqueued = 0
+        self.dropped = 0
+        self.delivered = 0
+        self.sent = 0
+
+    def publish(self, screening_id: int, payload: dict) -> bool:
+        try:
+            self._queue.put_nowait((screening_id, payload))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+        with self._lock:
+            self.enqueued += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="screening-publisher", daemon=True)
+                self._thread.start()
+        return True
+
+    def flush(self):
+        batch = self._drain([])
+        if batch:
+            self._deliver(batch, None)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "enqueued": self.enqueued,
+                "dropped": self.dropped,
+                "sent": self.sent,
+                "coalescing_ratio": round(self.delivered / self.sent, 3) if self.sent else None,
+            }
+
+    def _drain(self, batch: list, deadline: float = None) -> list:
+        while True:
+            try:
+                if deadline is None:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        # A long-lived loop keeps the channel layer's connection pool warm.
+        loop = asyncio.new_event_loop()
+        while True:
+            batch = [self._queue.get()]
+            self._deliver(self._drain(batch, time.monotonic() + self.window), loop)
+
+    def _deliver(self, batch: list, loop):
+        messages = coalesce(batch)
+        for screening_id, payload in messages:
+            try:
+                if loop is None:
+                    broadcast_screening_update(screening_id, payload)
+                else:
+                    loop.run_until_complete(
+                        get_channel_layer().group_send(
+                            f"screening_{screening_id}",
+                            {"type": "seat_update", "payload": payload},
+                        )
+                    )
+            except Exception:
+                logger.exception("Failed to broadcast update for screening %s", screening_id)
+
+        with self._lock:
+            self.delivered += len(batch)
+            self.sent += len(messages)
+
+
+_publisher = None
+
+
+def get_publisher():
+    global _publisher
+    window_ms = float(getattr(settings, "SEAT_BROADCAST_COALESCE_MS", 75))
+    if window_ms <= 0:
+        return None
+    if _publisher is None:
+        _publisher = CoalescingPublisher(
+            window_ms / 1000,
+            int(getattr(settings, "SEAT_BROADCAST_QUEUE_SIZE", 10000)),
+        )
+    return _publisher
+
+
+@receiver(setting_changed)
+def _reset_publisher(setting, **kwargs):
+    global _publisher
+    if setting.startswith("SEAT_BROADCAST_"):
+        _publisher = None
+
+
+def publish_screening_update(screening_id: int, payload: dict):
+    publisher = get_publisher()
+    if publisher is None:
+        broadcast_screening_update(screening_id, payload)
+    else:
+        publisher.publish(screening_id, payload)
+
+
+async def apublish_screening_update(screening_id: int, payload: dict):
+    publisher = get_publisher()
+    if publisher is None:
+        await get_channel_layer().group_send(
+            f"screening_{screening_id}",
+            {"type": "seat_update", "payload": payload},
+        )
+    else:
+        publisher.publish(screening_id, payload)
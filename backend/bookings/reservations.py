@@ -0,0 +1,229 @@
+from django.db import transaction, IntegrityError
+from django.db.models import CharField, Value
+
+from .holds import get_hold_store
+from .models import Reservation, ReservedSeat, Screening
+from .occupancy import adjust_occupancy
+from .schedule import invalidate_schedule_seats
+from .seatmap import publish_seat_change, screening_layout
+from .stats import CANCELLED, record_sale
+
+RESERVED = "reserved"
+HELD = "held"
+
+
+class SeatConflict(Exception):
+    def __init__(self, detail: str, seat_ids, reason: str = RESERVED):
+        super().__init__(detail)
+        self.detail = detail
+        self.reason = reason
+        self.seat_ids = sorted(seat_ids)
+
+
+def find_conflicts(screening, seat_ids, client_id: str = "") -> dict:
+    store = get_hold_store()
+    reserved = ReservedSeat.objects.filter(screening=screening, seat_id__in=seat_ids)
+    held = store.held_queryset(screening.id, seat_ids, client_id)
+
+    conflicts = {RESERVED: set(), HELD: set()}
+    if held is None:
+        conflicts[RESERVED] = set(reserved.values_list("seat_id", flat=True))
+        conflicts[HELD] = store.conflicts(screening.id, seat_ids, client_id)
+    else:
+        # Hold rows live in the same database: fetch both kinds in one round-trip.
+        tagged = reserved.annotate(kind=Value(RESERVED, output_field=CharField())).values_list("seat_id", "kind")
+        tagged = tagged.union(
+            held.annotate(kind=Value(HELD, output_field=CharField())).values_list("seat_id", "kind"),
+            all=True,
+        )
+        for seat_id, kind in tagged:
+            conflicts[kind].add(seat_id)
+    conflicts[HELD] -= conflicts[RESERVED]
+    return conflicts
+
+
+def _raise_for(conflicts: dict):
+    if conflicts[RESERVED]:
+        raise SeatConflict("One or more selected seats are already reserved.", conflicts[RESERVED], RESERVED)
+    if conflicts[HELD]:
+        raise SeatConflict("One or more seats are held by another user.", conflicts[HELD], HELD)
+
+
+def reserve_seats(screening, seat_ids, client_id: str = "", **reservation_fields) -> Reservation:
+    seat_ids = sorted(set(seat_ids))
+
+    with transaction.atomic():
+        store = get_hold_store()
+        owned = store.claim(screening.id, seat_ids, client_id) if client_id else set()
+
+        _raise_for(find_conflicts(screening, seat_ids, client_id))
+
+        reservation = Reservation(screening=screening, **reservation_fields)
+        # Counted below together with its seats, in one update.
+        reservation._sale_recorded = True
+        reservation.save(force_insert=True)
+
+        try:
+            with transaction.atomic():
+                ReservedSeat.objects.bulk_create([
+                    ReservedSeat(reservation=reservation, screening=screening, seat_id=seat_id)
+                    for seat_id in seat_ids
+                ])
+        except IntegrityError:
+            # Lost a race against a buyer that was not holding these seats.
+            _raise_for(find_conflicts(screening, seat_ids, client_id))
+            raise SeatConflict("One or more selected seats are already reserved.", seat_ids)
+
+        adjust_occupancy(screening.id, reserved=len(seat_ids))
+        if reservation.status != CANCELLED:
+            record_sale(screening, reservations=1, seats=len(seat_ids))
+        if owned:
+            store.consume(screening.id, owned, client_id)
+        publish_seat_change(screening.id, seat_ids, "reserved")
+
+    return reservation
+
+
+class BulkItem:
+    def __init__(self, index: int, screening_id: int, seat_ids, fields: dict):
+        self.index = index
+        self.screening_id = screening_id
+        self.seat_ids = sorted(set(seat_ids))
+        self.fields = fields
+        self.reservation = None
+        self.error = None
+
+    def result(self) -> dict:
+        if self.error is not None:
+            return {"index": self.index, "ok": False, "errors": self.error}
+        return {"index": self.index, "ok": True, "id": self.reservation.id, "seat_ids": self.seat_ids}
+
+
+def _taken_seats(screenings: dict) -> dict:
+    taken = {sid: set() for sid in screenings}
+    for screening_id, seat_id in ReservedSeat.objects.filter(screening_id__in=screenings).values_list(
+        "screening_id", "seat_id"
+    ):
+        taken[screening_id].add(seat_id)
+
+    for screening_id, holds in get_hold_store().active_many(screenings).items():
+        taken[screening_id].update(holds)
+    return taken
+
+
+def _taken(item, seat_ids):
+    item.error = {"seat_ids": seat_ids, "detail": "One or more selected seats are already reserved or held."}
+
+
+def _plan(items, screenings: dict):
+    # Validate every item against one shared picture of each screening, and
+    # against the seats earlier items in the batch already claimed.
+    taken = _taken_seats(screenings)
+    for item in items:
+        screening = screenings.get(item.screening_id)
+        if screening is None:
+            item.error = {"screening": "Screening not found."}
+            continue
+        layout = screening_layout(screening)
+        if layout.unknown(item.seat_ids):
+            item.error = {"seat_ids": layout.unknown(item.seat_ids), "detail": "Seats do not belong to the screening hall."}
+            continue
+        clash = sorted(taken[item.screening_id].intersection(item.seat_ids))
+        if clash:
+            _taken(item, clash)
+            continue
+        taken[item.screening_id].update(item.seat_ids)
+
+
+def _recheck_holds(items):
+    # Holds are not covered by the ReservedSeat constraint, so one taken since
+    # _plan would be booked over: look again just before inserting.
+    store = get_hold_store()
+    wanted = {}
+    for item in items:
+        wanted.setdefault(item.screening_id, set()).update(item.seat_ids)
+    held = {}
+    for screening_id, seat_ids in wanted.items():
+        holds = store.held_queryset(screening_id, seat_ids, "")
+        if holds is None:
+            held[screening_id] = store.conflicts(screening_id, seat_ids, "")
+        else:
+            # Lock what we found until the insert commits. A hold placed after
+            # this read can no longer book the seat: the constraint stops it.
+            held[screening_id] = set(holds.select_for_update().values_list("seat_id", flat=True))
+    for item in items:
+        clash = sorted(held[item.screening_id].intersection(item.seat_ids))
+        if clash:
+            _taken(item, clash)
+
+
+def _insert(items):
+    reservations = Reservation.objects.bulk_create([
+        Reservation(screening_id=item.screening_id, **item.fields) for item in items
+    ])
+    for item, reservation in zip(items, reservations):
+        item.reservation = reservation
+    ReservedSeat.objects.bulk_create(
+        [
+            ReservedSeat(reservation=item.reservation, screening_id=item.screening_id, seat_id=seat_id)
+            for item in items
+            for seat_id in item.seat_ids
+        ],
+        batch_size=1000,
+    )
+
+
+def _nothing_to_insert(items, all_or_nothing: bool) -> bool:
+    valid = [item for item in items if item.error is None]
+    if all_or_nothing and len(valid) < len(items):
+        for item in valid:
+            item.error = {"detail": "Not attempted because other items failed."}
+        return True
+    return not valid
+
+
+def reserve_in_bulk(items, all_or_nothing: bool = False) -> list:
+    """Book many reservations at once; items are BulkItem instances and get their result or error set."""
+    screenings = Screening.objects.select_related("hall").in_bulk({item.screening_id for item in items})
+    _plan(items, screenings)
+    if _nothing_to_insert(items, all_or_nothing):
+        return items
+
+    with transaction.atomic():
+        _recheck_holds([item for item in items if item.error is None])
+        if _nothing_to_insert(items, all_or_nothing):
+            return items
+        valid = [item for item in items if item.error is None]
+
+        try:
+            with transaction.atomic():
+                _insert(valid)
+        except IntegrityError:
+            # A buyer outside the batch took a seat after we planned. Fall back
+            # to one savepoint per item so only the clashing ones fail.
+            if all_or_nothing:
+                for item in valid:
+                    item.reservation = None
+                    item.error = {"detail": "Seats changed while booking, nothing was reserved."}
+                return items
+            for item in valid:
+                try:
+                    item.reservation = reserve_seats(screenings[item.screening_id], item.seat_ids, **item.fields)
+                except SeatConflict as exc:
+                    item.error = {"seat_ids": exc.seat_ids, "detail": exc.detail}
+            return items
+
+        by_screening = {}
+        sales = {}
+        for item in valid:
+            by_screening.setdefault(item.screening_id, []).extend(item.seat_ids)
+            if item.reservation.status != CANCELLED:
+                booked, seats = sales.get(item.screening_id, (0, 0))
+                sales[item.screening_id] = (booked + 1, seats + len(item.seat_ids))
+        for screening_id, seat_ids in by_screening.items():
+            adjust_occupancy(screening_id, reserved=len(seat_ids))
+            publish_seat_change(screening_id, seat_ids, RESERVED)
+            transaction.on_commit(lambda sid=screening_id: invalidate_schedule_seats(sid))
+        for screening_id, (booked, seats) in sales.items():
+            record_sale(screenings[screening_id], reservations=booked, seats=seats)
+    return items
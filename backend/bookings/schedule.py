@@ -0,0 +1,145 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Screening
+
+GENERATION_KEY = "bookings:schedule:gen"
+
+
+def _generation() -> int:
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, 1, None)
+        generation = cache.get(GENERATION_KEY, 1)
+    return generation
+
+
+def _day_key(day, generation: int) -> str:
+    return f"bookings:schedule:{generation}:{day.isoformat()}"
+
+
+def _seats_key(day, generation: int) -> str:
+    return f"bookings:schedule-seats:{generation}:{day.isoformat()}"
+
+
+def _cache_seconds() -> int:
+    return int(getattr(settings, "SCHEDULE_CACHE_SECONDS", 3600))
+
+
+def _day_start_hour() -> int:
+    return int(getattr(settings, "SCHEDULE_DAY_START_HOUR", 0))
+
+
+def cinema_day(moment):
+    # Late shows that start after midnight still belong to the previous
+    # evening's programme when SCHEDULE_DAY_START_HOUR is set.
+    return (timezone.localtime(moment) - timedelta(hours=_day_start_hour())).date()
+
+
+def day_bounds(day) -> tuple:
+    start = timezone.make_aware(datetime.combine(day, time.min)) + timedelta(hours=_day_start_hour())
+    return start, start + timedelta(days=1)
+
+
+def _build_day(day) -> dict:
+    start, end = day_bounds(day)
+    screenings = (
+        Screening.objects.filter(start_time__gte=start, start_time__lt=end)
+        .select_related("movie", "hall")
+        .order_by("movie__title", "movie_id", "start_time", "id")
+    )
+
+    movies = {}
+    for s in screenings:
+        movie = movies.get(s.movie_id)
+        if movie is None:
+            movie = movies[s.movie_id] = {
+                "id": s.movie_id,
+                "title": s.movie.title,
+                "genre": s.movie.genre,
+                "duration_minutes": s.movie.duration_minutes,
+                "poster_url": s.movie.poster_url,
+                "screenings": [],
+            }
+        movie["screenings"].append({
+            "id": s.id,
+            "hall_id": s.hall_id,
+            "hall_name": s.hall.name,
+            "start_time": s.start_time.isoformat(),
+            "end_time": s.end_time.isoformat(),
+            "language": s.language,
+            "is_3d": s.is_3d,
+            "base_price": str(s.base_price),
+        })
+    return {"date": day.isoformat(), "movies": list(movies.values())}
+
+
+def _build_seat_counts(payload: dict) -> dict:
+    screening_ids = [s["id"] for movie in payload["movies"] for s in movie["screenings"]]
+    if not screening_ids:
+        return {}
+    return {
+        sid: max(0, seat_count - reserved_count)
+        for sid, seat_count, reserved_count in Screening.objects.filter(id__in=screening_ids).values_list(
+            "id", "hall__seat_count", "reserved_count"
+        )
+    }
+
+
+def get_schedule_day(day) -> dict:
+    generation = _generation()
+
+    payload = cache.get(_day_key(day, generation))
+    if payload is None:
+        payload = _build_day(day)
+        cache.set(_day_key(day, generation), payload, _cache_seconds())
+
+    counts = cache.get(_seats_key(day, generation))
+    if counts is None:
+        counts = _build_seat_counts(payload)
+        cache.set(_seats_key(day, generation), counts, _cache_seconds())
+
+    return {
+        "date": payload["date"],
+        "movies": [
+            dict(movie, screenings=[dict(s, remaining_seats=counts.get(s["id"], 0)) for s in movie["screenings"]])
+            for movie in payload["movies"]
+        ],
+    }
+
+
+def get_schedule(first_day, last_day) -> list:
+    days = []
+    day = first_day
+    while day <= last_day:
+        days.append(get_schedule_day(day))
+        day += timedelta(days=1)
+    return days
+
+
+def invalidate_schedule_days(*moments):
+    generation = _generation()
+    keys = set()
+    for moment in moments:
+        if moment is not None:
+            day = cinema_day(moment)
+            keys.update([_day_key(day, generation), _seats_key(day, generation)])
+    cache.delete_many(list(keys))
+
+
+def invalidate_schedule_seats(screening_id: int):
+    start_time = Screening.objects.filter(pk=screening_id).values_list("start_time", flat=True).first()
+    if start_time is not None:
+        cache.delete(_seats_key(cinema_day(start_time), _generation()))
+
+
+def invalidate_schedule():
+    # Movie and hall details appear on every day; start a new key generation
+    # rather than hunting down each cached day.
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 2, None)
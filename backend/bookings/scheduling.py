@@ -0,0 +1,143 @@
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Hall, Screening
+from .schedule import invalidate_schedule_days
+from .stats import record_screenings
+
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+
+class ScheduleConflict(Exception):
+    def __init__(self, conflicts: list):
+        super().__init__(f"{len(conflicts)} screening(s) overlap the hall schedule.")
+        self.conflicts = conflicts
+
+
+def cleaning_minutes() -> int:
+    return int(getattr(settings, "SCREENING_CLEANING_MINUTES", 15))
+
+
+class HallIntervals:
+    """Screenings of one hall as [start, end) intervals sorted by start."""
+
+    def __init__(self):
+        self.starts = []
+        self.items = []
+        self.longest = timedelta(0)
+
+    def add(self, start, end, ref):
+        i = bisect_left(self.starts, start)
+        self.starts.insert(i, start)
+        self.items.insert(i, (start, end, ref))
+        self.longest = max(self.longest, end - start)
+
+    def overlapping(self, start, end, gap=timedelta(0)) -> list:
+        # Anything overlapping [start - gap, end + gap) starts no earlier than
+        # `longest` before it, so only that slice of the index is scanned.
+        lo = bisect_left(self.starts, start - gap - self.longest)
+        hi = bisect_left(self.starts, end + gap)
+        return [ref for s, e, ref in self.items[lo:hi] if e + gap > start and s < end + gap]
+
+
+def build_index(hall_ids, first, last, exclude=None) -> dict:
+    index = {hall_id: HallIntervals() for hall_id in hall_ids}
+    existing = (
+        Screening.objects.filter(hall_id__in=hall_ids, start_time__lt=last, end_time__gt=first)
+        .exclude(pk=exclude)
+        .values_list("id", "hall_id", "start_time", "end_time")
+    )
+    for pk, hall_id, start, end in existing:
+        index[hall_id].add(start, end, {"screening_id": pk})
+    return index
+
+
+def find_overlaps(hall_id: int, start, end, exclude=None, gap_minutes: int = None) -> list:
+    """Ids of screenings in the hall within the cleaning gap of [start, end)."""
+    gap = timedelta(minutes=cleaning_minutes() if gap_minutes is None else gap_minutes)
+    index = build_index([hall_id], start - gap, end + gap, exclude)
+    return [ref["screening_id"] for ref in index[hall_id].overlapping(start, end, gap)]
+
+
+def expand_templates(templates, first_day, last_day) -> list:
+    """Screening instances for every template day and time between the two dates, inclusive."""
+    planned = []
+    days = (last_day - first_day).days + 1
+    for n, template in enumerate(templates):
+        duration = timedelta(minutes=template["movie"].duration_minutes)
+        weekdays = set(template["days"])
+        for offset in range(days):
+            day = first_day + timedelta(days=offset)
+            if day.weekday() not in weekdays:
+                continue
+            for start_at in template["times"]:
+                start = timezone.make_aware(datetime.combine(day, start_at))
+                planned.append({
+                    "template": n,
+                    "screening": Screening(
+                        movie=template["movie"],
+                        hall=template["hall"],
+                        start_time=start,
+                        end_time=start + duration,
+                        language=template["language"],
+                        is_3d=template["is_3d"],
+                        base_price=template["base_price"],
+                    ),
+                    "gap": timedelta(minutes=template["buffer_minutes"]),
+                })
+    planned.sort(key=lambda p: (p["screening"].hall_id, p["screening"].start_time))
+    return planned
+
+
+def _check(planned: list) -> list:
+    hall_ids = {p["screening"].hall_id for p in planned}
+    gap = max(p["gap"] for p in planned)
+    first = min(p["screening"].start_time for p in planned) - gap
+    last = max(p["screening"].end_time for p in planned) + gap
+    index = build_index(hall_ids, first, last)
+
+    conflicts = []
+    for p in planned:
+        s = p["screening"]
+        clashes = index[s.hall_id].overlapping(s.start_time, s.end_time, p["gap"])
+        if clashes:
+            conflicts.append({
+                "template": p["template"],
+                "hall_id": s.hall_id,
+                "start_time": s.start_time.isoformat(),
+                "end_time": s.end_time.isoformat(),
+                "conflicts_with": clashes,
+            })
+        else:
+            index[s.hall_id].add(s.start_time, s.end_time, {"template": p["template"], "start_time": s.start_time.isoformat()})
+    return conflicts
+
+
+def schedule_screenings(templates, first_day, last_day, dry_run: bool = False) -> list:
+    """Expand the templates, reject the lot if any screening overlaps, else bulk create them."""
+    planned = expand_templates(templates, first_day, last_day)
+    if not planned:
+        return []
+
+    with transaction.atomic():
+        # Lock the halls so two schedulers cannot both pass the check and
+        # then insert overlapping screenings.
+        list(Hall.objects.select_for_update().filter(id__in={p["screening"].hall_id for p in planned}).values("id"))
+        conflicts = _check(planned)
+        if conflicts:
+            raise ScheduleConflict(conflicts)
+
+        screenings = [p["screening"] for p in planned]
+        if dry_run:
+            return screenings
+        screenings = Screening.objects.bulk_create(screenings, batch_size=1000)
+        # bulk_create skips post_save, which normally drops cached days and
+        # counts the new slots in the sales stats.
+        record_screenings(screenings)
+        starts = [s.start_time for s in screenings]
+        transaction.on_commit(lambda: invalidate_schedule_days(*starts))
+    return screenings
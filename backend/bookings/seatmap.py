@@ -0,0 +1,169 @@
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .availability import HallLayout, SeatAvailability
+from .models import Hall, Seat, Screening
+from .occupancy import refresh_seat_counts
+from .publisher import publish_screening_update
+from .utils import owner_hash, seat_delta_payload
+
+
+def _layout_key(hall_id: int, version: int) -> str:
+    return f"bookings:hall-layout:v3:{hall_id}:{version}"
+
+
+def _snapshot_key(screening_id: int, version: int) -> str:
+    return f"bookings:seat-map:{screening_id}:{version}"
+
+
+def _cache_seconds() -> int:
+    return int(getattr(settings, "SEAT_MAP_CACHE_SECONDS", 300))
+
+
+def _layout_seconds() -> int:
+    return int(getattr(settings, "HALL_LAYOUT_CACHE_SECONDS", 86400))
+
+
+def get_hall_layout(hall_id: int, version: int = None) -> HallLayout:
+    """The hall's seat-to-bit mapping, cached per Hall.layout_version (looked up when not given)."""
+    if version is None:
+        version = Hall.objects.filter(pk=hall_id).values_list("layout_version", flat=True).first() or 0
+    key = _layout_key(hall_id, version)
+    layout = cache.get(key)
+    if layout is None:
+        layout = HallLayout(
+            hall_id,
+            Seat.objects.filter(hall_id=hall_id)
+            .order_by("row", "number")
+            .values_list("id", "row", "number", "is_wheelchair"),
+        )
+        cache.set(key, layout, _layout_seconds())
+    return layout
+
+
+def _loaded_version(screening):
+    # Screenings loaded with select_related("hall") already carry the version.
+    return screening.hall.layout_version if Screening.hall.is_cached(screening) else None
+
+
+def screening_layout(screening) -> HallLayout:
+    return get_hall_layout(screening.hall_id, _loaded_version(screening))
+
+
+def unknown_hall_seats(screening, seat_ids) -> list:
+    # Use the shared layout when it is warm; otherwise look up just the
+    # requested seats instead of loading the whole hall.
+    version = _loaded_version(screening)
+    layout = cache.get(_layout_key(screening.hall_id, version)) if version is not None else None
+    if layout is not None:
+        return layout.unknown(seat_ids)
+    known = set(Seat.objects.filter(hall_id=screening.hall_id, id__in=seat_ids).values_list("id", flat=True))
+    return [seat_id for seat_id in seat_ids if seat_id not in known]
+
+
+def invalidate_hall_layout(hall_id: int):
+    # A new version, not a cache delete: other processes may hold the old
+    # layout in a local cache and must not keep using its bit indexes.
+    Hall.objects.filter(pk=hall_id).update(layout_version=F("layout_version") + 1)
+    refresh_seat_counts([hall_id])
+    Screening.objects.filter(hall_id=hall_id).update(seat_version=F("seat_version") + 1)
+
+
+def bump_seat_version(screening_id: int) -> int:
+    # The UPDATE holds the row lock until commit, so no other bump can land
+    # between it and the read: every delta gets its own seq. Callers are
+    # usually in a transaction already; no savepoint is needed for that case.
+    with transaction.atomic(savepoint=False):
+        Screening.objects.filter(pk=screening_id).update(seat_version=F("seat_version") + 1)
+        return Screening.objects.filter(pk=screening_id).values_list("seat_version", flat=True).first()
+
+
+def publish_seat_change(screening_id: int, seat_ids, state: str, client_id: str = "", notify: bool = True) -> tuple:
+    seq = bump_seat_version(screening_id)
+    payload = seat_delta_payload(screening_id, seq, seat_ids, state, client_id)
+    if notify:
+        transaction.on_commit(lambda: publish_screening_update(screening_id, payload))
+    return seq, payload
+
+
+def _build_snapshot(screening) -> dict:
+    availability = SeatAvailability.from_db(screening, screening_layout(screening))
+    reserved, held = availability.reserved, availability.held
+
+    seats = [
+        {
+            "id": seat_id,
+            "row": row,
+            "number": number,
+            "is_reserved": bool(reserved >> bit & 1),
+            "is_held": bool(held >> bit & 1),
+            "held_by_me": False,
+        }
+        for bit, (seat_id, row, number, _) in enumerate(availability.layout.iter_seats())
+    ]
+
+    digest = hashlib.sha1(
+        repr((screening.id, screening.seat_version, reserved, sorted(availability.holders.items()))).encode()
+    ).hexdigest()
+
+    return {
+        "seq": screening.seat_version,
+        "digest": digest,
+        "seats": seats,
+        "availability": availability,
+    }
+
+
+def _is_fresh(snapshot) -> bool:
+    if snapshot is None:
+        return False
+    next_expiry = snapshot["availability"].next_expiry
+    return not (next_expiry and next_expiry <= timezone.now())
+
+
+def get_seat_map_snapshot(screening) -> dict:
+    key = _snapshot_key(screening.id, screening.seat_version)
+    snapshot = cache.get(key)
+    if not _is_fresh(snapshot):
+        snapshot = _build_snapshot(screening)
+        cache.set(key, snapshot, _cache_seconds())
+    return snapshot
+
+
+async def aget_seat_map_snapshot(screening) -> dict:
+    key = _snapshot_key(screening.id, screening.seat_version)
+    snapshot = await cache.aget(key)
+    if not _is_fresh(snapshot):
+        snapshot = await sync_to_async(_build_snapshot)(screening)
+        await cache.aset(key, snapshot, _cache_seconds())
+    return snapshot
+
+
+def get_availability(screening) -> SeatAvailability:
+    return get_seat_map_snapshot(screening)["availability"]
+
+
+def render_seat_map(screening, snapshot: dict, client_id: str = "") -> tuple:
+    availability = snapshot["availability"]
+    mine = sorted(availability.layout.seat_ids_in(availability.held_by(client_id)))
+
+    seats = snapshot["seats"]
+    if mine:
+        mine_set = set(mine)
+        seats = [dict(s, held_by_me=True) if s["id"] in mine_set else s for s in seats]
+
+    etag = hashlib.sha1(f"{snapshot['digest']}:{mine}".encode()).hexdigest()
+    data = {
+        "screening_id": screening.id,
+        "hall_id": screening.hall_id,
+        "seq": snapshot["seq"],
+        "owner": owner_hash(client_id),
+        "seats": seats,
+    }
+    return data, f'"{etag}"'
@@ -1,5 +1,4 @@
 from rest_framework import serializers
-from django.db import transaction, IntegrityError
 from .models import (
     Movie,
     Hall,
@@ -7,9 +6,11 @@ from .models import (
     Screening,
     Reservation,
     ReservedSeat,
-    SeatHold,
 )
-from django.utils import timezone
+from .layouts import LayoutError, normalize_layout
+from .reservations import BulkItem, SeatConflict, reserve_in_bulk, reserve_seats
+from .scheduling import WEEKDAYS, cleaning_minutes, find_overlaps
+from .seatmap import unknown_hall_seats
 
 
 class MovieSerializer(serializers.ModelSerializer):
@@ -25,6 +26,16 @@ class HallSerializer(serializers.ModelSerializer):
         model = Hall
         fields = "__all__"
 
+    def validate(self, attrs):
+        total_rows = attrs.get("total_rows", getattr(self.instance, "total_rows", 0))
+        seats_per_row = attrs.get("seats_per_row", getattr(self.instance, "seats_per_row", 0))
+        layout = attrs.get("layout", getattr(self.instance, "layout", None) or {})
+        try:
+            attrs["layout"] = normalize_layout(layout, total_rows, seats_per_row)
+        except LayoutError as e:
+            raise serializers.ValidationError({"layout": str(e)})
+        return attrs
+
 
 class SeatSerializer(serializers.ModelSerializer):
     class Meta:
@@ -45,6 +56,22 @@ class ScreeningSerializer(serializers.ModelSerializer):
         source="hall",
         write_only=True,
     )
+    seats_left = serializers.IntegerField(read_only=True)
+
+    def validate(self, attrs):
+        hall = attrs.get("hall", getattr(self.instance, "hall", None))
+        start = attrs.get("start_time", getattr(self.instance, "start_time", None))
+        end = attrs.get("end_time", getattr(self.instance, "end_time", None))
+        if start and end and end <= start:
+            raise serializers.ValidationError({"end_time": "Must be after start_time."})
+        if hall and start and end:
+            overlaps = find_overlaps(hall.id, start, end, exclude=getattr(self.instance, "pk", None))
+            if overlaps:
+                raise serializers.ValidationError({
+                    "conflicts_with": overlaps,
+                    "detail": f"Overlaps another screening in this hall, allowing {cleaning_minutes()} minutes for cleaning.",
+                })
+        return attrs
 
     class Meta:
         model = Screening
@@ -59,12 +86,105 @@ class ScreeningSerializer(serializers.ModelSerializer):
             "language",
             "is_3d",
             "base_price",
+            "reserved_count",
+            "held_count",
+            "seats_left",
             "created_at",
             "updated_at",
         ]
 
 
+class ScreeningListSerializer(serializers.ModelSerializer):
+    movie_id = serializers.IntegerField(read_only=True)
+    movie_title = serializers.CharField(source="movie.title", read_only=True)
+    hall_id = serializers.IntegerField(read_only=True)
+    hall_name = serializers.CharField(source="hall.name", read_only=True)
+    seats_left = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Screening
+        fields = [
+            "id",
+            "movie_id",
+            "movie_title",
+            "hall_id",
+            "hall_name",
+            "start_time",
+            "end_time",
+            "language",
+            "is_3d",
+            "base_price",
+            "reserved_count",
+            "held_count",
+            "seats_left",
+        ]
+
+
+class ScheduleTemplateSerializer(serializers.Serializer):
+    # Resolved for all templates at once by ScreeningScheduleSerializer.
+    movie_id = serializers.IntegerField(min_value=1)
+    hall_id = serializers.IntegerField(min_value=1)
+    days = serializers.ListField(child=serializers.CharField(), required=False, max_length=7)
+    times = serializers.ListField(child=serializers.TimeField(), allow_empty=False, max_length=24)
+    buffer_minutes = serializers.IntegerField(min_value=0, max_value=240, required=False)
+    language = serializers.ChoiceField(choices=Screening.Language.choices, default=Screening.Language.SR)
+    is_3d = serializers.BooleanField(default=False)
+    base_price = serializers.DecimalField(max_digits=7, decimal_places=2)
+
+    def validate_days(self, value):
+        # Weekday names ("mon") or numbers (0 = Monday); omitted means every day.
+        days = set()
+        for day in value:
+            day = day.strip().lower()[:3]
+            if day.isdigit() and int(day) < 7:
+                days.add(int(day))
+            elif day in WEEKDAYS:
+                days.add(WEEKDAYS.index(day))
+            else:
+                raise serializers.ValidationError(f"Unknown weekday {day!r}.")
+        return sorted(days)
+
+    def validate(self, attrs):
+        attrs.setdefault("days", list(range(7)))
+        attrs.setdefault("buffer_minutes", cleaning_minutes())
+        return attrs
+
+
+class ScreeningScheduleSerializer(serializers.Serializer):
+    max_days = 92
+
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    templates = serializers.ListField(child=ScheduleTemplateSerializer(), allow_empty=False, max_length=200)
+    dry_run = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        span = (attrs["end_date"] - attrs["start_date"]).days
+        if span < 0:
+            raise serializers.ValidationError({"end_date": "Must not be before start_date."})
+        if span >= self.max_days:
+            raise serializers.ValidationError({"end_date": f"At most {self.max_days} days can be scheduled at once."})
+
+        templates = attrs["templates"]
+        movies = Movie.objects.in_bulk({t["movie_id"] for t in templates})
+        halls = Hall.objects.in_bulk({t["hall_id"] for t in templates})
+        errors = {}
+        for i, template in enumerate(templates):
+            template["movie"] = movies.get(template.pop("movie_id"))
+            template["hall"] = halls.get(template.pop("hall_id"))
+            missing = {f"{name}_id": ["Does not exist."] for name in ("movie", "hall") if template[name] is None}
+            if missing:
+                errors[i] = missing
+        if errors:
+            raise serializers.ValidationError({"templates": errors})
+        return attrs
+
+
 class ReservedSeatSerializer(serializers.ModelSerializer):
+    row = serializers.IntegerField(source="seat.row", read_only=True)
+    number = serializers.IntegerField(source="seat.number", read_only=True)
+    hall_name = serializers.CharField(source="seat.hall.name", read_only=True)
+
     class Meta:
         model = ReservedSeat
         fields = "__all__"
@@ -88,10 +208,12 @@ class ReservationSerializer(serializers.ModelSerializer):
 
 
 class ReservationCreateSerializer(serializers.ModelSerializer):
-    seat_ids = serializers.PrimaryKeyRelatedField(
-        queryset=Seat.objects.all(),
-        many=True,
-        write_only=True
+    screening = serializers.PrimaryKeyRelatedField(queryset=Screening.objects.select_related("hall"))
+    seat_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100,
+        write_only=True,
     )
     client_id = serializers.CharField(
         write_only=True,
@@ -115,52 +237,60 @@ class ReservationCreateSerializer(serializers.ModelSerializer):
 
     def validate(self, attrs):
         screening = attrs["screening"]
-        seats = attrs["seat_ids"]
-
-        hall_seat_ids = set(
-            Seat.objects.filter(hall=screening.hall).values_list("id", flat=True)
-        )
-        for s in seats:
-            if s.id not in hall_seat_ids:
-                raise serializers.ValidationError("One or more seats do not belong to the screening hall.")
+        attrs["seat_ids"] = sorted(set(attrs["seat_ids"]))
+
+        unknown = unknown_hall_seats(screening, attrs["seat_ids"])
+        if unknown:
+            raise serializers.ValidationError(
+                {"seat_ids": unknown, "detail": "One or more seats do not belong to the screening hall."}
+            )
+        # Reserved and held seats are checked by reserve_seats inside its
+        # transaction, in a single query.
         return attrs
 
     def create(self, validated_data):
-        seats = validated_data.pop("seat_ids")
-        screening = validated_data["screening"]
+        seat_ids = validated_data.pop("seat_ids")
         client_id = (validated_data.pop("client_id", "") or "").strip()
 
-        with transaction.atomic():
-            SeatHold.objects.filter(
-                screening=screening,
-                expires_at__lte=timezone.now()
-            ).delete()
-
-            if client_id:
-                active_holds = SeatHold.objects.filter(
-                    screening=screening,
-                    seat__in=seats,
-                    expires_at__gt=timezone.now(),
-                )
-                conflicts = active_holds.exclude(held_by=client_id)
-                if conflicts.exists():
-                    conflict_ids = list(conflicts.values_list("seat_id", flat=True))
-                    raise serializers.ValidationError(
-                        {"seat_ids": conflict_ids, "detail": "One or more seats are held by another user."}
-                    )
-                
-            reservation = Reservation.objects.create(**validated_data)
-
-            try:
-                ReservedSeat.objects.bulk_create([
-                    ReservedSeat(
-                        reservation=reservation,
-                        screening=screening,
-                        seat=seat
-                    )
-                    for seat in seats
-                ])
-            except IntegrityError:
-                raise serializers.ValidationError("One or more selected seats are already reserved.")
-
-        return reservation
+        try:
+            return reserve_seats(
+                validated_data.pop("screening"),
+                seat_ids,
+                client_id,
+                **validated_data,
+            )
+        except SeatConflict as exc:
+            raise serializers.ValidationError({"seat_ids": exc.seat_ids, "detail": exc.detail})
+
+
+class BulkReservationItemSerializer(serializers.Serializer):
+    screening = serializers.IntegerField()
+    customer_name = serializers.CharField(max_length=150)
+    customer_email = serializers.EmailField()
+    seat_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=100)
+    status = serializers.ChoiceField(choices=Reservation.Status.choices, required=False)
+
+
+class BulkReservationSerializer(serializers.Serializer):
+    reservations = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=1000)
+    all_or_nothing = serializers.BooleanField(default=False)
+
+    def create(self, validated_data):
+        all_or_nothing = validated_data["all_or_nothing"]
+        items, results = [], []
+        for index, raw in enumerate(validated_data["reservations"]):
+            item = BulkReservationItemSerializer(data=raw)
+            if not item.is_valid():
+                results.append({"index": index, "ok": False, "errors": item.errors})
+                continue
+            fields = dict(item.validated_data)
+            items.append(BulkItem(index, fields.pop("screening"), fields.pop("seat_ids"), fields))
+
+        if items and not (all_or_nothing and results):
+            reserve_in_bulk(items, all_or_nothing)
+        elif all_or_nothing:
+            for item in items:
+                item.error = {"detail": "Not attempted because other items failed."}
+
+        results += [item.result() for item in items]
+        return sorted(results, key=lambda r: r["index"])
@@ -0,0 +1,176 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .allocator import ZONES, find_best_block
+from .holds import get_hold_store
+from .models import ReservedSeat
+from .seatmap import get_availability, publish_seat_change
+from .utils import owner_hash
+
+
+class SeatActionError(Exception):
+    def __init__(self, detail: str, status_code: int = 400, seat_ids=None):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+        self.seat_ids = seat_ids
+
+    def as_data(self) -> dict:
+        data = {"detail": self.detail}
+        if self.seat_ids is not None:
+            data["seat_ids"] = self.seat_ids
+        return data
+
+
+def clean_client_id(client_id) -> str:
+    # Clients send JSON; anything but a string would fail later in owner_hash.
+    if not client_id:
+        raise SeatActionError("client_id is required.")
+    if not isinstance(client_id, str):
+        raise SeatActionError("client_id must be a string.")
+    return client_id
+
+
+def clean_seat_request(client_id, seat_ids) -> list:
+    if not client_id or not isinstance(seat_ids, list) or not seat_ids:
+        raise SeatActionError("client_id and seat_ids are required.")
+    clean_client_id(client_id)
+    try:
+        return [int(sid) for sid in seat_ids]
+    except (TypeError, ValueError):
+        raise SeatActionError("seat_ids must be a list of integers.")
+
+
+def clean_hold_seconds(hold_seconds=None) -> int:
+    """The client's hold length, defaulting to SEAT_HOLD_SECONDS and capped at SEAT_HOLD_MAX_SECONDS."""
+    maximum = int(getattr(settings, "SEAT_HOLD_MAX_SECONDS", 600))
+    if hold_seconds is None or hold_seconds == "":
+        return min(int(getattr(settings, "SEAT_HOLD_SECONDS", 120)), maximum)
+    if isinstance(hold_seconds, bool):
+        raise SeatActionError("hold_seconds must be a positive integer.")
+    try:
+        hold_seconds = int(hold_seconds)
+    except (TypeError, ValueError):
+        raise SeatActionError("hold_seconds must be a positive integer.")
+    if hold_seconds < 1:
+        raise SeatActionError("hold_seconds must be a positive integer.")
+    return min(hold_seconds, maximum)
+
+
+def _hold_expiry(hold_seconds: int):
+    return timezone.now() + timezone.timedelta(seconds=hold_seconds)
+
+
+def check_hold(availability, client_id: str, seat_ids: list):
+    """Reject a hold that the snapshot already shows cannot succeed; the store has the final say."""
+    if availability.layout.unknown(seat_ids):
+        raise SeatActionError("One or more seats do not belong to the screening hall.")
+
+    already_reserved, held_by_others = availability.conflicts(seat_ids, client_id)
+    if already_reserved:
+        raise SeatActionError("One or more seats are already reserved.", 409, already_reserved)
+    if held_by_others:
+        raise SeatActionError("One or more seats are currently held.", 409, held_by_others)
+
+
+def commit_hold(screening_id: int, client_id: str, seat_ids: list, hold_seconds: int, notify: bool = True) -> tuple:
+    expires_at = _hold_expiry(hold_seconds)
+
+    with transaction.atomic():
+        # The snapshot in check_hold may predate a booking; the table is the last word.
+        reserved = list(
+            ReservedSeat.objects.filter(screening_id=screening_id, seat_id__in=seat_ids).values_list("seat_id", flat=True)
+        )
+        if reserved:
+            raise SeatActionError("One or more seats are already reserved.", 409, sorted(reserved))
+        conflict_ids = get_hold_store().acquire(screening_id, seat_ids, client_id, expires_at)
+        if conflict_ids:
+            raise SeatActionError("One or more seats are currently held.", 409, conflict_ids)
+
+        seq, delta = publish_seat_change(screening_id, seat_ids, "held", client_id, notify=notify)
+
+    data = {"ok": True, "expires_at": expires_at.isoformat(), "seq": seq, "owner": owner_hash(client_id)}
+    return data, delta
+
+
+def hold_seats(screening, client_id, seat_ids, hold_seconds=None, availability=None, notify: bool = True) -> tuple:
+    seat_ids = clean_seat_request(client_id, seat_ids)
+    hold_seconds = clean_hold_seconds(hold_seconds)
+    check_hold(availability or get_availability(screening), client_id, seat_ids)
+    return commit_hold(screening.id, client_id, seat_ids, hold_seconds, notify)
+
+
+def commit_release(screening_id: int, client_id: str, seat_ids: list, notify: bool = True) -> tuple:
+    seq, delta = None, None
+    with transaction.atomic():
+        released = get_hold_store().release(screening_id, seat_ids, client_id)
+        if released:
+            seq, delta = publish_seat_change(screening_id, released, "free", notify=notify)
+
+    return {"ok": True, "released": released, "seq": seq}, delta
+
+
+def release_seats(screening, client_id, seat_ids, notify: bool = True) -> tuple:
+    seat_ids = clean_seat_request(client_id, seat_ids)
+    return commit_release(screening.id, client_id, seat_ids, notify)
+
+
+def extend_holds(screening, client_id, seat_ids, hold_seconds=None) -> dict:
+    seat_ids = clean_seat_request(client_id, seat_ids)
+    expires_at = _hold_expiry(clean_hold_seconds(hold_seconds))
+
+    extended = get_hold_store().extend(screening.id, seat_ids, client_id, expires_at)
+    if not extended:
+        raise SeatActionError("None of these seats are held by this client.", 409, seat_ids)
+    return {"ok": True, "extended": extended, "expires_at": expires_at.isoformat()}
+
+
+def allocate_seats(
+    screening,
+    client_id,
+    party_size,
+    adjacent: bool = True,
+    wheelchair=0,
+    zone=None,
+    hold_seconds=None,
+    notify: bool = True,
+) -> tuple:
+    clean_client_id(client_id)
+    try:
+        party_size, wheelchair = int(party_size), int(wheelchair or 0)
+    except (TypeError, ValueError):
+        raise SeatActionError("party_size and wheelchair must be integers.")
+    max_party = int(getattr(settings, "SEAT_ALLOCATION_MAX_PARTY", 10))
+    if not 1 <= party_size <= max_party:
+        raise SeatActionError(f"party_size must be between 1 and {max_party}.")
+    if not 0 <= wheelchair <= party_size:
+        raise SeatActionError("wheelchair cannot exceed party_size.")
+    if zone and (not isinstance(zone, str) or zone not in ZONES):
+        raise SeatActionError(f"zone must be one of {', '.join(ZONES)}.")
+    hold_seconds = clean_hold_seconds(hold_seconds)
+    adjacent = adjacent not in (False, 0, "0", "false", "False")
+
+    availability = get_availability(screening)
+    layout = availability.layout
+    exclude = 0
+    for _ in range(int(getattr(settings, "SEAT_ALLOCATION_ATTEMPTS", 3))):
+        seat_ids = find_best_block(availability, party_size, client_id, adjacent, wheelchair, zone, exclude)
+        if not seat_ids:
+            raise SeatActionError("No seats match the request.", 409)
+        try:
+            data, delta = hold_seats(screening, client_id, seat_ids, hold_seconds, availability, notify)
+        except SeatActionError as e:
+            # Someone got there between our snapshot and the hold; steer around
+            # those seats and try the next best block.
+            if e.status_code != 409 or not e.seat_ids:
+                raise
+            exclude |= layout.mask(e.seat_ids)
+            continue
+
+        data["seats"] = [
+            {"id": sid, "row": layout.rows[layout.bit_of[sid]], "number": layout.numbers[layout.bit_of[sid]]}
+            for sid in seat_ids
+        ]
+        return data, delta
+    raise SeatActionError("Seats were taken while allocating, please try again.", 409)
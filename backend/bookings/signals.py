@@ -0,0 +1,145 @@
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Hall, Movie, Reservation, Screening, Seat, ReservedSeat
+from .occupancy import adjust_occupancy
+from .schedule import invalidate_schedule, invalidate_schedule_days, invalidate_schedule_seats
+from .seatmap import invalidate_hall_layout, publish_seat_change
+from .stats import (
+    CANCELLED,
+    SCREENING_FIELDS,
+    move_screening,
+    record_sale,
+    record_screenings,
+    screening_values,
+    seat_sale,
+    take_back,
+)
+
+
+@receiver([post_save, post_delete], sender=Seat)
+def seat_layout_changed(sender, instance, **kwargs):
+    invalidate_hall_layout(instance.hall_id)
+
+
+@receiver(post_save, sender=ReservedSeat)
+def reserved_seat_created(sender, instance, created, **kwargs):
+    if created:
+        # reserve_seats and the bulk path use bulk_create and publish their own
+        # change; a seat saved on its own (admin, API) must still move seat_version.
+        adjust_occupancy(instance.screening_id, reserved=1)
+        publish_seat_change(instance.screening_id, [instance.seat_id], "reserved")
+        screening = seat_sale(instance)
+        if screening:
+            record_sale(screening, seats=1)
+
+
+def _deleting(origin, instance) -> dict:
+    # A delete() sends pre_delete for every row it cascades to before removing
+    # any, all with the same origin: gather the bookings there and take them
+    # back once instead of per seat.
+    holder = origin if origin is not None else instance
+    if "_deleting_bookings" not in holder.__dict__:
+        holder._deleting_bookings = {"screenings": {}, "reservations": {}, "seats": []}
+    return holder._deleting_bookings
+
+
+@receiver(pre_delete, sender=ReservedSeat)
+def reserved_seat_deleting(sender, instance, origin=None, **kwargs):
+    _deleting(origin, instance)["seats"].append((instance.screening_id, instance.reservation_id, instance.seat_id))
+
+
+@receiver(pre_delete, sender=Reservation)
+def reservation_deleting(sender, instance, origin=None, **kwargs):
+    _deleting(origin, instance)["reservations"][instance.pk] = (instance.screening_id, instance.status)
+
+
+@receiver(pre_delete, sender=Screening)
+def screening_deleting(sender, instance, origin=None, **kwargs):
+    _deleting(origin, instance)["screenings"][instance.pk] = {field: getattr(instance, field) for field in SCREENING_FIELDS}
+
+
+@receiver(post_delete, sender=ReservedSeat)
+@receiver(post_delete, sender=Reservation)
+@receiver(post_delete, sender=Screening)
+def bookings_deleted(sender, instance, origin=None, **kwargs):
+    # The first post_delete of a cascade comes after all of its pre_deletes.
+    deleting = (origin if origin is not None else instance).__dict__.pop("_deleting_bookings", None)
+    if deleting is None:
+        return
+    screenings, reservations, seats = deleting["screenings"], deleting["reservations"], deleting["seats"]
+    take_back(screenings, reservations, [(sid, rid) for sid, rid, _ in seats])
+
+    freed = {}
+    for screening_id, _, seat_id in seats:
+        freed.setdefault(screening_id, []).append(seat_id)
+    touched = {sid for sid, _ in reservations.values()}.union(freed).difference(screenings)
+    for screening_id in touched:
+        if screening_id in freed:
+            adjust_occupancy(screening_id, reserved=-len(freed[screening_id]))
+            publish_seat_change(screening_id, freed[screening_id], "free")
+        transaction.on_commit(lambda sid=screening_id: invalidate_schedule_seats(sid))
+
+
+@receiver(pre_save, sender=Reservation)
+def reservation_changing(sender, instance, **kwargs):
+    instance._previous = None
+    if instance.pk:
+        instance._previous = Reservation.objects.filter(pk=instance.pk).values("status", "screening_id").first()
+
+
+@receiver(post_save, sender=Reservation)
+def reservation_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_schedule_seats(instance.screening_id))
+
+
+@receiver(post_save, sender=Reservation)
+def reservation_sales_changed(sender, instance, created, **kwargs):
+    # Seats are counted where they are booked (ReservedSeat.screening) and
+    # only leave the totals when the whole reservation is cancelled.
+    active = instance.status != CANCELLED
+    previous = getattr(instance, "_previous", None)
+    if created or previous is None:
+        if active and not getattr(instance, "_sale_recorded", False):
+            record_sale(instance.screening, reservations=1)
+        return
+    was_active = previous["status"] != CANCELLED
+    if was_active and (not active or previous["screening_id"] != instance.screening_id):
+        record_sale(screening_values(previous["screening_id"]), reservations=-1)
+    if active and (not was_active or previous["screening_id"] != instance.screening_id):
+        record_sale(instance.screening, reservations=1)
+    if active != was_active:
+        sign = 1 if active else -1
+        seats = ReservedSeat.objects.filter(reservation=instance).values("screening_id").annotate(n=Count("id"))
+        for row in seats:
+            record_sale(screening_values(row["screening_id"]), seats=sign * row["n"])
+
+
+@receiver(pre_save, sender=Screening)
+def screening_moving(sender, instance, **kwargs):
+    instance._previous = None
+    if instance.pk:
+        instance._previous = Screening.objects.filter(pk=instance.pk).values(*SCREENING_FIELDS).first()
+
+
+@receiver([post_save, post_delete], sender=Screening)
+def screening_changed(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous", None)
+    moments = (previous and previous["start_time"], instance.start_time)
+    transaction.on_commit(lambda: invalidate_schedule_days(*moments))
+
+
+@receiver(post_save, sender=Screening)
+def screening_sales_changed(sender, instance, created, **kwargs):
+    if created or instance._previous is None:
+        record_screenings([instance])
+    else:
+        move_screening(instance, instance._previous)
+
+
+@receiver([post_save, post_delete], sender=Movie)
+@receiver([post_save, post_delete], sender=Hall)
+def schedule_details_changed(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_schedule)
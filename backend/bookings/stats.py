@@ -0,0 +1,255 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Exists, F, Sum, Value
+from django.db.models.functions import Greatest
+
+from .models import DailySalesStat, Hall, Reservation, ReservedSeat, Screening
+from .schedule import cinema_day, day_bounds
+
+CANCELLED = Reservation.Status.CANCELLED
+DIMENSIONS = {
+    "day": ["day"],
+    "movie": ["movie_id", "movie__title"],
+    "hall": ["hall_id", "hall__name"],
+    "language": ["language"],
+}
+CENTS = Decimal("0.01")
+METRICS = ["screenings", "capacity", "reservations", "seats_sold", "revenue"]
+SCREENING_FIELDS = ["start_time", "movie_id", "hall_id", "language", "base_price"]
+
+
+def _key(screening: dict) -> tuple:
+    return cinema_day(screening["start_time"]), screening["movie_id"], screening["hall_id"], screening["language"]
+
+
+def _as_dict(screening) -> dict:
+    if isinstance(screening, dict):
+        return screening
+    return {field: getattr(screening, field) for field in SCREENING_FIELDS}
+
+
+def _stat(key: tuple) -> DailySalesStat:
+    day, movie_id, hall_id, language = key
+    return DailySalesStat(day=day, movie_id=movie_id, hall_id=hall_id, language=language)
+
+
+def _bump(key: tuple, **deltas):
+    deltas = {field: value for field, value in deltas.items() if value}
+    if not deltas:
+        return
+    day, movie_id, hall_id, language = key
+    rows = DailySalesStat.objects.filter(day=day, movie_id=movie_id, hall_id=hall_id, language=language)
+    changes = {
+        field: Greatest(F(field) + value, Value(0), output_field=DailySalesStat._meta.get_field(field))
+        for field, value in deltas.items()
+    }
+    if rows.update(**changes) or max(deltas.values()) <= 0:
+        return
+    # First booking of the key; another writer may be creating the row too.
+    DailySalesStat.objects.bulk_create([_stat(key)], ignore_conflicts=True)
+    rows.update(**changes)
+
+
+def _bump_many(deltas: dict):
+    """Apply {key: {field: delta}} with a few set-based queries instead of a couple per key."""
+    if len(deltas) < 2:
+        for key, changes in deltas.items():
+            _bump(key, **changes)
+        return
+    with transaction.atomic():
+        DailySalesStat.objects.bulk_create([_stat(key) for key in deltas], ignore_conflicts=True, batch_size=1000)
+        rows = DailySalesStat.objects.select_for_update().filter(
+            day__in={key[0] for key in deltas}, hall_id__in={key[2] for key in deltas}
+        )
+        changed = []
+        for row in rows:
+            changes = deltas.get((row.day, row.movie_id, row.hall_id, row.language))
+            if changes is None:
+                continue
+            for field, value in changes.items():
+                setattr(row, field, max(getattr(row, field) + value, 0))
+            changed.append(row)
+        DailySalesStat.objects.bulk_update(changed, METRICS, batch_size=500)
+
+
+def record_sale(screening, reservations: int = 0, seats: int = 0):
+    """Add (or with negative counts, take back) bookings for a screening instance or SCREENING_FIELDS dict."""
+    screening = _as_dict(screening)
+    _bump(
+        _key(screening),
+        reservations=reservations,
+        seats_sold=seats,
+        revenue=seats * Decimal(screening["base_price"]),
+    )
+
+
+def record_screenings(screenings, sign: int = 1):
+    """Add the slots and seats on offer for new screenings, or take them back with sign=-1."""
+    screenings = list(screenings)
+    seat_counts = dict(Hall.objects.filter(id__in={s.hall_id for s in screenings}).values_list("id", "seat_count"))
+    deltas = {}
+    for screening in screenings:
+        changes = deltas.setdefault(_key(_as_dict(screening)), {"screenings": 0, "capacity": 0})
+        changes["screenings"] += sign
+        changes["capacity"] += sign * seat_counts.get(screening.hall_id, 0)
+    _bump_many(deltas)
+
+
+def take_back(screenings: dict, reservations: dict, seats) -> None:
+    """Remove deleted screenings, reservations and booked seats from the aggregates in a few queries.
+
+    screenings maps ids to SCREENING_FIELDS dicts, reservations maps ids to
+    (screening_id, status) and seats are (screening_id, reservation_id) pairs.
+    """
+    seats = list(seats)
+    statuses = {pk: state for pk, (_, state) in reservations.items()}
+    statuses.update(
+        Reservation.objects.filter(pk__in={rid for _, rid in seats} - set(statuses)).values_list("pk", "status")
+    )
+    values = dict(screenings)
+    wanted = {sid for sid, _ in reservations.values()} | {sid for sid, _ in seats}
+    for row in Screening.objects.filter(pk__in=wanted - set(values)).values("id", *SCREENING_FIELDS):
+        values[row.pop("id")] = row
+    seat_counts = dict(
+        Hall.objects.filter(id__in={s["hall_id"] for s in screenings.values()}).values_list("id", "seat_count")
+    )
+
+    deltas = {}
+
+    def add(screening_id, **changes):
+        if screening_id in values:
+            row = deltas.setdefault(_key(values[screening_id]), dict.fromkeys(METRICS, 0))
+            for field, value in changes.items():
+                row[field] += value
+
+    for screening_id, screening in screenings.items():
+        add(screening_id, screenings=-1, capacity=-seat_counts.get(screening["hall_id"], 0))
+    for screening_id, state in reservations.values():
+        if state != CANCELLED:
+            add(screening_id, reservations=-1)
+    for screening_id, reservation_id in seats:
+        if screening_id in values and statuses.get(reservation_id, CANCELLED) != CANCELLED:
+            add(screening_id, seats_sold=-1, revenue=-Decimal(values[screening_id]["base_price"]))
+    _bump_many({key: {f: v for f, v in changes.items() if v} for key, changes in deltas.items()})
+
+
+def screening_values(screening_id: int):
+    return Screening.objects.filter(pk=screening_id).values(*SCREENING_FIELDS).first()
+
+
+def move_screening(screening, previous: dict):
+    """Move a screening's slot and bookings from its previous day, movie, hall, language or price."""
+    current = _as_dict(screening)
+    if previous is None or all(previous[f] == current[f] for f in SCREENING_FIELDS):
+        return
+    reservations = Reservation.objects.filter(screening_id=screening.pk).exclude(status=CANCELLED).count()
+    seats = ReservedSeat.objects.filter(screening_id=screening.pk).exclude(reservation__status=CANCELLED).count()
+    seat_counts = dict(
+        Hall.objects.filter(id__in={previous["hall_id"], current["hall_id"]}).values_list("id", "seat_count")
+    )
+    for values, sign in ((previous, -1), (current, 1)):
+        _bump(
+            _key(values),
+            screenings=sign,
+            capacity=sign * seat_counts.get(values["hall_id"], 0),
+            reservations=sign * reservations,
+            seats_sold=sign * seats,
+            revenue=sign * seats * Decimal(values["base_price"]),
+        )
+
+
+def seat_sale(reserved_seat):
+    """The screening of a reserved seat as a SCREENING_FIELDS dict, or None when its booking does not count."""
+    active = Reservation.objects.filter(pk=reserved_seat.reservation_id).exclude(status=CANCELLED)
+    return (
+        Screening.objects.filter(pk=reserved_seat.screening_id)
+        .annotate(active=Exists(active))
+        .filter(active=True)
+        .values(*SCREENING_FIELDS)
+        .first()
+    )
+
+
+def rebuild_stats(first_day=None, last_day=None, batch_size: int = 500) -> int:
+    """Recompute the aggregates for screenings between two cinema days (inclusive); returns the rows written.
+
+    Reads go in batches of screenings. Bookings committed while a day is being
+    rebuilt can be missed, so rebuild busy days when sales are quiet.
+    """
+    screenings = Screening.objects.order_by("id")
+    stale = DailySalesStat.objects.all()
+    if first_day is not None:
+        screenings = screenings.filter(start_time__gte=day_bounds(first_day)[0])
+        stale = stale.filter(day__gte=first_day)
+    if last_day is not None:
+        screenings = screenings.filter(start_time__lt=day_bounds(last_day)[1])
+        stale = stale.filter(day__lte=last_day)
+
+    totals = {}
+    last_id = 0
+    while True:
+        batch = list(screenings.filter(id__gt=last_id).values("id", "hall__seat_count", *SCREENING_FIELDS)[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1]["id"]
+        ids = [s["id"] for s in batch]
+        reservations = dict(
+            Reservation.objects.filter(screening_id__in=ids)
+            .exclude(status=CANCELLED)
+            .values("screening_id")
+            .annotate(n=Count("id"))
+            .values_list("screening_id", "n")
+        )
+        seats = dict(
+            ReservedSeat.objects.filter(screening_id__in=ids)
+            .exclude(reservation__status=CANCELLED)
+            .values("screening_id")
+            .annotate(n=Count("id"))
+            .values_list("screening_id", "n")
+        )
+        for s in batch:
+            row = totals.setdefault(_key(s), dict.fromkeys(METRICS, 0))
+            sold = seats.get(s["id"], 0)
+            row["screenings"] += 1
+            row["capacity"] += s["hall__seat_count"]
+            row["reservations"] += reservations.get(s["id"], 0)
+            row["seats_sold"] += sold
+            row["revenue"] += sold * s["base_price"]
+
+    with transaction.atomic():
+        stale.delete()
+        DailySalesStat.objects.bulk_create(
+            [
+                DailySalesStat(day=day, movie_id=movie_id, hall_id=hall_id, language=language, **row)
+                for (day, movie_id, hall_id, language), row in totals.items()
+            ],
+            batch_size=1000,
+        )
+    return len(totals)
+
+
+def _finish(row: dict) -> dict:
+    row["occupancy"] = round(row["seats_sold"] / row["capacity"], 4) if row["capacity"] else 0.0
+    row["revenue"] = str(Decimal(row["revenue"] or 0).quantize(CENTS))
+    return row
+
+
+def sales_report(first_day, last_day, group_by=("day",)) -> dict:
+    """Totals and per-group rows over the aggregates between two cinema days (inclusive)."""
+    stats = DailySalesStat.objects.filter(day__gte=first_day, day__lte=last_day)
+    sums = {metric: Sum(metric) for metric in METRICS}
+
+    totals = stats.aggregate(**sums)
+    totals = {metric: totals[metric] or 0 for metric in METRICS}
+
+    fields = [field for dimension in group_by for field in DIMENSIONS[dimension]]
+    rows = stats.order_by(*fields).values(*fields).annotate(**sums)
+    return {
+        "from": first_day.isoformat(),
+        "to": last_day.isoformat(),
+        "days": (last_day - first_day).days + 1,
+        "group_by": list(group_by),
+        "totals": _finish(totals),
+        "rows": [_finish(row) for row in rows],
+    }
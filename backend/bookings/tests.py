@@ -1,8 +1,50 @@
+import asyncio
+import csv
+import io
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from io import StringIO
+from pathlib import Path
+
+import numpy as np
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta
 from rest_framework.test import APITestCase
 from rest_framework import status
-from .models import Movie, Hall, Seat, Screening, Reservation, ReservedSeat, SeatHold
+from rest_framework_simplejwt.tokens import AccessToken
+from . import benchmarks, reservations
+from .analytics import fill_ranks, get_heatmap, grouped_percentiles
+from .allocator import block_starts, find_best_block
+from .availability import HallLayout, SeatAvailability
+from .loadtools import AsgiWebsocket
+from .routing import websocket_urlpatterns
+from .seatmap import bump_seat_version, get_hall_layout
+from .layouts import LayoutError, generate_seats, import_layouts_csv, import_layouts_jsonl, iter_layout_jsonl, provision_halls
+from .occupancy import reconcile_occupancy
+from .holds import DatabaseHoldStore, RedisHoldStore, get_hold_store, sweep_expired_holds
+from .publisher import CoalescingPublisher, coalesce
+from .models import DailySalesStat, Movie, Hall, Seat, Screening, Reservation, ReservedSeat, SeatHold
+from .stats import rebuild_stats
+
+try:
+    import fakeredis
+    import lupa  # noqa: F401  fakeredis needs it to run Lua scripts
+except ImportError:
+    fakeredis = None
 
 
 class ReservationFlowTests(APITestCase):
@@ -67,6 +109,79 @@ class ReservationFlowTests(APITestCase):
         reserved_count = ReservedSeat.objects.filter(reservation_id=reservation_id).count()
         self.assertEqual(reserved_count, 2)
 
+    def test_retry_with_idempotency_key_replays_original_reservation(self):
+        caches["idempotency"].clear()
+        payload = {
+            "screening": self.screening.id,
+            "customer_name": "Test User",
+            "customer_email": "test@example.com",
+            "seat_ids": [self.seats[0].id],
+        }
+        headers = {"HTTP_IDEMPOTENCY_KEY": "order-1"}
+
+        first = self.client.post(self.reservation_url, payload, format="json", **headers)
+        retry = self.client.post(self.reservation_url, payload, format="json", **headers)
+
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data["id"], first.data["id"])
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Reservation.objects.count(), 1)
+
+        other = dict(payload, seat_ids=[self.seats[1].id])
+        resp = self.client.post(self.reservation_url, other, format="json", **headers)
+        self.assertEqual(resp.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_idempotency_keys_of_anonymous_callers_do_not_collide(self):
+        caches["idempotency"].clear()
+        payload = {
+            "screening": self.screening.id,
+            "customer_name": "Test User",
+            "customer_email": "first@example.com",
+            "seat_ids": [self.seats[0].id],
+        }
+        headers = {"HTTP_IDEMPOTENCY_KEY": "1"}
+
+        first = self.client.post(self.reservation_url, payload, format="json", **headers)
+        other = dict(payload, customer_email="second@example.com", seat_ids=[self.seats[1].id])
+        resp = self.client.post(self.reservation_url, other, format="json", **headers)
+
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertNotEqual(resp.data["id"], first.data["id"])
+        self.assertNotIn("Idempotent-Replayed", resp)
+
+    def test_reservation_query_count_is_independent_of_hall_and_party_size(self):
+        def book(hall_size, party):
+            cache.clear()
+            hall = Hall.objects.create(name=f"Hall {hall_size}-{party}", total_rows=1, seats_per_row=hall_size)
+            generate_seats(hall)
+            screening = Screening.objects.create(
+                movie=self.movie,
+                hall=hall,
+                start_time=self.screening.start_time,
+                end_time=self.screening.end_time,
+                base_price="300.00",
+            )
+            seat_ids = list(hall.seats.values_list("id", flat=True)[:party])
+            with CaptureQueriesContext(connection) as queries:
+                resp = self.client.post(
+                    self.reservation_url,
+                    {
+                        "screening": screening.id,
+                        "customer_name": "Test User",
+                        "customer_email": "test@example.com",
+                        "seat_ids": seat_ids,
+                        "client_id": "client-a",
+                    },
+                    format="json",
+                )
+            self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+            return len(queries)
+
+        counts = {book(hall_size, party) for hall_size in (10, 400) for party in (1, 8)}
+        self.assertEqual(len(counts), 1, counts)
+        # Includes the one update of the daily sales aggregate.
+        self.assertLessEqual(counts.pop(), 14)
+
     def test_double_booking_is_rejected(self):
         payload1 = {
             "screening": self.screening.id,
@@ -119,6 +234,45 @@ class ReservationFlowTests(APITestCase):
         self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn("held", str(resp.data).lower())
 
+    def test_conflict_reports_seat_ids_without_orphaned_reservation(self):
+        SeatHold.objects.create(
+            screening=self.screening,
+            seat=self.seats[4],
+            held_by="client-other",
+            expires_at=timezone.now() + timedelta(minutes=5),
+        )
+        payload = {
+            "screening": self.screening.id,
+            "customer_name": "Test User",
+            "customer_email": "test@example.com",
+            "seat_ids": [self.seats[3].id, self.seats[4].id],
+            "client_id": "client-a",
+        }
+
+        resp = self.client.post(self.reservation_url, payload, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(resp.data["seat_ids"], [str(self.seats[4].id)])
+        self.assertFalse(Reservation.objects.exists())
+
+    def test_reservation_consumes_own_holds(self):
+        SeatHold.objects.create(
+            screening=self.screening,
+            seat=self.seats[5],
+            held_by="client-a",
+            expires_at=timezone.now() + timedelta(minutes=5),
+        )
+        payload = {
+            "screening": self.screening.id,
+            "customer_name": "Test User",
+            "customer_email": "test@example.com",
+            "seat_ids": [self.seats[5].id],
+            "client_id": "client-a",
+        }
+
+        resp = self.client.post(self.reservation_url, payload, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(SeatHold.objects.filter(seat=self.seats[5]).exists())
+
     def test_expired_hold_does_not_block_reservation(self):
         SeatHold.objects.create(
             screening=self.screening,
@@ -137,3 +291,1592 @@ class ReservationFlowTests(APITestCase):
 
         resp = self.client.post(self.reservation_url, payload, format="json")
         self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+
+
+IN_MEMORY_CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class SeatMapCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.movie = Movie.objects.create(title="Dune", duration_minutes=150)
+        self.hall = Hall.objects.create(name="Hall A", total_rows=2, seats_per_row=2)
+        self.seats = [
+            Seat.objects.create(hall=self.hall, row=r, number=n)
+            for r in [1, 2]
+            for n in [1, 2]
+        ]
+        now = timezone.now()
+        self.screening = Screening.objects.create(
+            movie=self.movie,
+            hall=self.hall,
+            start_time=now + timedelta(days=1),
+            end_time=now + timedelta(days=1, hours=3),
+            base_price="400.00",
+        )
+        self.url = f"/api/screenings/{self.screening.id}/seat-map/"
+
+    def test_seat_map_returns_layout_and_etag(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual([s["id"] for s in resp.data["seats"]], [s.id for s in self.seats])
+        self.assertTrue(resp["ETag"])
+
+    def test_unchanged_seat_map_returns_304(self):
+        etag = self.client.get(self.url)["ETag"]
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_cached_seat_map_skips_seat_queries(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_hold_invalidates_snapshot_and_marks_held_by_me(self):
+        etag = self.client.get(self.url, HTTP_X_CLIENT_ID="client-a")["ETag"]
+
+        resp = self.client.post(
+            f"/api/screenings/{self.screening.id}/hold/",
+            {"client_id": "client-a", "seat_ids": [self.seats[0].id]},
+            format="json",
+        )
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+        mine = self.client.get(self.url, HTTP_X_CLIENT_ID="client-a", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(mine.status_code, status.HTTP_200_OK)
+        self.assertTrue(mine.data["seats"][0]["held_by_me"])
+
+        other = self.client.get(self.url, HTTP_X_CLIENT_ID="client-b")
+        self.assertTrue(other.data["seats"][0]["is_held"])
+        self.assertFalse(other.data["seats"][0]["held_by_me"])
+        self.assertNotEqual(mine["ETag"], other["ETag"])
+
+    def test_reservation_invalidates_snapshot(self):
+        self.client.get(self.url)
+        self.client.post(
+            "/api/reservations/",
+            {
+                "screening": self.screening.id,
+                "customer_name": "Test User",
+                "customer_email": "test@example.com",
+                "seat_ids": [self.seats[1].id],
+            },
+            format="json",
+        )
+        resp = self.client.get(self.url)
+        self.assertTrue(resp.data["seats"][1]["is_reserved"])
+
+
+class SeatAvailabilityTests(SimpleTestCase):
+    def setUp(self):
+        # 40 rows x 30 seats, seat ids offset so they never match bit positions
+        self.layout = HallLayout(
+            1,
+            [(1000 + r * 30 + n, r + 1, n + 1, r == 0) for r in range(40) for n in range(30)],
+        )
+
+    def test_layout_indexes_seats_by_id_and_position(self):
+        self.assertEqual(len(self.layout), 1200)
+        self.assertEqual(self.layout.position[(2, 1)], 30)
+        self.assertEqual(self.layout.seat_ids_in(self.layout.mask([1031, 1000])), [1000, 1031])
+        self.assertEqual(self.layout.unknown([1000, 99]), [99])
+
+    def test_conflicts_split_reserved_and_held_by_others(self):
+        availability = SeatAvailability(
+            self.layout,
+            reserved=self.layout.mask([1005]),
+            holders={"client-a": self.layout.mask([1006]), "client-b": self.layout.mask([1007])},
+        )
+        self.assertEqual(availability.conflicts([1005, 1006, 1007, 1008], "client-a"), ([1005], [1007]))
+        self.assertTrue(availability.all_free([1006, 1008], "client-a"))
+        self.assertFalse(availability.all_free([1006, 1008], "client-b"))
+        self.assertFalse(availability.free() >> self.layout.bit_of[1005] & 1)
+
+
+class SeatAllocatorTests(SimpleTestCase):
+    def setUp(self):
+        # 10 rows x 10 seats with an aisle after seat 5; row 10 seats 1-2 are wheelchair places
+        seats = [
+            ((r - 1) * 10 + n, r, n + (n > 5), r == 10 and n <= 2)
+            for r in range(1, 11)
+            for n in range(1, 11)
+        ]
+        self.layout = HallLayout(1, seats)
+
+    def test_block_never_spans_an_aisle(self):
+        free = (1 << len(self.layout)) - 1
+        starts = block_starts(free, self.layout.adjacent, 6)
+        self.assertEqual(starts, 0)
+        self.assertEqual(bin(block_starts(free, self.layout.adjacent, 5)).count("1"), 20)
+
+    def test_prefers_centre_of_preferred_depth(self):
+        availability = SeatAvailability(self.layout)
+        block = find_best_block(availability, 4, zone="front")
+        self.assertEqual({self.layout.rows[self.layout.bit_of[s]] for s in block}, {3})
+
+        back = find_best_block(availability, 2, zone="back")
+        self.assertEqual([self.layout.numbers[self.layout.bit_of[s]] for s in back], [4, 5])
+
+    def test_respects_blocked_seats_and_wheelchair_needs(self):
+        row_seven = [sid for sid in range(61, 71)]
+        availability = SeatAvailability(self.layout, reserved=self.layout.mask(row_seven))
+        block = find_best_block(availability, 3)
+        self.assertFalse(set(block) & set(row_seven))
+
+        accessible = find_best_block(availability, 3, wheelchair=1)
+        self.assertTrue({91, 92} & set(accessible))
+        self.assertEqual(find_best_block(availability, 3, wheelchair=3), [])
+
+        singles = find_best_block(availability, 3, adjacent=False)
+        self.assertEqual(len(singles), 3)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, SEAT_BROADCAST_COALESCE_MS=0)
+class SeatHoldTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.movie = Movie.objects.create(title="Alien", duration_minutes=117)
+        self.hall = Hall.objects.create(name="Hall H", total_rows=1, seats_per_row=3)
+        self.seats = [Seat.objects.create(hall=self.hall, row=1, number=n) for n in [1, 2, 3]]
+        self.other_hall = Hall.objects.create(name="Hall I", total_rows=1, seats_per_row=1)
+        self.other_seat = Seat.objects.create(hall=self.other_hall, row=1, number=1)
+        now = timezone.now()
+        self.screening = Screening.objects.create(
+            movie=self.movie,
+            hall=self.hall,
+            start_time=now + timedelta(days=1),
+            end_time=now + timedelta(days=1, hours=2),
+            base_price="450.00",
+        )
+        self.hold_url = f"/api/screenings/{self.screening.id}/hold/"
+
+    def test_non_string_client_id_is_a_client_error(self):
+        allocate_url = f"/api/screenings/{self.screening.id}/allocate/"
+        for bad in (5, {"id": 1}, ["a"]):
+            resp = self.client.post(self.hold_url, {"client_id": bad, "seat_ids": [self.seats[0].id]}, format="json")
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST, bad)
+            resp = self.client.post(allocate_url, {"client_id": bad, "party_size": 1}, format="json")
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST, bad)
+        self.assertFalse(SeatHold.objects.exists())
+
+    def test_hold_rejects_seat_from_other_hall(self):
+        resp = self.client.post(
+            self.hold_url, {"client_id": "client-a", "seat_ids": [self.other_seat.id]}, format="json"
+        )
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bad_hold_seconds_are_a_client_error(self):
+        allocate_url = f"/api/screenings/{self.screening.id}/allocate/"
+        for bad in ("abc", 0, -1):
+            resp = self.client.post(
+                self.hold_url, {"client_id": "client-a", "seat_ids": [self.seats[0].id], "hold_seconds": bad}, format="json"
+            )
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST, bad)
+            resp = self.client.post(allocate_url, {"client_id": "client-a", "party_size": 1, "hold_seconds": bad}, format="json")
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST, bad)
+        self.assertFalse(SeatHold.objects.exists())
+
+    def test_seats_booked_outside_reserve_seats_cannot_be_held(self):
+        self.client.get(f"/api/screenings/{self.screening.id}/seat-map/")
+        reservation = Reservation.objects.create(
+            screening=self.screening, customer_name="Box office", customer_email="box@example.com"
+        )
+        self.client.force_authenticate(get_user_model().objects.create_superuser("admin", "admin@example.com", "pass"))
+        resp = self.client.post(
+            "/api/reserved-seats/",
+            {"reservation": reservation.id, "screening": self.screening.id, "seat": self.seats[0].id},
+            format="json",
+        )
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.client.force_authenticate(None)
+        self.screening.refresh_from_db()
+        self.assertGreater(self.screening.seat_version, 0)
+
+        resp = self.client.post(self.hold_url, {"client_id": "client-a", "seat_ids": [self.seats[0].id]}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_409_CONFLICT)
+
+        # bulk_create sends no signals; the check inside the hold transaction still catches it.
+        ReservedSeat.objects.bulk_create([ReservedSeat(reservation=reservation, screening=self.screening, seat=self.seats[1])])
+        resp = self.client.post(self.hold_url, {"client_id": "client-a", "seat_ids": [self.seats[1].id]}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(resp.data["seat_ids"], [self.seats[1].id])
+        self.assertFalse(SeatHold.objects.exists())
+
+    def test_hold_reports_conflicting_seats(self):
+        self.client.post(self.hold_url, {"client_id": "client-a", "seat_ids": [self.seats[0].id]}, format="json")
+        resp = self.client.post(
+            self.hold_url,
+            {"client_id": "client-b", "seat_ids": [self.seats[0].id, self.seats[1].id]},
+            format="json",
+        )
+        self.assertEqual(resp.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(resp.data["seat_ids"], [self.seats[0].id])
+        self.assertFalse(SeatHold.objects.filter(held_by="client-b").exists())
+
+    def _listen(self):
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(f"screening_{self.screening.id}", channel)
+        return lambda: async_to_sync(layer.receive)(channel)["payload"]
+
+    def test_hold_and_release_publish_sequenced_deltas(self):
+        receive = self._listen()
+        seq = self.client.get(f"/api/screenings/{self.screening.id}/seat-map/").data["seq"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            held = self.client.post(
+                self.hold_url, {"client_id": "client-a", "seat_ids": [self.seats[0].id]}, format="json"
+            )
+        delta = receive()
+        self.assertEqual(delta["event"], "seat_delta")
+        self.assertEqual((delta["first_seq"], delta["seq"]), (seq + 1, seq + 1))
+        self.assertEqual(
+            delta["changes"], [{"seat_ids": [self.seats[0].id], "state": "held", "owner": held.data["owner"]}]
+        )
+        self.assertNotIn("client-a", str(delta))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                f"/api/screenings/{self.screening.id}/release/",
+                {"client_id": "client-a", "seat_ids": [self.seats[0].id, self.seats[1].id]},
+                format="json",
+            )
+        delta = receive()
+        self.assertEqual(delta["seq"], seq + 2)
+        self.assertEqual(delta["changes"], [{"seat_ids": [self.seats[0].id], "state": "free", "owner": ""}])
+
+    def test_expired_hold_does_not_block_new_hold(self):
+        SeatHold.objects.create(
+            screening=self.screening,
+            seat=self.seats[2],
+            held_by="client-other",
+            expires_at=timezone.now() - timedelta(seconds=1),
+        )
+        resp = self.client.post(self.hold_url, {"client_id": "client-a", "seat_ids": [self.seats[2].id]}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(SeatHold.objects.get(seat=self.seats[2]).held_by, "client-a")
+
+    def test_seat_map_does_not_delete_expired_holds(self):
+        SeatHold.objects.create(
+            screening=self.screening,
+            seat=self.seats[0],
+            held_by="client-other",
+            expires_at=timezone.now() - timedelta(seconds=1),
+        )
+        resp = self.client.get(f"/api/screenings/{self.screening.id}/seat-map/")
+        self.assertFalse(resp.data["seats"][0]["is_held"])
+        self.assertEqual(SeatHold.objects.count(), 1)
+
+    def test_hold_retry_is_replayed_without_new_delta(self):
+        caches["idempotency"].clear()
+        body = {"client_id": "client-a", "seat_ids": [self.seats[0].id]}
+        first = self.client.post(self.hold_url, body, format="json", HTTP_IDEMPOTENCY_KEY="hold-1")
+        retry = self.client.post(self.hold_url, body, format="json", HTTP_IDEMPOTENCY_KEY="hold-1")
+
+        self.assertEqual(retry.data, first.data)
+        self.screening.refresh_from_db()
+        self.assertEqual(self.screening.seat_version, first.data["seq"])
+
+    def test_allocate_holds_best_block_in_one_request(self):
+        url = f"/api/screenings/{self.screening.id}/allocate/"
+        resp = self.client.post(url, {"client_id": "client-a", "party_size": 2}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(resp.data["seats"]), 2)
+        self.assertEqual(
+            set(SeatHold.objects.filter(held_by="client-a").values_list("seat_id", flat=True)),
+            {seat["id"] for seat in resp.data["seats"]},
+        )
+
+        resp = self.client.post(url, {"client_id": "client-b", "party_size": 2}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_409_CONFLICT)
+        resp = self.client.post(url, {"client_id": "client-b", "party_size": 0}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        for zone in ("balcony", ["front"], {"a": 1}):
+            resp = self.client.post(url, {"client_id": "client-b", "party_size": 1, "zone": zone}, format="json")
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST, zone)
+
+    def counts(self):
+        self.screening.refresh_from_db()
+        return self.screening.reserved_count, self.screening.held_count
+
+    def test_occupancy_counters_follow_holds_and_bookings(self):
+        a, b, c = [seat.id for seat in self.seats]
+        self.client.post(self.hold_url, {"client_id": "client-a", "seat_ids": [a, b]}, format="json")
+        self.client.post(self.hold_url, {"client_id": "client-a", "seat_ids": [a, b]}, format="json")
+        self.client.post(self.hold_url, {"client_id": "client-b", "seat_ids": [c]}, format="json")
+        self.assertEqual(self.counts(), (0, 3))
+
+        self.client.post(
+            f"/api/screenings/{self.screening.id}/release/", {"client_id": "client-b", "seat_ids": [c]}, format="json"
+        )
+        self.assertEqual(self.counts(), (0, 2))
+
+        resp = self.client.post(
+            "/api/reservations/",
+            {
+                "screening": self.screening.id,
+                "customer_name": "Test User",
+                "customer_email": "test@example.com",
+                "seat_ids": [a, b],
+                "client_id": "client-a",
+            },
+            format="json",
+        )
+        self.assertEqual(self.counts(), (2, 0))
+        self.assertEqual(self.client.get(f"/api/screenings/{self.screening.id}/").data["seats_left"], 1)
+
+        Reservation.objects.get(pk=resp.data["id"]).delete()
+        self.assertEqual(self.counts(), (0, 0))
+
+    def test_reconcile_repairs_drift(self):
+        SeatHold.objects.create(
+            screening=self.screening,
+            seat=self.seats[0],
+            held_by="client-a",
+            expires_at=timezone.now() - timedelta(seconds=1),
+        )
+        Screening.objects.filter(pk=self.screening.pk).update(reserved_count=7, held_count=0)
+
+        self.assertEqual(reconcile_occupancy(), 1)
+        self.assertEqual(self.counts(), (0, 1))
+
+        sweep_expired_holds()
+        self.assertEqual(self.counts(), (0, 0))
+        self.assertEqual(reconcile_occupancy(), 0)
+
+    def test_sweeper_deletes_expired_holds_in_batches(self):
+        now = timezone.now()
+        for seat, delta in zip(self.seats, [-30, -20, 60]):
+            SeatHold.objects.create(
+                screening=self.screening,
+                seat=seat,
+                held_by="client-a",
+                expires_at=now + timedelta(seconds=delta),
+            )
+        version = self.screening.seat_version
+
+        swept = sweep_expired_holds(batch_size=1)
+
+        self.assertEqual(swept, {self.screening.id: [self.seats[0].id, self.seats[1].id]})
+        self.assertEqual(list(SeatHold.objects.values_list("seat_id", flat=True)), [self.seats[2].id])
+        self.screening.refresh_from_db()
+        self.assertGreater(self.screening.seat_version, version)
+
+
+class HoldStoreContract:
+    def make_store(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.store = self.make_store()
+        movie = Movie.objects.create(title="Heat", duration_minutes=170)
+        hall = Hall.objects.create(name="Hall S", total_rows=1, seats_per_row=3)
+        self.seat_ids = [Seat.objects.create(hall=hall, row=1, number=n).id for n in [1, 2, 3]]
+        now = timezone.now()
+        self.screening_id = Screening.objects.create(
+            movie=movie,
+            hall=hall,
+            start_time=now + timedelta(days=1),
+            end_time=now + timedelta(days=1, hours=3),
+            base_price="300.00",
+        ).id
+        self.expires_at = now + timedelta(minutes=2)
+
+    def test_acquire_is_all_or_nothing(self):
+        a, b, c = self.seat_ids
+        self.assertEqual(self.store.acquire(self.screening_id, [a], "client-a", self.expires_at), [])
+        self.assertEqual(self.store.acquire(self.screening_id, [a, b], "client-b", self.expires_at), [a])
+        self.assertEqual(set(self.store.active(self.screening_id)), {a})
+        self.assertEqual(self.store.acquire(self.screening_id, [a, c], "client-a", self.expires_at), [])
+        self.assertEqual(self.store.active(self.screening_id)[c][0], "client-a")
+
+    def test_active_many_matches_active(self):
+        a, b, _ = self.seat_ids
+        self.store.acquire(self.screening_id, [a, b], "client-a", self.expires_at)
+        holds = self.store.active_many([self.screening_id, self.screening_id + 1000])
+        self.assertEqual(holds[self.screening_id + 1000], {})
+        self.assertEqual({sid: owner for sid, (owner, _) in holds[self.screening_id].items()}, {a: "client-a", b: "client-a"})
+
+    def test_release_only_drops_own_holds(self):
+        a, b, _ = self.seat_ids
+        self.store.acquire(self.screening_id, [a], "client-a", self.expires_at)
+        self.store.acquire(self.screening_id, [b], "client-b", self.expires_at)
+        self.assertEqual(self.store.release(self.screening_id, [a, b], "client-a"), [a])
+        self.assertEqual(set(self.store.active(self.screening_id)), {b})
+
+    def test_conflicts_and_claim(self):
+        a, b, c = self.seat_ids
+        self.store.acquire(self.screening_id, [a], "client-a", self.expires_at)
+        self.store.acquire(self.screening_id, [b], "client-b", self.expires_at)
+        self.assertEqual(self.store.conflicts(self.screening_id, [a, b, c], "client-a"), {b})
+        self.assertEqual(self.store.claim(self.screening_id, [a, b, c], "client-a"), {a})
+
+    def test_held_count_tracks_hold_records(self):
+        a, b, _ = self.seat_ids
+        self.store.acquire(self.screening_id, [a], "client-a", self.expires_at)
+        self.store.acquire(self.screening_id, [a, b], "client-a", self.expires_at)
+        self.store.acquire(self.screening_id, [b], "client-b", self.expires_at)
+        self.store.release(self.screening_id, [a], "client-a")
+
+        self.assertEqual(self.store.hold_counts([self.screening_id]), {self.screening_id: 1})
+        self.assertEqual(Screening.objects.get(pk=self.screening_id).held_count, 1)
+
+    def test_extend_only_touches_own_holds(self):
+        a, b, _ = self.seat_ids
+        self.store.acquire(self.screening_id, [a], "client-a", self.expires_at)
+        self.store.acquire(self.screening_id, [b], "client-b", self.expires_at)
+        later = self.expires_at + timedelta(minutes=5)
+        self.assertEqual(self.store.extend(self.screening_id, [a, b], "client-a", later), [a])
+        active = self.store.active(self.screening_id)
+        self.assertGreater(active[a][1], self.expires_at + timedelta(minutes=4))
+        self.assertLess(active[b][1], self.expires_at + timedelta(minutes=1))
+
+
+class DatabaseHoldStoreTests(HoldStoreContract, TestCase):
+    def make_store(self):
+        return DatabaseHoldStore()
+
+
+@unittest.skipUnless(fakeredis, "fakeredis with Lua support is not installed")
+class RedisHoldStoreTests(HoldStoreContract, TestCase):
+    def make_store(self):
+        return RedisHoldStore(client=fakeredis.FakeRedis(), prefix="test:")
+
+    def test_purge_expired_drops_lapsed_keys_from_index(self):
+        a, b, _ = self.seat_ids
+        self.store.acquire(self.screening_id, [a, b], "client-a", self.expires_at)
+        self.store.redis.delete(self.store._seat_key(self.screening_id, a))
+        self.assertEqual(self.store.purge_expired(100), {self.screening_id: [a]})
+        self.assertEqual(set(self.store.active(self.screening_id)), {b})
+
+    def test_purge_expired_forgets_screenings_without_holds(self):
+        a, b, _ = self.seat_ids
+        self.store.acquire(self.screening_id, [a, b], "client-a", self.expires_at)
+        self.store.redis.delete(*(self.store._seat_key(self.screening_id, sid) for sid in (a, b)))
+        self.assertEqual(self.store.purge_expired(100), {self.screening_id: [a, b]})
+        self.assertFalse(self.store.redis.smembers(self.store._screenings_key()))
+        self.assertEqual(self.store.purge_expired(100), {})
+
+
+class CoalescingPublisherTests(SimpleTestCase):
+    def delta(self, seq, seat_ids, state, owner=""):
+        return {
+            "event": "seat_delta",
+            "screening_id": 1,
+            "first_seq": seq,
+            "seq": seq,
+            "changes": [{"seat_ids": seat_ids, "state": state, "owner": owner}],
+        }
+
+    def test_contiguous_deltas_merge_to_final_seat_state(self):
+        merged = coalesce([
+            (1, self.delta(6, [10], "free")),
+            (1, self.delta(5, [10, 11], "held", "abc")),
+            (1, self.delta(7, [12], "reserved")),
+        ])
+        self.assertEqual(len(merged), 1)
+        payload = merged[0][1]
+        self.assertEqual((payload["first_seq"], payload["seq"]), (5, 7))
+        self.assertEqual(
+            payload["changes"],
+            [
+                {"seat_ids": [10], "state": "free", "owner": ""},
+                {"seat_ids": [11], "state": "held", "owner": "abc"},
+                {"seat_ids": [12], "state": "reserved", "owner": ""},
+            ],
+        )
+
+    def test_sequence_gaps_are_not_merged(self):
+        merged = coalesce([(1, self.delta(5, [10], "held")), (1, self.delta(7, [11], "held"))])
+        self.assertEqual([(p["first_seq"], p["seq"]) for _, p in merged], [(5, 5), (7, 7)])
+
+    def test_flush_reports_queue_and_coalescing_metrics(self):
+        publisher = CoalescingPublisher(window=1, maxsize=2)
+        publisher._thread = threading.current_thread()  # keep the worker from starting
+        self.assertTrue(publisher.publish(1, {"event": "ping"}))
+        self.assertTrue(publisher.publish(1, {"event": "ping"}))
+        self.assertFalse(publisher.publish(1, {"event": "ping"}))
+        self.assertEqual(publisher.metrics()["queue_depth"], 2)
+
+        with override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS):
+            publisher.flush()
+
+        metrics = publisher.metrics()
+        self.assertEqual((metrics["queue_depth"], metrics["sent"], metrics["dropped"]), (0, 1, 1))
+        self.assertEqual(metrics["coalescing_ratio"], 2.0)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, SEAT_BROADCAST_COALESCE_MS=0)
+class LiveSeatEndpointTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        movie = Movie.objects.create(title="Up", duration_minutes=96)
+        hall = Hall.objects.create(name="Hall L", total_rows=1, seats_per_row=2)
+        self.seats = [Seat.objects.create(hall=hall, row=1, number=n) for n in [1, 2]]
+        now = timezone.now()
+        self.screening = Screening.objects.create(
+            movie=movie,
+            hall=hall,
+            start_time=now + timedelta(days=1),
+            end_time=now + timedelta(days=1, hours=2),
+            base_price="350.00",
+        )
+        self.base = f"/api/live/screenings/{self.screening.id}/"
+
+    async def test_async_hold_release_and_seat_map(self):
+        body = {"client_id": "client-a", "seat_ids": [self.seats[0].id]}
+        resp = await self.async_client.post(self.base + "hold/", body, content_type="application/json")
+        self.assertEqual(resp.status_code, 200)
+
+        resp = await self.async_client.get(self.base + "seat-map/", headers={"X-Client-Id": "client-a"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.json()["seats"][0]["held_by_me"])
+
+        resp = await self.async_client.get(self.base + "seat-map/", headers={"If-None-Match": resp["ETag"], "X-Client-Id": "client-a"})
+        self.assertEqual(resp.status_code, 304)
+
+        resp = await self.async_client.post(self.base + "release/", body, content_type="application/json")
+        self.assertEqual(resp.json()["released"], [self.seats[0].id])
+
+    async def test_async_hold_conflict(self):
+        await self.async_client.post(
+            self.base + "hold/", {"client_id": "client-a", "seat_ids": [self.seats[0].id]}, content_type="application/json"
+        )
+        resp = await self.async_client.post(
+            self.base + "hold/", {"client_id": "client-b", "seat_ids": [self.seats[0].id]}, content_type="application/json"
+        )
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual(resp.json()["seat_ids"], [self.seats[0].id])
+
+    async def test_unknown_screening_is_404(self):
+        resp = await self.async_client.get("/api/live/screenings/999999/seat-map/")
+        self.assertEqual(resp.status_code, 404)
+
+    async def test_async_hold_validates_hold_seconds(self):
+        resp = await self.async_client.post(
+            self.base + "hold/",
+            {"client_id": "client-a", "seat_ids": [self.seats[0].id], "hold_seconds": "abc"},
+            content_type="application/json",
+        )
+        self.assertEqual(resp.status_code, 400)
+
+    async def test_async_hold_retry_is_replayed(self):
+        await sync_to_async(caches["idempotency"].clear)()
+        body = {"client_id": "client-a", "seat_ids": [self.seats[0].id]}
+        first = await self.async_client.post(
+            self.base + "hold/", body, content_type="application/json", headers={"Idempotency-Key": "live-1"}
+        )
+        retry = await self.async_client.post(
+            self.base + "hold/", body, content_type="application/json", headers={"Idempotency-Key": "live-1"}
+        )
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(retry.json(), first.json())
+
+        other = await self.async_client.post(
+            self.base + "hold/", {**body, "seat_ids": [self.seats[1].id]},
+            content_type="application/json", headers={"Idempotency-Key": "live-1"},
+        )
+        self.assertEqual(other.status_code, 422)
+
+
+@override_settings(LIVE_WRITES_THREAD_SENSITIVE=False)
+class LiveSeatWorkerTests(TransactionTestCase):
+    def setUp(self):
+        # The writes run on pool threads with their own connections, which
+        # shared-cache in-memory SQLite fails with table locks.
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("needs a database file or server that handles concurrent connections")
+        cache.clear()
+        movie = Movie.objects.create(title="Up", duration_minutes=96)
+        hall = Hall.objects.create(name="Hall LW", total_rows=1, seats_per_row=4)
+        generate_seats(hall)
+        self.seat_ids = list(hall.seats.values_list("id", flat=True))
+        now = timezone.now()
+        self.screening = Screening.objects.create(
+            movie=movie, hall=hall, start_time=now + timedelta(days=1), end_time=now + timedelta(days=1, hours=2),
+            base_price="350.00",
+        )
+
+    async def test_concurrent_holds_on_worker_threads(self):
+        base = f"/api/live/screenings/{self.screening.id}/"
+
+        async def hold(i):
+            body = {"client_id": f"client-{i}", "seat_ids": [self.seat_ids[i % 2]]}
+            return await self.async_client.post(base + "hold/", body, content_type="application/json")
+
+        responses = await asyncio.gather(*(hold(i) for i in range(6)))
+        self.assertEqual(sorted(r.status_code for r in responses), [200, 200, 409, 409, 409, 409])
+        self.assertEqual(await SeatHold.objects.acount(), 2)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, SEAT_BROADCAST_COALESCE_MS=0)
+class ScreeningConsumerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        movie = Movie.objects.create(title="Jaws", duration_minutes=124)
+        hall = Hall.objects.create(name="Hall W", total_rows=1, seats_per_row=2)
+        self.seats = [Seat.objects.create(hall=hall, row=1, number=n) for n in [1, 2]]
+        now = timezone.now()
+        self.screening = Screening.objects.create(
+            movie=movie,
+            hall=hall,
+            start_time=now + timedelta(days=1),
+            end_time=now + timedelta(days=1, hours=2),
+            base_price="350.00",
+        )
+        SeatHold.objects.create(
+            screening=self.screening,
+            seat=self.seats[1],
+            held_by="client-a",
+            expires_at=now + timedelta(minutes=2),
+        )
+
+    def socket(self, path):
+        return AsgiWebsocket(URLRouter(websocket_urlpatterns), path)
+
+    async def test_connect_pushes_snapshot_with_sequence(self):
+        ws = self.socket(f"/ws/screenings/{self.screening.id}/?client_id=client-a")
+        self.assertTrue(await ws.connect())
+
+        message = await ws.receive_json()
+        self.assertEqual(message["event"], "snapshot")
+        self.assertEqual(message["seq"], self.screening.seat_version)
+        self.assertEqual([s["held_by_me"] for s in message["seats"]], [False, True])
+        await ws.disconnect()
+
+    async def test_unknown_screening_closes_socket(self):
+        ws = self.socket("/ws/screenings/999999/")
+        await ws.connect()
+        output = await ws.receive_output()
+        self.assertEqual(output, {"type": "websocket.close", "code": 4404})
+        await ws.disconnect()
+
+    async def test_hold_command_acks_and_broadcasts_delta(self):
+        ws = self.socket(f"/ws/screenings/{self.screening.id}/?client_id=client-b")
+        await ws.connect()
+        await ws.receive_json()
+
+        await ws.send_json({"action": "hold", "seat_ids": [self.seats[0].id], "request_id": "r1"})
+        first, second = await ws.receive_json(), await ws.receive_json()
+        by_event = {first["event"]: first, second["event"]: second}
+
+        ack = by_event["ack"]
+        self.assertTrue(ack["ok"])
+        self.assertEqual(ack["request_id"], "r1")
+        self.assertEqual(by_event["seat_delta"]["seq"], ack["seq"])
+        self.assertEqual(by_event["seat_delta"]["changes"][0]["seat_ids"], [self.seats[0].id])
+        await ws.disconnect()
+
+    async def test_bad_hold_seconds_are_rejected_and_long_holds_capped(self):
+        ws = self.socket(f"/ws/screenings/{self.screening.id}/?client_id=client-b")
+        await ws.connect()
+        await ws.receive_json()
+
+        for bad in ("abc", 0, -5, True, [1]):
+            await ws.send_json({"action": "hold", "seat_ids": [self.seats[0].id], "hold_seconds": bad})
+            ack = await ws.receive_json()
+            self.assertEqual((ack["ok"], ack["status"]), (False, 400), bad)
+
+        with override_settings(SEAT_HOLD_MAX_SECONDS=300):
+            await ws.send_json({"action": "hold", "seat_ids": [self.seats[0].id], "hold_seconds": 10**7})
+            messages = [await ws.receive_json(), await ws.receive_json()]
+            ack = next(m for m in messages if m["event"] == "ack")
+            self.assertTrue(ack["ok"])
+            self.assertLessEqual(datetime.fromisoformat(ack["expires_at"]), timezone.now() + timedelta(seconds=300))
+
+            await ws.send_json({"action": "extend", "seat_ids": [self.seats[0].id], "hold_seconds": 10**7})
+            ack = await ws.receive_json()
+            self.assertLessEqual(datetime.fromisoformat(ack["expires_at"]), timezone.now() + timedelta(seconds=300))
+        await ws.disconnect()
+
+    async def test_non_string_client_id_is_rejected_without_closing(self):
+        ws = self.socket(f"/ws/screenings/{self.screening.id}/?client_id=client-b")
+        await ws.connect()
+        await ws.receive_json()
+
+        for bad in (5, {"id": 1}):
+            await ws.send_json({"action": "hold", "client_id": bad, "seat_ids": [self.seats[0].id]})
+            ack = await ws.receive_json()
+            self.assertEqual((ack["ok"], ack["status"]), (False, 400), bad)
+
+        await ws.send_json({"action": "hold", "seat_ids": [self.seats[0].id]})
+        messages = [await ws.receive_json(), await ws.receive_json()]
+        self.assertTrue(next(m for m in messages if m["event"] == "ack")["ok"])
+        await ws.disconnect()
+
+    async def test_hold_command_reports_conflict(self):
+        ws = self.socket(f"/ws/screenings/{self.screening.id}/?client_id=client-b")
+        await ws.connect()
+        await ws.receive_json()
+
+        await ws.send_json({"action": "hold", "seat_ids": [self.seats[1].id], "request_id": "r2"})
+        ack = await ws.receive_json()
+        self.assertEqual(ack["event"], "ack")
+        self.assertFalse(ack["ok"])
+        self.assertEqual(ack["status"], 409)
+        self.assertEqual(ack["seat_ids"], [self.seats[1].id])
+
+        await ws.send_json({"action": "steal"})
+        self.assertEqual((await ws.receive_json())["status"], 400)
+        await ws.disconnect()
+
+    async def test_extend_command_pushes_back_expiry(self):
+        ws = self.socket(f"/ws/screenings/{self.screening.id}/?client_id=client-a")
+        await ws.connect()
+        await ws.receive_json()
+
+        await ws.send_json({"action": "extend", "seat_ids": [self.seats[1].id]})
+        ack = await ws.receive_json()
+        self.assertTrue(ack["ok"])
+        self.assertEqual(ack["extended"], [self.seats[1].id])
+        await ws.disconnect()
+
+
+class HallLayoutTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        admin = get_user_model().objects.create_superuser("admin", "admin@example.com", "pass")
+        self.client.force_authenticate(admin)
+
+    def test_create_hall_generates_seats_from_layout(self):
+        resp = self.client.post(
+            "/api/halls/",
+            {
+                "name": "Hall L",
+                "total_rows": 3,
+                "seats_per_row": 5,
+                "layout": {"aisles": [3], "gaps": [[1, 1]], "wheelchair": [[3, 5]]},
+            },
+            format="json",
+        )
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+
+        hall = Hall.objects.get(name="Hall L")
+        self.assertEqual(hall.seats.count(), 3 * 4 - 1)
+        self.assertFalse(hall.seats.filter(number=3).exists())
+        self.assertEqual(list(hall.seats.filter(is_wheelchair=True).values_list("row", "number")), [(3, 5)])
+
+        layout = self.client.get(f"/api/halls/{hall.id}/layout/").data
+        self.assertEqual(layout["aisles"], [3])
+        self.assertEqual(layout["gaps"], [[1, 1]])
+        self.assertEqual(layout["wheelchair"], [[3, 5]])
+
+    def test_seat_changes_move_cached_layout_to_a_new_version(self):
+        hall = Hall.objects.create(name="Hall V", total_rows=1, seats_per_row=2)
+        seat = Seat.objects.create(hall=hall, row=1, number=1)
+        hall.refresh_from_db()
+        stale = get_hall_layout(hall.id, hall.layout_version)
+
+        added = Seat.objects.create(hall=hall, row=1, number=2)
+        hall.refresh_from_db()
+        # The old entry is never deleted, so another process could still read
+        # it; only the version in the key keeps it from being reused.
+        self.assertEqual(list(get_hall_layout(hall.id, hall.layout_version - 1).seat_ids), [seat.id])
+        self.assertEqual(list(stale.seat_ids), [seat.id])
+        self.assertEqual(list(get_hall_layout(hall.id).seat_ids), [seat.id, added.id])
+
+    def test_layout_outside_hall_is_rejected(self):
+        resp = self.client.post(
+            "/api/halls/",
+            {"name": "Hall X", "total_rows": 2, "seats_per_row": 2, "layout": {"gaps": [[3, 1]]}},
+            format="json",
+        )
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("layout", resp.data)
+
+    def test_export_round_trips_through_import(self):
+        provision_halls("Site ", 3, 4, 6, {"aisles": [2], "wheelchair": [[4, 1]]})
+        Seat.objects.filter(hall__name="Site 2", row=1, number=6).delete()
+
+        exported = list(iter_layout_jsonl(Hall.objects.order_by("name")))
+        Hall.objects.all().delete()
+        created = import_layouts_jsonl(exported)
+
+        self.assertEqual(created, {"Site 1": 20, "Site 2": 19, "Site 3": 20})
+        self.assertTrue(Seat.objects.filter(hall__name="Site 3", row=4, number=1, is_wheelchair=True).exists())
+        self.assertEqual(list(iter_layout_jsonl(Hall.objects.order_by("name"))), exported)
+
+    def test_csv_import_and_streaming_export(self):
+        import_layouts_csv(["hall,row,number,is_wheelchair", "Hall C,1,1,0", "Hall C,1,2,1", "Hall C,2,1,0"])
+        hall = Hall.objects.get(name="Hall C")
+        self.assertEqual((hall.total_rows, hall.seats_per_row, hall.seats.count()), (2, 2, 3))
+
+        resp = self.client.get(f"/api/halls/{hall.id}/layout/", {"as": "csv"})
+        body = b"".join(resp.streaming_content).decode()
+        self.assertEqual(body.splitlines(), ["hall,row,number,is_wheelchair", "Hall C,1,1,0", "Hall C,1,2,1", "Hall C,2,1,0"])
+
+        with self.assertRaises(LayoutError):
+            import_layouts_csv(["name,row"])
+
+    def test_csv_import_reports_seats_inserted(self):
+        rows = ["hall,row,number,is_wheelchair", "Hall C,1,1,0", "Hall C,1,2,0", "Hall C,1,2,0"]
+        self.assertEqual(import_layouts_csv(rows), {"Hall C": 2})
+        self.assertEqual(import_layouts_csv(rows + ["Hall D,1,1,0"]), {"Hall C": 0, "Hall D": 1})
+        self.assertEqual(import_layouts_csv(["hall,row,number,is_wheelchair", "Hall C,1,1,0", "Hall C,1,3,0"], replace=True), {"Hall C": 1})
+
+    def test_csv_import_with_replace_makes_the_file_the_layout(self):
+        import_layouts_csv(["hall,row,number,is_wheelchair", "Hall C,1,1,0", "Hall C,1,2,0", "Hall C,2,2,0"])
+        import_layouts_csv(["hall,row,number,is_wheelchair", "Hall C,1,1,1", "Hall C,1,2,0"], replace=True)
+
+        hall = Hall.objects.get(name="Hall C")
+        self.assertEqual((hall.total_rows, hall.seats_per_row), (1, 2))
+        self.assertEqual(list(hall.seats.values_list("row", "number", "is_wheelchair")), [(1, 1, True), (1, 2, False)])
+
+    def test_generating_seats_again_creates_none(self):
+        hall = Hall.objects.create(name="Hall G", total_rows=2, seats_per_row=3)
+        self.assertEqual(generate_seats(hall), 6)
+        self.assertEqual(generate_seats(hall), 0)
+
+    def test_update_regenerates_seats_unless_the_hall_is_booked(self):
+        resp = self.client.post("/api/halls/", {"name": "Hall U", "total_rows": 2, "seats_per_row": 3}, format="json")
+        hall = Hall.objects.get(pk=resp.data["id"])
+        kept = hall.seats.get(row=1, number=1).id
+
+        resp = self.client.patch(f"/api/halls/{hall.id}/", {"layout": {"aisles": [2]}}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(hall.seats.values_list("row", "number")), [(1, 1), (1, 3), (2, 1), (2, 3)])
+        self.assertEqual(hall.seats.get(row=1, number=1).id, kept)
+
+        movie = Movie.objects.create(title="Up", duration_minutes=96)
+        now = timezone.now()
+        screening = Screening.objects.create(
+            movie=movie,
+            hall=hall,
+            start_time=now + timedelta(days=1),
+            end_time=now + timedelta(days=1, hours=2),
+            base_price="300.00",
+        )
+        reservation = Reservation.objects.create(screening=screening, customer_name="A", customer_email="a@example.com")
+        ReservedSeat.objects.create(reservation=reservation, screening=screening, seat_id=kept)
+
+        resp = self.client.patch(f"/api/halls/{hall.id}/", {"name": "Hall V"}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        resp = self.client.patch(f"/api/halls/{hall.id}/", {"total_rows": 3}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        hall.refresh_from_db()
+        self.assertEqual((hall.name, hall.total_rows, hall.seats.count()), ("Hall V", 2, 4))
+
+
+class ScreeningListTests(APITestCase):
+    def setUp(self):
+        self.movies = [Movie.objects.create(title=t, description="x" * 500, duration_minutes=100) for t in "AB"]
+        self.halls = [Hall.objects.create(name=f"Hall {n}", total_rows=1, seats_per_row=1) for n in "12"]
+        self.start = timezone.localtime().replace(hour=10, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        for i in range(12):
+            Screening.objects.create(
+                movie=self.movies[i % 2],
+                hall=self.halls[i % 2],
+                start_time=self.start + timedelta(hours=i * 3),
+                end_time=self.start + timedelta(hours=i * 3 + 2),
+                language="EN" if i % 3 else "SR",
+                is_3d=i % 4 == 0,
+                base_price="300.00",
+            )
+
+    def test_list_is_cursor_paginated_and_light(self):
+        seen = []
+        url = "/api/screenings/?page_size=5"
+        while url:
+            with self.assertNumQueries(1):
+                resp = self.client.get(url)
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            seen += resp.data["results"]
+            url = resp.data["next"]
+
+        self.assertEqual(len(seen), 12)
+        self.assertEqual([s["start_time"] for s in seen], sorted(s["start_time"] for s in seen))
+        self.assertEqual(seen[0]["movie_title"], "A")
+        self.assertNotIn("movie", seen[0])
+
+    def test_filters(self):
+        def ids(**params):
+            return [s["id"] for s in self.client.get("/api/screenings/", params).data["results"]]
+
+        day = self.start.date().isoformat()
+        self.assertEqual(len(ids(date=day)), 5)
+        self.assertEqual(len(ids(movie=self.movies[0].id)), 6)
+        self.assertEqual(len(ids(hall=self.halls[1].id, is_3d="false")), 6)
+        self.assertEqual(len(ids(language="sr")), 4)
+        self.assertEqual(len(ids(starts_after=(self.start + timedelta(hours=30)).isoformat())), 2)
+        self.assertEqual(self.client.get("/api/screenings/", {"is_3d": "maybe"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/screenings/", {"date": "soon"}).status_code, 400)
+
+    def test_detail_keeps_nested_representation(self):
+        screening = Screening.objects.first()
+        resp = self.client.get(f"/api/screenings/{screening.id}/")
+        self.assertEqual(resp.data["movie"]["title"], "A")
+
+
+class ReservationListTests(APITestCase):
+    def setUp(self):
+        admin = get_user_model().objects.create_user("admin", is_staff=True)
+        self.client.force_authenticate(admin)
+        movie = Movie.objects.create(title="Heat", duration_minutes=170)
+        hall = Hall.objects.create(name="Hall R", total_rows=4, seats_per_row=10)
+        generate_seats(hall)
+        seats = list(hall.seats.order_by("row", "number"))
+        now = timezone.now()
+        self.screenings = [
+            Screening.objects.create(
+                movie=movie,
+                hall=hall,
+                start_time=now + timedelta(days=d),
+                end_time=now + timedelta(days=d, hours=3),
+                base_price="400.00",
+            )
+            for d in (1, 2)
+        ]
+        for i in range(20):
+            screening = self.screenings[i % 2]
+            reservation = Reservation.objects.create(
+                screening=screening,
+                customer_name=f"Customer {i}",
+                customer_email=f"c{i % 4}@example.com",
+                status=Reservation.Status.CANCELLED if i % 5 == 0 else Reservation.Status.CONFIRMED,
+            )
+            for seat in seats[2 * (i // 2) : 2 * (i // 2) + 2]:
+                ReservedSeat.objects.create(reservation=reservation, screening=screening, seat=seat)
+
+    def test_list_cost_is_constant_per_page(self):
+        counts = {}
+        for size in (2, 20):
+            with CaptureQueriesContext(connection) as queries:
+                resp = self.client.get("/api/reservations/", {"page_size": size})
+            self.assertEqual(len(resp.data["results"]), size)
+            counts[size] = len(queries)
+        self.assertEqual(counts[2], counts[20])
+        self.assertEqual(counts[20], 2)
+
+        seat = resp.data["results"][0]["reserved_seats"][0]
+        self.assertEqual(seat["hall_name"], "Hall R")
+        self.assertIn("row", seat)
+
+    def test_pages_are_newest_first_without_gaps(self):
+        seen, url = [], "/api/reservations/?page_size=6"
+        while url:
+            resp = self.client.get(url)
+            seen += resp.data["results"]
+            url = resp.data["next"]
+        self.assertEqual(len({r["id"] for r in seen}), 20)
+        self.assertEqual([r["created_at"] for r in seen], sorted((r["created_at"] for r in seen), reverse=True))
+
+    def test_filters(self):
+        def ids(**params):
+            return [r["id"] for r in self.client.get("/api/reservations/", params).data["results"]]
+
+        old = list(Reservation.objects.order_by("id").values_list("id", flat=True)[:3])
+        Reservation.objects.filter(id__in=old).update(created_at=timezone.now() - timedelta(days=10))
+
+        self.assertEqual(len(ids(screening=self.screenings[0].id)), 10)
+        self.assertEqual(len(ids(status="cancelled")), 4)
+        self.assertEqual(len(ids(email="C1@Example.com")), 5)
+        before = (timezone.now() - timedelta(days=5)).isoformat()
+        self.assertEqual(sorted(ids(created_before=before)), old)
+        self.assertEqual(len(ids(created_after=before)), 17)
+        self.assertEqual(self.client.get("/api/reservations/", {"status": "lost"}).status_code, 400)
+
+    def test_list_requires_admin(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get("/api/reservations/").status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_user("admin", is_staff=True)
+        self.client.force_authenticate(self.admin)
+        movie = Movie.objects.create(title="Alien", duration_minutes=117)
+        hall = Hall.objects.create(name="Hall E", total_rows=2, seats_per_row=3)
+        generate_seats(hall)
+        self.seats = list(hall.seats.order_by("row", "number"))
+        now = timezone.now()
+        self.screening = Screening.objects.create(
+            movie=movie,
+            hall=hall,
+            start_time=now + timedelta(days=1),
+            end_time=now + timedelta(days=1, hours=2),
+            base_price="380.00",
+        )
+        for i, seats in enumerate([self.seats[:2], self.seats[4:5]]):
+            reservation = Reservation.objects.create(
+                screening=self.screening, customer_name=f"Guest {i}", customer_email=f"g{i}@example.com"
+            )
+            for seat in seats:
+                ReservedSeat.objects.create(reservation=reservation, screening=self.screening, seat=seat)
+
+    def read(self, resp) -> str:
+        self.assertTrue(resp.streaming)
+        return b"".join(resp.streaming_content).decode()
+
+    def test_reservation_export_csv_and_ndjson(self):
+        rows = list(csv.DictReader(io.StringIO(self.read(self.client.get("/api/reservations/export/")))))
+        self.assertEqual([(r["customer_name"], r["seats"], r["movie"]) for r in rows], [
+            ("Guest 0", "2", "Alien"),
+            ("Guest 1", "1", "Alien"),
+        ])
+
+        resp = self.client.get("/api/reservations/export/", {"as": "ndjson", "date": timezone.localdate().isoformat()})
+        self.assertEqual(resp["Content-Type"], "application/x-ndjson")
+        lines = [json.loads(line) for line in self.read(resp).splitlines()]
+        self.assertEqual([line["seats"] for line in lines], [2, 1])
+
+        tomorrow = (timezone.localdate() + timedelta(days=1)).isoformat()
+        self.assertEqual(self.read(self.client.get("/api/reservations/export/", {"date": tomorrow})).count("\n"), 1)
+        self.assertEqual(self.client.get("/api/reservations/export/", {"as": "xml"}).status_code, 400)
+
+    def test_manifest_lists_reserved_seats_in_hall_order(self):
+        url = f"/api/screenings/{self.screening.id}/manifest/"
+        rows = list(csv.DictReader(io.StringIO(self.read(self.client.get(url)))))
+        self.assertEqual([(r["row"], r["number"], r["customer_name"]) for r in rows], [
+            ("1", "1", "Guest 0"),
+            ("1", "2", "Guest 0"),
+            ("2", "2", "Guest 1"),
+        ])
+
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_asgi_export_streams_asynchronously(self):
+        token = await sync_to_async(lambda: str(AccessToken.for_user(self.admin)))()
+        resp = await self.async_client.get(
+            "/api/reservations/export/", {"as": "ndjson"}, headers={"Authorization": f"Bearer {token}"}
+        )
+        self.assertTrue(resp.is_async)
+        body = b"".join([chunk async for chunk in resp.streaming_content])
+        self.assertEqual(len(body.splitlines()), 2)
+
+    def test_command_writes_manifest(self):
+        out = StringIO()
+        call_command("export_reservations", manifest=self.screening.id, format="ndjson", stdout=out)
+        self.assertEqual([json.loads(line)["seat_id"] for line in out.getvalue().splitlines()], [
+            self.seats[0].id, self.seats[1].id, self.seats[4].id,
+        ])
+
+
+class ScreeningSchedulerTests(APITestCase):
+    url = "/api/screenings/schedule/"
+
+    def setUp(self):
+        self.client.force_authenticate(get_user_model().objects.create_user("admin", is_staff=True))
+        self.movie = Movie.objects.create(title="Dune", duration_minutes=100)
+        self.halls = [Hall.objects.create(name=f"Hall S{n}", total_rows=1, seats_per_row=1) for n in range(20)]
+        self.day = timezone.localdate() + timedelta(days=7)
+
+    def template(self, hall, times, **extra):
+        return {"movie_id": self.movie.id, "hall_id": hall.id, "times": times, "base_price": "450.00", **extra}
+
+    def post(self, templates, days=1, **extra):
+        return self.client.post(self.url, {
+            "start_date": self.day.isoformat(),
+            "end_date": (self.day + timedelta(days=days - 1)).isoformat(),
+            "templates": templates,
+            **extra,
+        }, format="json")
+
+    def test_creates_recurring_screenings_with_derived_end_times(self):
+        weekday = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"][self.day.weekday()]
+        resp = self.post([self.template(self.halls[0], ["10:00", "14:00"], days=[weekday])], days=14)
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(resp.data["created"], 4)
+
+        screenings = Screening.objects.filter(hall=self.halls[0]).order_by("start_time")
+        self.assertEqual([timezone.localtime(s.start_time).weekday() for s in screenings], [self.day.weekday()] * 4)
+        self.assertTrue(all(s.end_time - s.start_time == timedelta(minutes=100) for s in screenings))
+
+    def test_overlaps_reject_the_whole_batch(self):
+        start = timezone.make_aware(datetime.combine(self.day, datetime.min.time())) + timedelta(hours=12)
+        existing = Screening.objects.create(
+            movie=self.movie, hall=self.halls[1], start_time=start, end_time=start + timedelta(minutes=100), base_price="1"
+        )
+        resp = self.post([
+            self.template(self.halls[0], ["10:00"]),
+            self.template(self.halls[1], ["10:30"]),
+        ])
+        self.assertEqual(resp.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(resp.data["conflicts"][0]["conflicts_with"], [{"screening_id": existing.id}])
+        self.assertEqual(Screening.objects.count(), 1)
+
+        # Screenings in the same batch are checked against each other too,
+        # allowing for each template's cleaning buffer.
+        resp = self.post([self.template(self.halls[0], ["10:00", "11:50"], buffer_minutes=15)])
+        self.assertEqual(resp.status_code, status.HTTP_409_CONFLICT)
+        resp = self.post([self.template(self.halls[0], ["10:00", "11:50"], buffer_minutes=5)])
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+
+    def test_dry_run_creates_nothing(self):
+        resp = self.post([self.template(self.halls[0], ["10:00"])], days=3, dry_run=True)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(resp.data["screenings"]), 3)
+        self.assertFalse(Screening.objects.exists())
+
+    def test_single_create_rejects_overlap(self):
+        start = timezone.now() + timedelta(days=1)
+        Screening.objects.create(
+            movie=self.movie, hall=self.halls[0], start_time=start, end_time=start + timedelta(hours=2), base_price="1"
+        )
+        resp = self.client.post("/api/screenings/", {
+            "movie_id": self.movie.id,
+            "hall_id": self.halls[0].id,
+            "start_time": (start + timedelta(hours=2, minutes=5)).isoformat(),
+            "end_time": (start + timedelta(hours=4)).isoformat(),
+            "base_price": "450.00",
+        }, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("conflicts_with", resp.data)
+
+    def test_month_for_twenty_halls_in_a_handful_of_queries(self):
+        templates = [self.template(hall, ["10:00", "12:30", "15:00", "17:30", "20:00"]) for hall in self.halls]
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.post(templates, days=30)
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(resp.data["created"], 3000)
+        # Writes are batched (more batches on SQLite); the reads must not
+        # grow with the number of templates.
+        reads = [q for q in queries.captured_queries if q["sql"].startswith("SELECT")]
+        self.assertLessEqual(len(reads), 6)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, SEAT_BROADCAST_COALESCE_MS=0)
+class ScheduleTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.movie = Movie.objects.create(title="Alien", duration_minutes=117)
+        self.hall = Hall.objects.create(name="Hall Z", total_rows=1, seats_per_row=3)
+        self.seats = [Seat.objects.create(hall=self.hall, row=1, number=n) for n in [1, 2, 3]]
+        self.day = (timezone.localtime() + timedelta(days=2)).date()
+        start = timezone.make_aware(datetime.combine(self.day, datetime.min.time())) + timedelta(hours=18)
+        self.screening = Screening.objects.create(
+            movie=self.movie,
+            hall=self.hall,
+            start_time=start,
+            end_time=start + timedelta(hours=2),
+            base_price="400.00",
+        )
+
+    def get_day(self):
+        resp = self.client.get("/api/schedule/", {"from": self.day.isoformat()})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return resp.data["days"][0]
+
+    def test_schedule_groups_screenings_and_is_cached(self):
+        day = self.get_day()
+        self.assertEqual(day["movies"][0]["title"], "Alien")
+        self.assertEqual(day["movies"][0]["screenings"][0]["remaining_seats"], 3)
+
+        with self.assertNumQueries(0):
+            self.get_day()
+
+    def test_reservations_and_edits_invalidate(self):
+        self.get_day()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reservation = Reservation.objects.create(
+                screening=self.screening, customer_name="A", customer_email="a@example.com"
+            )
+            ReservedSeat.objects.create(reservation=reservation, screening=self.screening, seat=self.seats[0])
+        self.assertEqual(self.get_day()["movies"][0]["screenings"][0]["remaining_seats"], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.movie.title = "Aliens"
+            self.movie.save()
+        self.assertEqual(self.get_day()["movies"][0]["title"], "Aliens")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.screening.start_time += timedelta(days=1)
+            self.screening.end_time += timedelta(days=1)
+            self.screening.save()
+        self.assertEqual(self.get_day()["movies"], [])
+
+    def test_range_is_bounded(self):
+        resp = self.client.get("/api/schedule/", {"from": "2030-01-01", "to": "2030-03-01"})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, SEAT_BROADCAST_COALESCE_MS=0)
+class BulkReservationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        caches["idempotency"].clear()
+        admin = get_user_model().objects.create_superuser("admin", "admin@example.com", "pass")
+        self.client.force_authenticate(admin)
+        movie = Movie.objects.create(title="Up", duration_minutes=96)
+        self.hall = Hall.objects.create(name="Hall B", total_rows=10, seats_per_row=60)
+        generate_seats(self.hall)
+        self.seat_ids = list(self.hall.seats.values_list("id", flat=True))
+        now = timezone.now()
+        self.screening = Screening.objects.create(
+            movie=movie,
+            hall=self.hall,
+            start_time=now + timedelta(days=1),
+            end_time=now + timedelta(days=1, hours=2),
+            base_price="300.00",
+        )
+
+    def item(self, seat_ids, **extra):
+        return {
+            "screening": self.screening.id,
+            "customer_name": "School trip",
+            "customer_email": "trip@example.com",
+            "seat_ids": seat_ids,
+            **extra,
+        }
+
+    def test_many_bookings_in_a_few_queries(self):
+        items = [self.item(self.seat_ids[i * 2:i * 2 + 2]) for i in range(250)]
+        get_hall_layout(self.hall.id)
+
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.post("/api/reservations/bulk/", {"reservations": items}, format="json")
+        # Batch sizes depend on the backend's parameter limits, so bound the count.
+        self.assertLessEqual(len(queries), 16)
+
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(resp.data["created"], 250)
+        self.assertEqual(ReservedSeat.objects.filter(screening=self.screening).count(), 500)
+        self.screening.refresh_from_db()
+        self.assertEqual(self.screening.reserved_count, 500)
+
+    def test_reports_per_item_results(self):
+        ReservedSeat.objects.create(
+            reservation=Reservation.objects.create(
+                screening=self.screening, customer_name="A", customer_email="a@example.com"
+            ),
+            screening=self.screening,
+            seat_id=self.seat_ids[0],
+        )
+        items = [
+            self.item([self.seat_ids[0]]),
+            self.item([self.seat_ids[1]]),
+            self.item([self.seat_ids[1], self.seat_ids[2]]),
+            self.item([self.seat_ids[3]], customer_email="nope"),
+        ]
+        resp = self.client.post("/api/reservations/bulk/", {"reservations": items}, format="json")
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual([r["ok"] for r in resp.data["results"]], [False, True, False, False])
+        self.assertEqual(resp.data["results"][2]["errors"]["seat_ids"], [self.seat_ids[1]])
+        self.assertIn("customer_email", resp.data["results"][3]["errors"])
+
+        resp = self.client.post(
+            "/api/reservations/bulk/",
+            {"reservations": [self.item([self.seat_ids[4]]), self.item([self.seat_ids[0]])], "all_or_nothing": True},
+            format="json",
+        )
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ReservedSeat.objects.filter(seat_id=self.seat_ids[4]).exists())
+
+    def test_seats_held_after_planning_are_not_booked(self):
+        plan = reservations._plan
+
+        def plan_then_hold(items, screenings):
+            plan(items, screenings)
+            get_hold_store().acquire(
+                self.screening.id, [self.seat_ids[1]], "late", timezone.now() + timedelta(minutes=2)
+            )
+
+        items = [self.item([self.seat_ids[0]]), self.item([self.seat_ids[1], self.seat_ids[2]])]
+        with mock.patch.object(reservations, "_plan", plan_then_hold):
+            resp = self.client.post("/api/reservations/bulk/", {"reservations": items}, format="json")
+        self.assertEqual([r["ok"] for r in resp.data["results"]], [True, False])
+        self.assertEqual(resp.data["results"][1]["errors"]["seat_ids"], [self.seat_ids[1]])
+
+        get_hold_store().release(self.screening.id, [self.seat_ids[1]], "late")
+        items = [self.item([self.seat_ids[3]]), self.item([self.seat_ids[1]])]
+        with mock.patch.object(reservations, "_plan", plan_then_hold):
+            resp = self.client.post(
+                "/api/reservations/bulk/", {"reservations": items, "all_or_nothing": True}, format="json"
+            )
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ReservedSeat.objects.filter(seat_id__in=[self.seat_ids[1], self.seat_ids[3]]).exists())
+
+    def test_requires_admin(self):
+        self.client.force_authenticate(None)
+        resp = self.client.post("/api/reservations/bulk/", {"reservations": [self.item([self.seat_ids[0]])]}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class BenchSuiteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.baseline = Path(tempfile.mkdtemp()) / "baseline.json"
+        self.addCleanup(shutil.rmtree, self.baseline.parent)
+
+    def test_records_baseline_and_flags_regressions(self):
+        out = StringIO()
+        call_command(
+            "bench_suite", scale=0.01, iterations=1, baseline=str(self.baseline), update_baseline=True,
+            stdout=out, stderr=StringIO(),
+        )
+        recorded = json.loads(self.baseline.read_text())
+        self.assertEqual(set(recorded), set(benchmarks.SCENARIOS))
+        self.assertEqual(recorded["seat_map_warm"]["queries"], 1)
+
+        recorded["hold"]["queries"] = 1
+        self.baseline.write_text(json.dumps(recorded))
+        with self.assertRaisesMessage(CommandError, "hold: 1 ->"):
+            call_command(
+                "bench_suite", iterations=1, scenario=["hold"], baseline=str(self.baseline),
+                stdout=StringIO(), stderr=StringIO(),
+            )
+
+    def test_compare_ignores_noise(self):
+        baseline = {"hold": {"queries": 5, "p50_ms": 1.0, "p95_ms": 2.0}}
+        self.assertEqual(benchmarks.compare({"hold": {"queries": 5, "p50_ms": 2.5, "p95_ms": 3.0}}, baseline), [])
+        self.assertEqual(len(benchmarks.compare({"hold": {"queries": 5, "p50_ms": 9.0, "p95_ms": 9.0}}, baseline)), 1)
+        self.assertEqual(
+            benchmarks.compare({"release": {"queries": 1, "p50_ms": 1.0, "p95_ms": 1.0}}, baseline),
+            ["release: not in the baseline"],
+        )
+
+    def test_missing_baseline_fails_the_gate(self):
+        with self.assertRaisesMessage(CommandError, "No baseline at"):
+            call_command("bench_suite", iterations=1, baseline=str(self.baseline), stdout=StringIO(), stderr=StringIO())
+        self.assertFalse(benchmarks.is_seeded())
+
+
+class SeatVersionTests(TransactionTestCase):
+    def setUp(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("needs a database file or server that handles concurrent connections")
+        movie = Movie.objects.create(title="Up", duration_minutes=96)
+        hall = Hall.objects.create(name="Hall V", total_rows=1, seats_per_row=1)
+        now = timezone.now()
+        self.screening = Screening.objects.create(
+            movie=movie, hall=hall, start_time=now, end_time=now + timedelta(hours=2), base_price="1.00"
+        )
+
+    def test_concurrent_bumps_never_share_a_seq(self):
+        seqs = []
+
+        def bump():
+            try:
+                for _ in range(25):
+                    seqs.append(bump_seat_version(self.screening.id))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=bump) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(sorted(seqs), list(range(1, 101)))
+
+
+class OnSaleSimulatorTests(TransactionTestCase):
+    def setUp(self):
+        # Requests run on their own threads and connections; shared-cache
+        # in-memory SQLite fails them with table locks instead of waiting.
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("needs a database file or server that handles concurrent connections")
+
+    def test_simulated_customers_book_consistently(self):
+        out = StringIO()
+        call_command(
+            "simulate_onsale", customers=12, rows=2, seats_per_row=8, party=2, abandon_ratio=0.25,
+            concurrency=4, json=True, stdout=out,
+        )
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(sum(report["outcomes"].values()), 12)
+        self.assertEqual(report["outcomes"]["error"], 0)
+        self.assertGreater(report["outcomes"]["booked"], 0)
+        self.assertEqual(report["reserved_seats"], report["reserved_count"])
+        self.assertGreater(report["fanout"]["requests"], 0)
+        self.assertFalse(Hall.objects.filter(name__startswith="onsale-").exists())
+
+
+class SalesStatsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        caches["idempotency"].clear()
+        admin = get_user_model().objects.create_user("admin", is_staff=True)
+        self.client.force_authenticate(admin)
+        self.movies = [Movie.objects.create(title=t, duration_minutes=100) for t in ("Alien", "Brazil")]
+        self.hall = Hall.objects.create(name="Hall S", total_rows=2, seats_per_row=10)
+        generate_seats(self.hall)
+        self.seat_ids = list(self.hall.seats.order_by("row", "number").values_list("id", flat=True))
+        start = timezone.make_aware(datetime(2026, 5, 4, 18, 0))
+        self.screenings = [
+            Screening.objects.create(
+                movie=self.movies[i % 2],
+                hall=self.hall,
+                start_time=start + timedelta(days=i // 2, hours=3 * (i % 2)),
+                end_time=start + timedelta(days=i // 2, hours=3 * (i % 2) + 2),
+                language="EN" if i == 3 else "SR",
+                base_price="400.00",
+            )
+            for i in range(4)
+        ]
+
+    def book(self, screening, seat_ids):
+        resp = self.client.post("/api/reservations/", {
+            "screening": screening.id,
+            "customer_name": "Fan",
+            "customer_email": "fan@example.com",
+            "seat_ids": seat_ids,
+        }, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED, resp.data)
+        return resp.data["id"]
+
+    def snapshot(self):
+        fields = ["day", "movie_id", "hall_id", "language", "screenings", "capacity", "reservations", "seats_sold", "revenue"]
+        return sorted(DailySalesStat.objects.filter(screenings__gt=0).values_list(*fields))
+
+    def test_incremental_updates_match_a_rebuild(self):
+        first = self.book(self.screenings[0], self.seat_ids[:3])
+        self.book(self.screenings[0], self.seat_ids[3:5])
+        doomed = self.book(self.screenings[1], self.seat_ids[:4])
+        self.client.post("/api/reservations/bulk/", {"reservations": [
+            {"screening": self.screenings[2].id, "customer_name": "Trip", "customer_email": "t@example.com",
+             "seat_ids": self.seat_ids[:6]},
+            {"screening": self.screenings[3].id, "customer_name": "Trip", "customer_email": "t@example.com",
+             "seat_ids": self.seat_ids[:2]},
+        ]}, format="json")
+        self.client.patch(f"/api/reservations/{first}/", {"status": "CANCELLED"}, format="json")
+        self.client.delete(f"/api/reservations/{doomed}/")
+        moved = self.screenings[2]
+        moved.start_time += timedelta(days=7)
+        moved.end_time += timedelta(days=7)
+        moved.base_price = "500.00"
+        moved.save()
+
+        incremental = self.snapshot()
+        rebuild_stats()
+        self.assertEqual(incremental, self.snapshot())
+
+        day = DailySalesStat.objects.get(day=datetime(2026, 5, 4).date(), movie=self.movies[0])
+        self.assertEqual((day.screenings, day.capacity, day.reservations, day.seats_sold), (1, 20, 1, 2))
+        self.assertEqual(day.revenue, 800)
+
+    def test_cascading_deletes_take_bookings_back_in_one_pass(self):
+        def delete(obj):
+            with CaptureQueriesContext(connection) as queries:
+                obj.delete()
+            return len(queries)
+
+        first, other = self.screenings[0], self.screenings[1]
+        small = Reservation.objects.get(pk=self.book(first, self.seat_ids[:1]))
+        large = Reservation.objects.get(pk=self.book(first, self.seat_ids[1:11]))
+        self.book(first, self.seat_ids[11:13])
+        for i in range(3):
+            self.book(other, self.seat_ids[i * 3:i * 3 + 3])
+        version = Screening.objects.get(pk=first.pk).seat_version
+
+        self.assertEqual(delete(large), delete(small))
+        first.refresh_from_db()
+        self.assertEqual((first.reserved_count, first.seat_version), (2, version + 2))
+
+        self.assertEqual(delete(other), delete(first))
+        self.assertEqual(DailySalesStat.objects.filter(reservations__gt=0).count(), 0)
+        incremental = self.snapshot()
+        rebuild_stats()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_sales_report_groups_and_totals(self):
+        self.book(self.screenings[0], self.seat_ids[:5])
+        self.book(self.screenings[3], self.seat_ids[:2])
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get("/api/stats/sales/", {
+                "from": "2026-05-01", "to": "2026-05-31", "group_by": "movie,language",
+            })
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertLessEqual(len(queries), 2)
+        self.assertEqual(resp.data["totals"]["seats_sold"], 7)
+        self.assertEqual(resp.data["totals"]["capacity"], 80)
+        self.assertEqual(resp.data["totals"]["revenue"], "2800.00")
+        rows = {(r["movie__title"], r["language"]): r for r in resp.data["rows"]}
+        self.assertEqual(set(rows), {("Alien", "SR"), ("Brazil", "SR"), ("Brazil", "EN")})
+        self.assertEqual(rows[("Alien", "SR")]["occupancy"], 0.125)
+
+    def test_sales_report_rejects_bad_parameters(self):
+        for params in ({"group_by": "seat"}, {"group_by": "day,day"}, {"from": "2026-05-02", "to": "2026-05-01"}):
+            self.assertEqual(self.client.get("/api/stats/sales/", params).status_code, status.HTTP_400_BAD_REQUEST)
+        self.client.force_authenticate(None)
+        self.assertIn(self.client.get("/api/stats/sales/").status_code, (401, 403))
+
+    def test_rebuild_command_limits_to_the_range(self):
+        self.book(self.screenings[0], self.seat_ids[:2])
+        DailySalesStat.objects.update(seats_sold=0)
+        out = StringIO()
+        call_command("rebuild_sales_stats", "--from", "2026-05-04", "--to", "2026-05-04", stdout=out)
+        self.assertIn("Wrote 2 daily sales row(s).", out.getvalue())
+        self.assertEqual(DailySalesStat.objects.get(day=datetime(2026, 5, 4).date(), movie=self.movies[0]).seats_sold, 2)
+        self.assertEqual(DailySalesStat.objects.filter(day=datetime(2026, 5, 5).date(), seats_sold__gt=0).count(), 0)
+
+
+class SeatHeatmapTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        admin = get_user_model().objects.create_user("admin", is_staff=True)
+        self.client.force_authenticate(admin)
+        movie = Movie.objects.create(title="Jaws", duration_minutes=124)
+        self.hall = Hall.objects.create(name="Hall H", total_rows=2, seats_per_row=3)
+        generate_seats(self.hall)
+        seats = {(s.row, s.number): s for s in self.hall.seats.all()}
+        self.show = timezone.make_aware(datetime(2026, 6, 1, 20, 0))
+        screenings = [
+            Screening.objects.create(
+                movie=movie, hall=self.hall, start_time=self.show + timedelta(days=d),
+                end_time=self.show + timedelta(days=d, hours=2), base_price="300.00",
+            )
+            for d in (0, 1)
+        ]
+        # (screening, seats, hours before the show, status)
+        bookings = [
+            (0, [(1, 2), (1, 3)], 48, "CONFIRMED"),
+            (0, [(2, 1)], 2, "CONFIRMED"),
+            (1, [(1, 2)], 10, "CONFIRMED"),
+            (1, [(2, 3)], 20, "CANCELLED"),
+        ]
+        for i, seat_keys, hours, state in bookings:
+            reservation = Reservation.objects.create(
+                screening=screenings[i], customer_name="Fan", customer_email="fan@example.com", status=state,
+            )
+            Reservation.objects.filter(pk=reservation.pk).update(
+                created_at=screenings[i].start_time - timedelta(hours=hours)
+            )
+            for key in seat_keys:
+                ReservedSeat.objects.create(reservation=reservation, screening=screenings[i], seat=seats[key])
+
+    def test_fill_ranks_share_a_rank_per_reservation(self):
+        ranks = fill_ranks(
+            np.array([0, 0, 0, 1, 1]), np.array([7, 7, 8, 9, 10]), np.array([5.0, 5.0, 1.0, 3.0, 4.0])
+        )
+        self.assertEqual(ranks.tolist(), [0.5, 0.5, 0.0, 0.0, 1.0])
+
+    def test_grouped_percentiles_match_numpy(self):
+        rng = np.random.default_rng(0)
+        cells, values = rng.integers(0, 5, 200), rng.random(200)
+        result = grouped_percentiles(cells, values, 6, percentiles=(50, 90))
+        for cell in range(5):
+            for p in (50, 90):
+                self.assertAlmostEqual(result[p][cell], np.percentile(values[cells == cell], p))
+        self.assertTrue(np.isnan(result[50][5]))
+
+    def test_heatmap_grids(self):
+        heatmap = get_heatmap(self.hall.id)
+        self.assertEqual((heatmap["rows"], heatmap["seats_per_row"], heatmap["screenings"]), (2, 3, 2))
+        self.assertEqual(heatmap["seats_sold"], 4)
+        self.assertEqual(heatmap["occupancy"], [[0.0, 1.0, 0.5], [0.5, 0.0, 0.0]])
+        self.assertEqual(heatmap["fill_rank"], [[None, 0.0, 0.0], [1.0, None, None]])
+        self.assertEqual(heatmap["fill_order"][0][1], 1)
+        self.assertEqual(heatmap["fill_order"][1][0], 3)
+        self.assertEqual(heatmap["hours_before_show"]["p50"][0][1], 29.0)
+        self.assertEqual(heatmap["hours_before_show"]["p90"][0][2], 48.0)
+
+        first_day = get_heatmap(self.hall.id, self.show.date(), self.show.date())
+        self.assertEqual(first_day["occupancy"][0], [0.0, 1.0, 1.0])
+
+    def test_heatmap_endpoint_is_cached_and_admin_only(self):
+        url = f"/api/halls/{self.hall.id}/heatmap/"
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(self.client.get(url, {"from": "2026-06-02", "to": "2026-06-01"}).status_code, 400)
+        self.client.force_authenticate(None)
+        self.assertIn(self.client.get(url).status_code, (401, 403))
+
@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import (
     MovieViewSet,
     HallViewSet,
@@ -7,6 +8,9 @@ from .views import (
     ScreeningViewSet,
     ReservationViewSet,
     ReservedSeatViewSet,
+    BroadcastMetricsView,
+    ScheduleView,
+    SalesStatsView,
 )
 
 
@@ -19,5 +23,11 @@ router.register(r"reservations", ReservationViewSet, basename="reservation")
 router.register(r"reserved-seats", ReservedSeatViewSet, basename="reservedseat")
 
 urlpatterns = [
+    path("live/screenings/<int:pk>/seat-map/", async_views.seat_map, name="live-seat-map"),
+    path("live/screenings/<int:pk>/hold/", async_views.hold, name="live-hold"),
+    path("live/screenings/<int:pk>/release/", async_views.release, name="live-release"),
+    path("schedule/", ScheduleView.as_view(), name="schedule"),
+    path("stats/sales/", SalesStatsView.as_view(), name="sales-stats"),
+    path("metrics/broadcast/", BroadcastMetricsView.as_view(), name="broadcast-metrics"),
     path("", include(router.urls)),
 ]
@@ -1,5 +1,9 @@
+import hashlib
+import hmac
+
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
+from django.conf import settings
 
 
 def broadcast_screening_update(screening_id: int, payload: dict):
@@ -8,3 +12,25 @@ def broadcast_screening_update(screening_id: int, payload: dict):
         f"screening_{screening_id}",
         {"type": "seat_update", "payload": payload},
     )
+
+
+def owner_hash(client_id: str) -> str:
+    if not client_id:
+        return ""
+    return hmac.new(settings.SECRET_KEY.encode(), client_id.encode(), hashlib.sha256).hexdigest()[:16]
+
+
+def seat_delta_payload(screening_id: int, seq: int, seat_ids, state: str, client_id: str = "") -> dict:
+    return {
+        "event": "seat_delta",
+        "screening_id": screening_id,
+        "first_seq": seq,
+        "seq": seq,
+        "changes": [
+            {
+                "seat_ids": sorted(seat_ids),
+                "state": state,
+                "owner": owner_hash(client_id) if state == "held" else "",
+            }
+        ],
+    }
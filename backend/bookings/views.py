@@ -1,4 +1,15 @@
-from rest_framework import viewsets
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.http import parse_etags
+from rest_framework import viewsets, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from .models import (
     Movie,
     Hall,
@@ -12,15 +23,37 @@ from .serializers import (
     HallSerializer,
     SeatSerializer,
     ScreeningSerializer,
+    ScreeningListSerializer,
+    ScreeningScheduleSerializer,
     ReservationSerializer,
     ReservedSeatSerializer,
-    ReservationCreateSerializer
+    ReservationCreateSerializer,
+    BulkReservationSerializer,
 )
+from .analytics import get_heatmap
+from .exports import FORMATS, MANIFEST_COLUMNS, RESERVATION_COLUMNS, manifest_rows, reservation_rows, stream_export
+from .filters import filter_reservations, filter_screenings
+from .idempotency import idempotent
+from .layouts import LayoutError, export_layout, generate_seats, hall_shape, iter_layout_csv
+from .pagination import ReservationCursorPagination, ScreeningCursorPagination
 from .permissions import IsAdminOrReadOnly
+from .schedule import cinema_day, get_schedule
+from .scheduling import ScheduleConflict, schedule_screenings
+from .publisher import get_publisher
+from .seatmap import get_seat_map_snapshot, render_seat_map
+from .stats import DIMENSIONS, sales_report
+from .services import SeatActionError, allocate_seats, hold_seats, release_seats
 from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.decorators import action
 
 
+def _export_format(request) -> str:
+    fmt = request.query_params.get("as", "csv")
+    if fmt not in FORMATS:
+        raise ValidationError({"as": f"Expected one of {', '.join(FORMATS)}."})
+    return fmt
+
+
 class MovieViewSet(viewsets.ModelViewSet):
     queryset = Movie.objects.all().order_by("title")
     serializer_class = MovieSerializer
@@ -32,6 +65,45 @@ class HallViewSet(viewsets.ModelViewSet):
     serializer_class = HallSerializer
     permission_classes = [IsAdminOrReadOnly]
 
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            hall = serializer.save()
+            generate_seats(hall)
+
+    def perform_update(self, serializer):
+        shape = hall_shape(serializer.instance)
+        with transaction.atomic():
+            hall = serializer.save()
+            if hall_shape(hall) == shape:
+                return
+            if ReservedSeat.objects.filter(seat__hall=hall).exists():
+                raise ValidationError({"layout": "The seats of a hall with reservations cannot be changed."})
+            try:
+                generate_seats(hall, replace=True)
+            except LayoutError as e:
+                raise ValidationError({"layout": str(e)})
+
+    @action(detail=True, methods=["get"])
+    def layout(self, request, pk=None):
+        hall = self.get_object()
+        if request.query_params.get("as") == "csv":
+            resp = StreamingHttpResponse(iter_layout_csv([hall]), content_type="text/csv")
+            resp["Content-Disposition"] = f'attachment; filename="hall-{hall.id}.csv"'
+            return resp
+        return Response(export_layout(hall))
+
+    @action(detail=True, methods=["get"], permission_classes=[IsAdminUser])
+    def heatmap(self, request, pk=None):
+        hall = self.get_object()
+        try:
+            first = parse_date(request.query_params.get("from", ""))
+            last = parse_date(request.query_params.get("to", ""))
+        except ValueError:
+            return Response({"detail": "from and to must be ISO dates."}, status=status.HTTP_400_BAD_REQUEST)
+        if first and last and last < first:
+            return Response({"detail": "to must be on or after from."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(get_heatmap(hall.id, first, last))
+
 
 class SeatViewSet(viewsets.ModelViewSet):
     queryset = Seat.objects.all()
@@ -40,104 +112,142 @@ class SeatViewSet(viewsets.ModelViewSet):
 
 
 class ScreeningViewSet(viewsets.ModelViewSet):
-    queryset = Screening.objects.select_related("movie", "hall").order_by("start_time")
+    queryset = Screening.objects.select_related("movie", "hall").order_by("start_time", "id")
     serializer_class = ScreeningSerializer
     permission_classes = [IsAdminOrReadOnly]
+    pagination_class = ScreeningCursorPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != "list":
+            return queryset
+        queryset = queryset.only(
+            "id",
+            "movie__id",
+            "movie__title",
+            "hall__id",
+            "hall__name",
+            "hall__seat_count",
+            "start_time",
+            "end_time",
+            "language",
+            "is_3d",
+            "base_price",
+            "reserved_count",
+            "held_count",
+        )
+        return filter_screenings(queryset, self.request.query_params)
+
+    def get_serializer_class(self):
+        if self.action == "list":
+            return ScreeningListSerializer
+        if self.action == "schedule":
+            return ScreeningScheduleSerializer
+        return ScreeningSerializer
 
     @action(detail=True, methods=["get"], url_path="seat-map", permission_classes=[AllowAny])
     def seat_map(self, request, pk=None):
         screening = self.get_object()
         client_id = request.headers.get("X-Client-Id", "")
 
-        SeatHold.objects.filter(screening=screening, expires_at__lte=timezone.now()).delete()
-
-        reserved_ids = set(screening.reserved_seats.values_list("seat_id", flat=True))
-
-        active_holds = SeatHold.objects.filter(screening=screening, expires_at__gt=timezone.now())
-        held_map = {h.seat_id: h.held_by for h in active_holds}
-
-        seats = Seat.objects.filter(hall=screening.hall).order_by("row", "number")
-
-        data = []
-        for s in seats:
-            held_by = held_map.get(s.id)
-            data.append({
-                "id": s.id,
-                "row": s.row,
-                "number": s.number,
-                "is_reserved": s.id in reserved_ids,
-                "is_held": held_by is not None,
-                "held_by_me": bool(client_id and held_by == client_id),
-            })
-
-        return Response({"screening_id": screening.id, "hall_id": screening.hall_id, "seats": data})
+        snapshot = get_seat_map_snapshot(screening)
+        data, etag = render_seat_map(screening, snapshot, client_id)
+
+        if_none_match = request.headers.get("If-None-Match", "")
+        if if_none_match and (if_none_match.strip() == "*" or etag in parse_etags(if_none_match)):
+            resp = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            resp = Response(data)
+        resp["ETag"] = etag
+        resp["Vary"] = "X-Client-Id"
+        return resp
+
+    @action(detail=False, methods=["post"])
+    @idempotent("screening-schedule")
+    def schedule(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            screenings = schedule_screenings(data["templates"], data["start_date"], data["end_date"], data["dry_run"])
+        except ScheduleConflict as e:
+            return Response({"detail": str(e), "conflicts": e.conflicts}, status=status.HTTP_409_CONFLICT)
+        return Response(
+            {
+                "created": 0 if data["dry_run"] else len(screenings),
+                "screenings": ScreeningListSerializer(screenings, many=True).data,
+            },
+            status=status.HTTP_200_OK if data["dry_run"] else status.HTTP_201_CREATED,
+        )
+
+    @action(detail=True, methods=["get"], permission_classes=[IsAdminUser])
+    def manifest(self, request, pk=None):
+        screening = self.get_object()
+        fmt = _export_format(request)
+        return stream_export(request, fmt, MANIFEST_COLUMNS, manifest_rows(screening), f"manifest-{screening.id}")
 
     @action(detail=True, methods=["post"], url_path="hold", permission_classes=[AllowAny])
+    @idempotent("hold")
     def hold(self, request, pk=None):
         screening = self.get_object()
-        client_id = request.data.get("client_id")
-        seat_ids = request.data.get("seat_ids", [])
-
-        if not client_id or not isinstance(seat_ids, list) or not seat_ids:
-            return Response({"detail": "client_id and seat_ids are required."}, status=status.HTTP_400_BAD_REQUEST)
-
-        SeatHold.objects.filter(screening=screening, expires_at__lte=timezone.now()).delete()
-
-        hall_seat_ids = set(Seat.objects.filter(hall=screening.hall, id__in=seat_ids).values_list("id", flat=True))
-        if len(hall_seat_ids) != len(set(seat_ids)):
-            return Response({"detail": "One or more seats do not belong to the screening hall."}, status=status.HTTP_400_BAD_REQUEST)
-
-        already_reserved = set(screening.reserved_seats.filter(seat_id__in=seat_ids).values_list("seat_id", flat=True))
-        if already_reserved:
-            return Response({"detail": "One or more seats are already reserved.", "seat_ids": list(already_reserved)}, status=status.HTTP_409_CONFLICT)
-
-        hold_seconds = int(getattr(settings, "SEAT_HOLD_SECONDS", int(request.data.get("hold_seconds", 120))))
-        expires_at = timezone.now() + timezone.timedelta(seconds=hold_seconds)
-
-        with transaction.atomic():
-            active_conflicts = SeatHold.objects.filter(
-                screening=screening,
-                seat_id__in=seat_ids,
-                expires_at__gt=timezone.now(),
-            ).exclude(held_by=client_id)
-
-            if active_conflicts.exists():
-                conflict_ids = list(active_conflicts.values_list("seat_id", flat=True))
-                return Response({"detail": "One or more seats are currently held.", "seat_ids": conflict_ids}, status=status.HTTP_409_CONFLICT)
-
-            SeatHold.objects.filter(screening=screening, seat_id__in=seat_ids, held_by=client_id).delete()
+        try:
+            data, _ = hold_seats(
+                screening,
+                request.data.get("client_id"),
+                request.data.get("seat_ids", []),
+                request.data.get("hold_seconds"),
+            )
+        except SeatActionError as exc:
+            return Response(exc.as_data(), status=exc.status_code)
+        return Response(data, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=["post"], url_path="allocate", permission_classes=[AllowAny])
+    def allocate(self, request, pk=None):
+        screening = self.get_object()
+        try:
+            data, _ = allocate_seats(
+                screening,
+                request.data.get("client_id"),
+                request.data.get("party_size"),
+                request.data.get("adjacent", True),
+                request.data.get("wheelchair", 0),
+                request.data.get("zone"),
+                request.data.get("hold_seconds"),
+            )
+        except SeatActionError as exc:
+            return Response(exc.as_data(), status=exc.status_code)
+        return Response(data, status=status.HTTP_200_OK)
 
-            try:
-                SeatHold.objects.bulk_create([
-                    SeatHold(screening=screening, seat_id=sid, held_by=client_id, expires_at=expires_at)
-                    for sid in set(seat_ids)
-                ])
-            except IntegrityError:
-                return Response({"detail": "One or more seats are currently held."}, status=status.HTTP_409_CONFLICT)
-
-        broadcast_screening_update(screening.id, {"event": "hold_updated", "screening_id": screening.id})
-        return Response({"ok": True, "expires_at": expires_at.isoformat()}, status=status.HTTP_200_OK)
-    
     @action(detail=True, methods=["post"], url_path="release", permission_classes=[AllowAny])
     def release(self, request, pk=None):
         screening = self.get_object()
-        client_id = request.data.get("client_id")
-        seat_ids = request.data.get("seat_ids", [])
-
-        if not client_id or not isinstance(seat_ids, list) or not seat_ids:
-            return Response({"detail": "client_id and seat_ids are required."}, status=status.HTTP_400_BAD_REQUEST)
-
-        SeatHold.objects.filter(screening=screening, seat_id__in=seat_ids, held_by=client_id).delete()
-        broadcast_screening_update(screening.id, {"event": "hold_updated", "screening_id": screening.id})
-        return Response({"ok": True}, status=status.HTTP_200_OK)
+        try:
+            data, _ = release_seats(screening, request.data.get("client_id"), request.data.get("seat_ids", []))
+        except SeatActionError as exc:
+            return Response(exc.as_data(), status=exc.status_code)
+        return Response(data, status=status.HTTP_200_OK)
 
 
 class ReservationViewSet(viewsets.ModelViewSet):
-    queryset = Reservation.objects.select_related("screening").order_by("-created_at")
+    queryset = Reservation.objects.order_by("-created_at", "id")
+    pagination_class = ReservationCursorPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ("list", "retrieve"):
+            return queryset
+        queryset = queryset.prefetch_related(
+            Prefetch("reserved_seats", queryset=ReservedSeat.objects.select_related("seat__hall").order_by("id"))
+        )
+        if self.action == "list":
+            queryset = filter_reservations(queryset, self.request.query_params)
+        return queryset
 
     def get_serializer_class(self):
         if self.action == "create":
             return ReservationCreateSerializer
+        if self.action == "bulk":
+            return BulkReservationSerializer
         return ReservationSerializer
 
     def get_permissions(self):
@@ -145,7 +255,91 @@ class ReservationViewSet(viewsets.ModelViewSet):
             return [AllowAny()]
         return [IsAdminUser()]
 
+    @idempotent("reservation-create")
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        fmt = _export_format(request)
+        queryset = filter_reservations(Reservation.objects.all(), request.query_params)
+        name = f"reservations-{request.query_params.get('date') or 'all'}"
+        return stream_export(request, fmt, RESERVATION_COLUMNS, reservation_rows(queryset), name)
+
+    @action(detail=False, methods=["post"], url_path="bulk")
+    @idempotent("reservation-bulk")
+    def bulk(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = serializer.save()
+
+        created = sum(1 for r in results if r["ok"])
+        if created == len(results):
+            code = status.HTTP_201_CREATED
+        elif created:
+            code = status.HTTP_200_OK
+        else:
+            code = status.HTTP_400_BAD_REQUEST
+        return Response({"created": created, "failed": len(results) - created, "results": results}, status=code)
+
 class ReservedSeatViewSet(viewsets.ModelViewSet):
-    queryset = ReservedSeat.objects.select_related("reservation", "seat")
+    queryset = ReservedSeat.objects.select_related("reservation", "seat__hall")
     serializer_class = ReservedSeatSerializer
     permission_classes = [IsAdminUser]
+
+
+class BroadcastMetricsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        publisher = get_publisher()
+        if publisher is None:
+            return Response({"coalescing": False})
+        return Response({"coalescing": True, **publisher.metrics()})
+
+
+class ScheduleView(APIView):
+    permission_classes = [AllowAny]
+    max_days = 14
+
+    def get(self, request):
+        today = cinema_day(timezone.now())
+        try:
+            first = parse_date(request.query_params.get("from", "")) or today
+            last = parse_date(request.query_params.get("to", "")) or first
+        except ValueError:
+            return Response({"detail": "from and to must be ISO dates."}, status=status.HTTP_400_BAD_REQUEST)
+        if last < first or (last - first).days >= self.max_days:
+            return Response(
+                {"detail": f"to must be on or after from, at most {self.max_days} days apart."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response({"days": get_schedule(first, last)})
+
+
+class SalesStatsView(APIView):
+    """Revenue and occupancy from the daily aggregates, grouped by any of day, movie, hall and language."""
+
+    permission_classes = [IsAdminUser]
+    max_days = 366
+    default_days = 30
+
+    def get(self, request):
+        today = cinema_day(timezone.now())
+        try:
+            last = parse_date(request.query_params.get("to", "")) or today
+            first = parse_date(request.query_params.get("from", "")) or last - timedelta(days=self.default_days - 1)
+        except ValueError:
+            return Response({"detail": "from and to must be ISO dates."}, status=status.HTTP_400_BAD_REQUEST)
+        if last < first or (last - first).days >= self.max_days:
+            return Response(
+                {"detail": f"to must be on or after from, at most {self.max_days} days apart."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        group_by = [g for g in request.query_params.get("group_by", "day").split(",") if g]
+        if not group_by or not set(group_by) <= set(DIMENSIONS) or len(set(group_by)) < len(group_by):
+            return Response(
+                {"detail": f"group_by must list distinct values from {', '.join(DIMENSIONS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(sales_report(first, last, group_by))
@@ -9,13 +9,15 @@ https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 
 import os
 
+from channels.routing import ProtocolTypeRouter, URLRouter
 from django.core.asgi import get_asgi_application
-import bookings.routing
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cinema_api.settings')
 
 http_app = get_asgi_application()
 
+import bookings.routing  # noqa: E402  needs the app registry loaded above
+
 application = ProtocolTypeRouter(
     {
         "http": http_app,
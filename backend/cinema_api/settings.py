@@ -59,6 +59,47 @@ CHANNEL_LAYERS = {
     }
 }
 
+CACHE_URL = os.getenv("CACHE_URL", "")
+
+if CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+        },
+        "idempotency": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+            "KEY_PREFIX": "idem",
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+        "idempotency": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "idempotency",
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        },
+    }
+
+IDEMPOTENCY_CACHE = "idempotency"
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", "86400"))
+
+SEAT_MAP_CACHE_SECONDS = int(os.getenv("SEAT_MAP_CACHE_SECONDS", "300"))
+HALL_LAYOUT_CACHE_SECONDS = int(os.getenv("HALL_LAYOUT_CACHE_SECONDS", "86400"))
+SCHEDULE_CACHE_SECONDS = int(os.getenv("SCHEDULE_CACHE_SECONDS", "3600"))
+SCHEDULE_DAY_START_HOUR = int(os.getenv("SCHEDULE_DAY_START_HOUR", "0"))
+SEAT_BROADCAST_COALESCE_MS = float(os.getenv("SEAT_BROADCAST_COALESCE_MS", "75"))
+SEAT_BROADCAST_QUEUE_SIZE = int(os.getenv("SEAT_BROADCAST_QUEUE_SIZE", "10000"))
+SEAT_HOLD_BACKEND = os.getenv("SEAT_HOLD_BACKEND", "bookings.holds.DatabaseHoldStore")
+SEAT_HOLD_SWEEP_INTERVAL = float(os.getenv("SEAT_HOLD_SWEEP_INTERVAL", "5"))
+SEAT_HOLD_SWEEP_BATCH_SIZE = int(os.getenv("SEAT_HOLD_SWEEP_BATCH_SIZE", "500"))
+SEAT_HOLD_SECONDS = int(os.getenv("SEAT_HOLD_SECONDS", "120"))
+SEAT_HOLD_MAX_SECONDS = int(os.getenv("SEAT_HOLD_MAX_SECONDS", "600"))
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -115,6 +156,16 @@ DATABASES = {
     }
 }
 
+# DB_ENGINE=sqlite swaps in a local SQLite file, e.g. for load simulations.
+# ASGI requests run on their own threads, so writers queue for the lock
+# up front instead of failing with "database is locked".
+if os.getenv('DB_ENGINE') == 'sqlite':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / os.getenv('DB_NAME', 'db.sqlite3'),
+        'OPTIONS': {'timeout': 30, 'transaction_mode': 'IMMEDIATE'},
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators